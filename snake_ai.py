@@ -0,0 +1,473 @@
+"""Pluggable AI controllers.
+
+A controller turns a read-only `BoardView` into a direction.  Any snake can
+be driven by one; `ControllerRunner` calls it on a worker thread with a
+per-move time budget and falls back to the last safe move on overrun.
+
+Controllers can be named (``"greedy"``, ``"path"``, ``"mcts"``, ``"hamilton"``), loaded from a Python
+file that defines ``create_controller()`` (reloaded when the file changes),
+or from a ``.npz`` file holding the weights of a small policy network.  A
+name may carry constructor options, e.g. ``"mcts:workers=4"``.
+
+    python snake_ai.py bench greedy path my_strategy.py --games 50
+"""
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from snake_constants import GRID_WIDTH, GRID_HEIGHT, DIRECTIONS, NORMAL
+from snake_sim import SimState, CRASHES
+from snake_fields import field_for_layout
+
+
+class BoardView:
+    """Immutable snapshot of the board as seen by the snake at `index`."""
+
+    __slots__ = ('index', 'bodies', 'directions', 'occupied', 'obstacles', 'ice',
+                 'food', 'special_food', 'special_ticks', 'width', 'height', 'mode', 'speed',
+                 'field')
+
+    def __init__(self, index, bodies, directions, obstacles, food, special_food=None,
+                 ice=(), mode=NORMAL, speed=12, width=GRID_WIDTH, height=GRID_HEIGHT,
+                 field=None, special_ticks=None):
+        self.index = index
+        self.bodies = tuple(tuple(body) for body in bodies)
+        self.directions = tuple(directions)
+        self.occupied = frozenset(cell for body in self.bodies for cell in body)
+        self.obstacles = frozenset(obstacles)
+        self.ice = frozenset(ice)
+        self.food = food
+        self.special_food = special_food
+        self.special_ticks = special_ticks  # ticks until the special food expires, if known
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.speed = speed
+        if field is None:
+            field = field_for_layout(self.obstacles, self.ice, width, height)
+        self.field = field  # snake_fields.HazardField for the static layout
+
+    @classmethod
+    def from_game(cls, game, index):
+        bodies = [game.snake]
+        directions = [game.direction]
+        if game.snake2:
+            bodies.append(game.snake2)
+            directions.append(game.direction2)
+        special_ticks = None
+        if game.special_food:
+            special_ticks = max(0, game.special_food_expires - game.ticks)
+        return cls(index, bodies, directions, game.obstacles, game.food, game.special_food,
+                   game.ice_blocks, game.game_mode, game.speed, field=game.hazard_field,
+                   special_ticks=special_ticks)
+
+    @classmethod
+    def from_sim(cls, state, index):
+        return cls(index, [s.body for s in state.snakes], [s.direction for s in state.snakes],
+                   state.obstacles, state.food, state.special_food, state.ice,
+                   state.mode, state.speed, state.width, state.height,
+                   special_ticks=state.special_expires - state.tick if state.special_food else None)
+
+    @property
+    def body(self):
+        return self.bodies[self.index]
+
+    @property
+    def head(self):
+        return self.bodies[self.index][0]
+
+    @property
+    def direction(self):
+        return self.directions[self.index]
+
+    def neighbour(self, cell, direction):
+        return ((cell[0] + direction[0]) % self.width, (cell[1] + direction[1]) % self.height)
+
+    def is_blocked(self, cell):
+        return self.field.hazards.dist[cell[1] * self.width + cell[0]] == 0 or cell in self.occupied
+
+    def safe_directions(self):
+        """Directions that do not reverse and do not crash on the next tick."""
+        dx, dy = self.direction
+        head = self.head
+        return [d for d in DIRECTIONS
+                if (d[0] != -dx or d[1] != -dy) and not self.is_blocked(self.neighbour(head, d))]
+
+    def to_sim(self):
+        """SimState of this position with the viewing snake as snake 0."""
+        order = [self.index] + [i for i in range(len(self.bodies)) if i != self.index]
+        return SimState.from_position(
+            [(self.bodies[i], self.directions[i]) for i in order],
+            self.obstacles, self.food, self.special_food, self.ice,
+            self.mode, speed=self.speed, width=self.width, height=self.height,
+            special_ticks=self.special_ticks)
+
+
+class Controller:
+    name = 'controller'
+    deadline = None  # perf_counter() time the runner needs the move by, if any
+
+    def reset(self):
+        """Called when a new game starts."""
+
+    def choose(self, view):
+        """Return the direction to take on the next tick."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release worker processes and the like; called once play is over."""
+
+
+class GreedyController(Controller):
+    """The original AI: the safe move that gets closest to the food, skipping dead ends."""
+
+    name = 'greedy'
+
+    def choose(self, view):
+        safe = view.safe_directions()
+        if not safe:
+            return view.direction  # اگر هیچ مسیری ایمن نبود، همان جهت را ادامه دهد
+        food_x, food_y = view.food
+        head = view.head
+        field = view.field
+
+        def distance(d):
+            cell = view.neighbour(head, d)
+            trapped = field.is_dead_end(cell) and cell != view.food
+            return trapped, abs(cell[0] - food_x) + abs(cell[1] - food_y)  # فاصله منهتن
+
+        return min(safe, key=distance)
+
+
+class PathfinderController(Controller):
+    """BFS to the food; without a path, head for the largest open area."""
+
+    name = 'path'
+
+    def choose(self, view):
+        safe = view.safe_directions()
+        if not safe:
+            return view.direction
+        head = view.head
+        tail = view.body[-1]
+        targets = {view.food}
+        if view.special_food:
+            targets.add(view.special_food)
+
+        # BFS outwards from the cells next to the head, remembering the first step
+        first_step = {}
+        queue = deque()
+        for d in safe:
+            cell = view.neighbour(head, d)
+            first_step[cell] = d
+            queue.append(cell)
+        while queue:
+            cell = queue.popleft()
+            if cell in targets and self._room(view, cell) > len(view.body):
+                return first_step[cell]
+            for d in DIRECTIONS:
+                nxt = view.neighbour(cell, d)
+                if nxt not in first_step and (nxt == tail or not view.is_blocked(nxt)):
+                    first_step[nxt] = first_step[cell]
+                    queue.append(nxt)
+
+        return max(safe, key=lambda d: self._room(view, view.neighbour(head, d)))
+
+    @staticmethod
+    def _room(view, start, limit=GRID_WIDTH * GRID_HEIGHT):
+        """Number of free cells reachable from `start` (flood fill)."""
+        seen = {start}
+        stack = [start]
+        while stack and len(seen) < limit:
+            cell = stack.pop()
+            for d in DIRECTIONS:
+                nxt = view.neighbour(cell, d)
+                if nxt not in seen and not view.is_blocked(nxt):
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return len(seen)
+
+
+class ModelController(Controller):
+    """Learned policy over the observations of snake_env.
+
+    `policy` maps an observation to action scores (or an action index).
+    `from_npz` loads a two-layer network saved as W1, b1, W2, b2.
+    """
+
+    name = 'model'
+
+    def __init__(self, policy, observation="rays", **env_kwargs):
+        from snake_env import SnakeEnv, ACTIONS
+        self.policy = policy
+        self.actions = ACTIONS
+        self.env = SnakeEnv(observation=observation, **env_kwargs)
+
+    @classmethod
+    def from_npz(cls, path, observation="rays"):
+        import numpy as np
+        weights = np.load(path)
+        w1, b1, w2, b2 = weights['W1'], weights['b1'], weights['W2'], weights['b2']
+
+        def policy(obs):
+            hidden = np.maximum(obs.reshape(-1) @ w1 + b1, 0)
+            return hidden @ w2 + b2
+
+        return cls(policy, observation)
+
+    def choose(self, view):
+        obs = self.env.encode(view.to_sim())
+        scores = self.policy(obs)
+        if not hasattr(scores, '__len__'):
+            return self.actions[int(scores)]
+        safe = view.safe_directions()
+        ranked = sorted(range(len(self.actions)), key=lambda i: -float(scores[i]))
+        for i in ranked:
+            if self.actions[i] in safe:
+                return self.actions[i]
+        return self.actions[ranked[0]]
+
+
+class FileController(Controller):
+    """Controller loaded from a module on disk and reloaded when it changes.
+
+    The module must define ``create_controller()`` returning a Controller.
+    """
+
+    check_interval = 1.0  # seconds between mtime checks
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.mtime = None
+        self.inner = None
+        self.next_check = 0
+        self.reload()
+
+    def reload(self):
+        spec = importlib.util.spec_from_file_location(f"snake_controller_{self.name}", self.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.inner = module.create_controller()
+        self.mtime = os.path.getmtime(self.path)
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return False
+        self.next_check = now + self.check_interval
+        try:
+            if os.path.getmtime(self.path) == self.mtime:
+                return False
+            self.reload()
+        except Exception as e:
+            # Keep playing with the previous version while the file is broken
+            print(f"Could not reload {self.path}: {e}", file=sys.stderr)
+            return False
+        return True
+
+    def reset(self):
+        self.reload_if_changed()
+        self.inner.reset()
+
+    def choose(self, view):
+        self.reload_if_changed()
+        self.inner.deadline = self.deadline
+        return self.inner.choose(view)
+
+    def close(self):
+        self.inner.close()
+
+
+# Name -> Controller class, or "module:Class" for controllers imported on first use
+CONTROLLERS = {
+    'greedy': GreedyController,
+    'path': PathfinderController,
+    'mcts': 'snake_mcts:MCTSController',
+    'hamilton': 'snake_hamilton:HamiltonController',
+}
+
+
+def _option(value):
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return value
+
+
+def make_controller(spec):
+    """Create a controller from a registered name, a ``.py`` or a ``.npz`` path.
+
+    A registered name may be followed by constructor options,
+    ``"mcts:workers=4,budget=0.02"``.
+    """
+    if isinstance(spec, Controller):
+        return spec
+    name, _, options = spec.partition(':')
+    if name in CONTROLLERS:
+        factory = CONTROLLERS[name]
+        if isinstance(factory, str):
+            module, _, attr = factory.partition(':')
+            factory = CONTROLLERS[name] = getattr(importlib.import_module(module), attr)
+        kwargs = {}
+        for option in filter(None, options.split(',')):
+            key, _, value = option.partition('=')
+            kwargs[key.strip()] = _option(value.strip())
+        return factory(**kwargs)
+    if spec.endswith('.py'):
+        return FileController(spec)
+    if spec.endswith('.npz'):
+        return ModelController.from_npz(spec)
+    raise ValueError(f"unknown controller: {spec}")
+
+
+class ControllerRunner:
+    """Runs a controller on a worker thread with a per-move deadline.
+
+    Call `submit` as soon as a tick has been applied and `collect` right
+    before the next one.  If the controller has not answered by the deadline,
+    `collect` returns the last move that is still safe instead.
+    """
+
+    def __init__(self, controller, budget=0.05):
+        self.controller = controller
+        self.budget = budget
+        self.moves = 0
+        self.overruns = 0
+        self.worst = 0.0
+        self.latency = None  # seconds the last collected move took, None if it overran
+        self._last_move = None
+        self._view = None
+        self._deadline = 0
+        self._request = 0
+        self._result = None  # (request, direction, seconds)
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._work, name=f"ai-{controller.name}", daemon=True)
+        self._thread.start()
+
+    def reset(self):
+        with self._cond:
+            self._view = None
+            self._result = None
+            self._last_move = None
+            self._request += 1
+        self.controller.reset()
+
+    def submit(self, view, budget=None):
+        with self._cond:
+            self._request += 1
+            self._view = view
+            self._deadline = time.perf_counter() + (self.budget if budget is None else budget)
+            self._cond.notify_all()
+
+    def submit_game(self, game, index, budget=None):
+        self.submit(BoardView.from_game(game, index), budget)
+
+    def collect(self):
+        """Decision for the last submitted view, or the fallback move."""
+        with self._cond:
+            view = self._view
+            if view is None:
+                return None
+            request = self._request
+            while self._result is None or self._result[0] != request:
+                remaining = self._deadline - time.perf_counter()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    break
+            self._view = None
+            self.moves += 1
+            if self._result is not None and self._result[0] == request:
+                _, direction, self.latency = self._result
+            else:
+                self.overruns += 1
+                self.latency = None
+                direction = self._fallback(view)
+        self._last_move = direction
+        return direction
+
+    def _fallback(self, view):
+        safe = view.safe_directions()
+        if self._last_move in safe:
+            return self._last_move
+        return safe[0] if safe else view.direction
+
+    def close(self):
+        self.controller.close()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while self._view is None or (self._result is not None and
+                                             self._result[0] == self._request):
+                    self._cond.wait()
+                request, view = self._request, self._view
+                self.controller.deadline = self._deadline
+            start = time.perf_counter()
+            try:
+                direction = self.controller.choose(view)
+            except Exception as e:
+                print(f"Controller {self.controller.name} failed: {e}", file=sys.stderr)
+                direction = self._fallback(view)
+            elapsed = time.perf_counter() - start
+            with self._cond:
+                self.worst = max(self.worst, elapsed)
+                self._result = (request, direction, elapsed)
+                self._cond.notify_all()
+
+
+def benchmark(controllers, games=20, difficulty="MEDIUM", mode=NORMAL, seed=0, max_ticks=5000):
+    """Play the same seeded single-snake games with each controller."""
+    results = {}
+    for spec in controllers:
+        controller = make_controller(spec)
+        scores = []
+        ticks = 0
+        thinking = 0.0
+        for game in range(games):
+            state = SimState.new_game(difficulty, mode, seed + game)
+            controller.reset()
+            while not state.done and state.tick < max_ticks:
+                start = time.perf_counter()
+                direction = controller.choose(BoardView.from_sim(state, 0))
+                thinking += time.perf_counter() - start
+                if state.step((direction,))[0] in CRASHES:
+                    break
+            scores.append(state.snakes[0].score)
+            ticks += state.tick
+        controller.close()
+        results[controller.name] = {
+            'mean_score': sum(scores) / len(scores),
+            'best_score': max(scores),
+            'mean_ticks': ticks / games,
+            'ms_per_move': 1000 * thinking / max(ticks, 1),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snake AI controller tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench = sub.add_parser('bench', help="compare controllers on the same seeded games")
+    bench.add_argument('controllers', nargs='+',
+                       help="names (with options, e.g. mcts:workers=4), .py plugins or .npz models")
+    bench.add_argument('--games', type=int, default=20)
+    bench.add_argument('--difficulty', default="MEDIUM", choices=["EASY", "MEDIUM", "HARD"])
+    bench.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.controllers, args.games, args.difficulty, seed=args.seed)
+    print(f"{'controller':<16}{'mean':>8}{'best':>8}{'ticks':>10}{'ms/move':>10}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['mean_score']:>8.1f}{r['best_score']:>8}"
+              f"{r['mean_ticks']:>10.0f}{r['ms_per_move']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
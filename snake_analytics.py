@@ -0,0 +1,346 @@
+"""Offline gameplay analytics for balance tuning.
+
+Games are streamed in, either leaderboard submissions re-played through
+SimState or fresh headless runs of a controller, in batches on a process
+pool.  Each game becomes one row of a columnar store and is folded into a
+set of fixed-size aggregates, so memory depends on the batch size and the
+board, never on how many games have been ingested.  A store directory holds:
+
+* ``columns/<name>.bin``  one raw little-endian array per column (seed,
+  difficulty, mode, score, ticks, death cause and cell, foods, specials,
+  slips), appended batch by batch and read back with np.memmap,
+* ``aggregates.npz``      per difficulty and mode: game and death-cause
+  counts, heatmaps of death cells, food and special-food spawns, and
+  score-versus-tick curves (score sum and games alive every TICK_BUCKET
+  ticks).  Re-running ingest adds to what is there.
+
+    python snake_analytics.py replay submissions.jsonl --store analytics
+    python snake_analytics.py simulate greedy --games 100000 --difficulty HARD --mode 2
+    python snake_analytics.py report --store analytics --heatmap deaths
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from snake_constants import GRID_WIDTH, GRID_HEIGHT, DIRECTIONS, NORMAL, DIFFICULTY_SPEED
+from snake_rules import RULESETS
+from snake_sim import SimState, CRASHES
+from snake_verify import read_submissions
+
+STORE_DIR = 'analytics'
+DIFFICULTIES = list(DIFFICULTY_SPEED)
+CAUSES = CRASHES + ('none',)  # 'none': still alive when the game was cut off
+TICK_BUCKET = 100  # ticks between points of the score curves
+CURVE_BUCKETS = 200
+MAX_TICKS = 20000
+BATCH = 256  # games per task
+
+COLUMNS = (
+    ('seed', '<u4'),
+    ('difficulty', 'u1'),
+    ('mode', 'u1'),
+    ('score', '<i4'),
+    ('ticks', '<i4'),
+    ('cause', 'u1'),
+    ('death_x', 'i1'),
+    ('death_y', 'i1'),
+    ('foods', '<i4'),
+    ('specials', '<i4'),
+    ('slips', '<i4'),
+)
+
+
+class Aggregates:
+    """Counters over many games; two of them can be merged."""
+
+    FIELDS = ('games', 'causes', 'deaths', 'food', 'special', 'score_sum', 'alive')
+
+    def __init__(self):
+        shape = (len(DIFFICULTIES), len(RULESETS))
+        board = shape + (GRID_HEIGHT, GRID_WIDTH)
+        self.games = np.zeros(shape, np.int64)
+        self.causes = np.zeros(shape + (len(CAUSES),), np.int64)
+        self.deaths = np.zeros(board, np.int64)
+        self.food = np.zeros(board, np.int64)
+        self.special = np.zeros(board, np.int64)
+        self.score_sum = np.zeros(shape + (CURVE_BUCKETS,), np.int64)
+        self.alive = np.zeros(shape + (CURVE_BUCKETS,), np.int64)
+
+    def add(self, game):
+        d, m = game['difficulty'], game['mode']
+        self.games[d, m] += 1
+        self.causes[d, m, game['cause']] += 1
+        if game['death_x'] >= 0:
+            self.deaths[d, m, game['death_y'], game['death_x']] += 1
+        for cells, heatmap in ((game['food_cells'], self.food), (game['special_cells'], self.special)):
+            if cells:
+                xs, ys = zip(*cells)
+                np.add.at(heatmap[d, m], (ys, xs), 1)
+        curve = np.asarray(game['curve'][:CURVE_BUCKETS], np.int64)
+        self.score_sum[d, m, :len(curve)] += curve
+        self.alive[d, m, :len(curve)] += 1
+
+    def merge(self, other):
+        for name in self.FIELDS:
+            getattr(self, name).__iadd__(getattr(other, name))
+
+    def save(self, path):
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, tick_bucket=TICK_BUCKET,
+                            **{name: getattr(self, name) for name in self.FIELDS})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        aggregates = cls()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                for name in cls.FIELDS:
+                    setattr(aggregates, name, data[name])
+        return aggregates
+
+
+class ColumnStore:
+    """Append-only columns, one file each."""
+
+    def __init__(self, directory):
+        self.directory = os.path.join(directory, 'columns')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name + '.bin')
+
+    def append(self, rows):
+        for name, dtype in COLUMNS:
+            with open(self.path(name), 'ab') as f:
+                np.asarray(rows[name], dtype).tofile(f)
+
+    def __len__(self):
+        name, dtype = COLUMNS[0]
+        path = self.path(name)
+        return os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+
+    def column(self, name):
+        """Read-only memory map of a column; pages are loaded on access."""
+        dtype = dict(COLUMNS)[name]
+        if not len(self):
+            return np.zeros(0, dtype)
+        return np.memmap(self.path(name), dtype, mode='r', shape=(len(self),))
+
+
+def play(state, choose, max_ticks=MAX_TICKS):
+    """Play a single-snake game to its end; returns one game record.
+
+    `choose(state)` gives the direction for the next tick (or None to keep
+    going).
+    """
+    snake = state.snakes[0]
+    food_cells = [state.food]
+    special_cells = []
+    curve = []
+    slips = specials = 0
+    cause = len(CAUSES) - 1
+    death = (-1, -1)
+    while state.tick < max_ticks:
+        had_special = state.special_food is not None
+        outcome = state.step((choose(state),))[0]
+        slips += snake.slipping
+        if outcome in CRASHES:
+            cause = CRASHES.index(outcome)
+            (x, y), (dx, dy) = snake.body[0], snake.direction
+            death = ((x + dx) % state.width, (y + dy) % state.height)
+            break
+        if state.food != food_cells[-1] and state.food is not None:
+            food_cells.append(state.food)
+        if state.special_food is not None and not had_special:
+            specials += 1
+            special_cells.append(state.special_food)
+        if state.tick % TICK_BUCKET == 0:
+            curve.append(snake.score)
+    return {
+        'difficulty': DIFFICULTIES.index(state.difficulty), 'mode': state.mode,
+        'score': snake.score, 'ticks': state.tick, 'cause': cause,
+        'death_x': death[0], 'death_y': death[1],
+        'foods': len(food_cells), 'specials': specials, 'slips': slips,
+        'food_cells': food_cells, 'special_cells': special_cells, 'curve': curve,
+    }
+
+
+def replay_submission(submission, max_ticks=MAX_TICKS):
+    state = SimState.new_game(submission['difficulty'], submission['mode'], submission['seed'],
+                              obstacles=[tuple(c) for c in submission['obstacles']],
+                              ice=[tuple(c) for c in submission['ice']])
+    turns = iter(submission['turns'])
+    turn = next(turns, None)
+    action = state.snakes[0].direction
+
+    def choose(state):
+        nonlocal turn, action
+        while turn is not None and turn[0] <= state.tick + 1:
+            action = DIRECTIONS[turn[1]]
+            turn = next(turns, None)
+        return action
+    game = play(state, choose, min(max_ticks, int(submission['ticks'])))
+    game['seed'] = submission['seed']
+    return game
+
+
+_controllers = {}
+
+
+def simulate_game(spec, difficulty, mode, seed, max_ticks=MAX_TICKS):
+    from snake_ai import BoardView, make_controller
+    controller = _controllers.get(spec)
+    if controller is None:
+        controller = _controllers[spec] = make_controller(spec)
+    controller.reset()
+    state = SimState.new_game(difficulty, mode, seed)
+    game = play(state, lambda state: controller.choose(BoardView.from_sim(state, 0)), max_ticks)
+    game['seed'] = seed
+    return game
+
+
+def summarize(tasks, max_ticks=MAX_TICKS):
+    """Worker: play a batch of games; returns (column rows, Aggregates)."""
+    rows = {name: [] for name, _ in COLUMNS}
+    aggregates = Aggregates()
+    for task in tasks:
+        if isinstance(task, dict):
+            game = replay_submission(task, max_ticks)
+        else:
+            game = simulate_game(*task, max_ticks=max_ticks)
+        for name in rows:
+            rows[name].append(game[name])
+        aggregates.add(game)
+    return rows, aggregates
+
+
+def batches(items, size=BATCH):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest(tasks, store=STORE_DIR, workers=None, max_ticks=MAX_TICKS, in_flight=None):
+    """Play `tasks` (submissions, or (spec, difficulty, mode, seed) tuples) into `store`.
+
+    At most `in_flight` batches are queued, so an input of any length is
+    streamed.  Aggregates are saved after every batch; returns the number
+    of games added.
+    """
+    workers = workers or os.cpu_count() or 1
+    in_flight = in_flight or 2 * workers
+    columns = ColumnStore(store)
+    path = os.path.join(store, 'aggregates.npz')
+    aggregates = Aggregates.load(path)
+    added = 0
+
+    def collect(future):
+        nonlocal added
+        rows, partial = future.result()
+        columns.append(rows)
+        aggregates.merge(partial)
+        aggregates.save(path)
+        added += len(rows['score'])
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = set()
+        for batch in batches(tasks):
+            pending.add(pool.submit(summarize, batch, max_ticks))
+            if len(pending) >= in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+        for future in as_completed(pending):
+            collect(future)
+    return added
+
+
+def simulation_tasks(spec, games, difficulties, modes, seed=0):
+    for i in range(games):
+        for difficulty in difficulties:
+            for mode in modes:
+                yield spec, difficulty, mode, seed + i
+
+
+def shade(heatmap):
+    """ASCII rendering of a board heatmap, darker is more."""
+    ramp = " .:-=+*#%@"
+    top = heatmap.max()
+    if top == 0:
+        return "(no data)"
+    levels = (heatmap * (len(ramp) - 1) + top - 1) // top
+    return "\n".join("".join(ramp[v] for v in row) for row in levels)
+
+
+def report(store=STORE_DIR, heatmap=None, curve_step=10):
+    aggregates = Aggregates.load(os.path.join(store, 'aggregates.npz'))
+    columns = ColumnStore(store)
+    difficulty, mode = columns.column('difficulty'), columns.column('mode')
+    score = columns.column('score')
+    lines = [f"{len(columns)} games in {store}"]
+    for d, name in enumerate(DIFFICULTIES):
+        for m, rules in RULESETS.items():
+            games = int(aggregates.games[d, m])
+            if not games:
+                continue
+            causes = ", ".join(f"{cause} {100 * n / games:.1f}%"
+                               for cause, n in zip(CAUSES, aggregates.causes[d, m]) if n)
+            scores = score[(difficulty == d) & (mode == m)]
+            lines.append(f"\n{name} / {rules.name}: {games} games, score median "
+                         f"{np.median(scores):.0f}, p90 {np.percentile(scores, 90):.0f}")
+            lines.append(f"  deaths: {causes}")
+            alive = aggregates.alive[d, m]
+            points = [f"{(b + 1) * TICK_BUCKET}:{aggregates.score_sum[d, m, b] / alive[b]:.0f}"
+                      for b in range(curve_step - 1, CURVE_BUCKETS, curve_step) if alive[b]]
+            if points:
+                lines.append("  mean score by tick (alive games): " + " ".join(points))
+            if heatmap:
+                lines.append(shade(getattr(aggregates, heatmap)[d, m]))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gameplay analytics over recorded and simulated games")
+    sub = parser.add_subparsers(dest='command', required=True)
+    replay = sub.add_parser('replay', help="ingest leaderboard submissions")
+    replay.add_argument('path', help="JSON-lines file of submissions")
+    simulate = sub.add_parser('simulate', help="ingest headless games of a controller")
+    simulate.add_argument('controller')
+    simulate.add_argument('--games', type=int, default=1000, help="per difficulty and mode")
+    simulate.add_argument('--difficulty', action='append', choices=DIFFICULTIES)
+    simulate.add_argument('--mode', action='append', type=int,
+                          choices=[m for m, rules in RULESETS.items() if rules.snakes == 1])
+    simulate.add_argument('--seed', type=int, default=0)
+    for command in (replay, simulate):
+        command.add_argument('--store', default=STORE_DIR)
+        command.add_argument('--workers', type=int, default=None)
+        command.add_argument('--max-ticks', type=int, default=MAX_TICKS)
+    show = sub.add_parser('report', help="print the aggregates")
+    show.add_argument('--store', default=STORE_DIR)
+    show.add_argument('--heatmap', choices=['deaths', 'food', 'special'])
+    args = parser.parse_args(argv)
+
+    if args.command == 'report':
+        print(report(args.store, args.heatmap))
+        return
+    if args.command == 'replay':
+        tasks = (s for s in read_submissions(args.path) if RULESETS[s['mode']].snakes == 1)
+    else:
+        tasks = simulation_tasks(args.controller, args.games, args.difficulty or DIFFICULTIES,
+                                 args.mode or [NORMAL], args.seed)
+    start = time.perf_counter()
+    added = ingest(tasks, args.store, args.workers, args.max_ticks)
+    print(f"{added} games added in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Sound playback through a fixed pool of mixer channels.
+
+The game asks for sounds by name with `AudioManager.play` and marks the end
+of a tick (or frame) with `flush`.  Requests for the same sound within one
+flush are merged, a sound is not restarted more often than its minimum
+interval, and the batch is handed to a dispatch thread so the game loop never
+waits on the mixer.  The thread plays each sound on a free channel of the
+pool; when all are busy it takes over the channel playing the least
+important sound, or drops the new one if nothing playing matters less.
+"""
+import threading
+import time
+from collections import Counter, deque
+
+# Higher plays first and may interrupt lower
+SOUND_PRIORITIES = {'crash': 3, 'special': 2, 'eat': 1, 'slip': 1, 'click': 0}
+MIN_INTERVAL = 0.05  # seconds between two starts of the same sound
+CHANNELS = 4
+
+
+class AudioManager:
+    def __init__(self, sounds, channels=CHANNELS, priorities=SOUND_PRIORITIES,
+                 min_interval=MIN_INTERVAL):
+        self.sounds = sounds  # name -> object with play(), e.g. a SoundBank
+        self.num_channels = channels
+        self.priorities = priorities
+        self.min_interval = min_interval
+        self.stats = Counter()
+        self.pending = {}  # name -> request time, for the current tick
+        self.last_started = {}
+        self.batches = deque()
+        self.channels = None  # opened by the dispatch thread with the mixer
+        self.channel_priority = [-1] * channels
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def play(self, name):
+        now = time.perf_counter()
+        if name in self.pending:
+            self.stats['merged'] += 1
+            return
+        if now - self.last_started.get(name, -self.min_interval) < self.min_interval:
+            self.stats['rate_limited'] += 1
+            return
+        self.last_started[name] = now
+        self.pending[name] = now
+
+    def flush(self):
+        """End of a tick: hand the collected sounds to the dispatch thread."""
+        if not self.pending:
+            return
+        batch = sorted(self.pending, key=lambda name: -self.priorities.get(name, 0))
+        self.pending = {}
+        with self._cond:
+            self.batches.append(batch)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name="audio", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self.batches:
+                    self._cond.wait()
+                batch = self.batches.popleft()
+            for name in batch:
+                self._start(name)
+
+    def _open_channels(self):
+        import pygame
+        pygame.mixer.set_num_channels(self.num_channels)
+        return [pygame.mixer.Channel(i) for i in range(self.num_channels)]
+
+    def _start(self, name):
+        sound = self.sounds[name]  # starts the mixer on first use
+        if not hasattr(sound, 'get_length'):
+            return  # silent fallback, no mixer
+        if self.channels is None:
+            self.channels = self._open_channels()
+        priority = self.priorities.get(name, 0)
+
+        slot = None
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                slot = i
+                break
+        if slot is None:
+            lowest = min(range(len(self.channels)), key=self.channel_priority.__getitem__)
+            if self.channel_priority[lowest] >= priority:
+                self.stats['dropped'] += 1
+                return
+            slot = lowest
+            self.stats['interrupted'] += 1
+        self.channels[slot].play(sound)
+        self.channel_priority[slot] = priority
+        self.stats['played'] += 1
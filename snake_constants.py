@@ -0,0 +1,38 @@
+"""Board geometry, directions, modes and rule tuning shared by every module.
+
+Kept free of pygame so headless tools (training, search, verification) can
+import it without opening a window or an audio device.
+"""
+
+# Board geometry
+GAME_WIDTH, GAME_HEIGHT = 600, 600
+GRID_SIZE = 20
+GRID_WIDTH = GAME_WIDTH // GRID_SIZE
+GRID_HEIGHT = GAME_HEIGHT // GRID_SIZE
+
+# Directions
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+
+# Game modes
+NORMAL = 0
+DEAD_OF_NIGHT = 1
+WINTER = 2
+MULTIPLAYER = 3  # حالت چند نفره
+AI_MODE = 4  # حالت هوش مصنوعی
+
+# Rule tuning
+DIFFICULTY_SPEED = {"EASY": 8, "MEDIUM": 12, "HARD": 15}
+DIFFICULTY_OBSTACLES = {"EASY": 0, "MEDIUM": 5, "HARD": 10}
+ICE_BLOCK_COUNT = 10
+MAX_SPEED = 20
+MIN_SPEED = 5
+FOOD_SCORE = 10
+SPECIAL_FOOD_SCORE = 20
+SPEEDUP_EVERY = 30  # points
+SPECIAL_FOOD_CHANCE = 0.05  # per move
+SPECIAL_FOOD_LIFETIME = 10  # seconds
+SLIP_CHANCE = 0.3
@@ -0,0 +1,286 @@
+"""Gym-style training environment on top of the headless rules in snake_sim.
+
+    env = SnakeEnv(observation="window", difficulty="HARD")
+    obs, info = env.reset(seed=0)
+    obs, reward, terminated, truncated, info = env.step(action)
+
+Actions are indices into ACTIONS (absolute directions) or, with
+``relative_actions=True``, 0 = straight, 1 = turn left, 2 = turn right.
+
+Observations are written into buffers allocated once in ``__init__``; the
+returned array is always the same object, so copy it if you keep it.
+
+* ``"window"`` - uint8 ``(size, size)`` egocentric window of cell codes
+  (OBS_* below), rotated so the snake is heading up.
+* ``"planes"`` - uint8 ``(len(PLANES), height, width)`` one-hot planes built
+  from the occupancy grid.
+* ``"rays"``   - float32 ``(8 * 3 + 4,)``: for each of eight rays the inverse
+  distance to the nearest hazard, food and own body, then the heading.
+"""
+import numpy as np
+
+from snake_constants import UP, DOWN, LEFT, RIGHT, NORMAL
+from snake_sim import (
+    SimState, snake_count, EMPTY, WALL, OBSTACLE, BODY,
+    ATE_FOOD, ATE_SPECIAL, CRASHES,
+)
+
+ACTIONS = (UP, DOWN, LEFT, RIGHT)
+TURN_LEFT = {UP: LEFT, LEFT: DOWN, DOWN: RIGHT, RIGHT: UP}
+TURN_RIGHT = {UP: RIGHT, RIGHT: DOWN, DOWN: LEFT, LEFT: UP}
+
+# Cell codes used by the "window" observation
+OBS_EMPTY = EMPTY
+OBS_WALL = WALL
+OBS_OBSTACLE = OBSTACLE
+OBS_SELF = BODY
+OBS_OTHER = BODY + 1
+OBS_FOOD = 5
+OBS_SPECIAL = 6
+OBS_ICE = 7
+
+PLANES = ('hazard', 'body', 'head', 'other', 'food', 'special', 'ice')
+
+DEFAULT_REWARDS = {
+    'food': 1.0,
+    'special': 2.0,
+    'survival': 0.0,
+    'death': -1.0,
+}
+
+RAY_DIRECTIONS = ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))
+# np.rot90 turns that bring each heading to the top of the window
+_ROTATIONS = {UP: 0, RIGHT: 1, DOWN: 2, LEFT: 3}
+
+
+class SnakeEnv:
+    def __init__(self, observation="window", difficulty="MEDIUM", mode=NORMAL,
+                 window_size=11, rewards=None, max_steps=10000,
+                 relative_actions=False, seed=None, out=None):
+        if observation not in ("window", "planes", "rays"):
+            raise ValueError(f"unknown observation type: {observation}")
+        if snake_count(mode) != 1:
+            raise ValueError("SnakeEnv controls a single snake; use a one-snake mode")
+        if window_size % 2 == 0:
+            raise ValueError("window_size must be odd")
+        self.observation = observation
+        self.difficulty = difficulty
+        self.mode = mode
+        self.window_size = window_size
+        self.rewards = dict(DEFAULT_REWARDS, **(rewards or {}))
+        self.max_steps = max_steps
+        self.relative_actions = relative_actions
+        self.n_actions = 3 if relative_actions else len(ACTIONS)
+        self._seed = seed
+        self.state = SimState.new_game(difficulty, mode, seed)
+
+        width, height = self.state.width, self.state.height
+        if observation == "window":
+            self.observation_shape = (window_size, window_size)
+            dtype = np.uint8
+            r = window_size // 2
+            self._padded = np.full((height + 2 * r, width + 2 * r), OBS_WALL, dtype=np.uint8)
+            self._interior = self._padded[r:r + height, r:r + width]
+            self._ice_mask = np.zeros((height, width), dtype=bool)
+            self._scratch = np.zeros((height, width), dtype=bool)
+        elif observation == "planes":
+            self.observation_shape = (len(PLANES), height, width)
+            dtype = np.uint8
+            self._scratch = np.zeros((height, width), dtype=bool)
+        else:
+            self.observation_shape = (len(RAY_DIRECTIONS) * 3 + 4,)
+            dtype = np.float32
+
+        if out is None:
+            out = np.zeros(self.observation_shape, dtype=dtype)
+        elif out.shape != self.observation_shape or out.dtype != dtype:
+            raise ValueError("out buffer has the wrong shape or dtype")
+        self.obs = out
+
+    # -- gym API -----------------------------------------------------------
+    def reset(self, seed=None):
+        if seed is None and self._seed is not None:
+            seed, self._seed = self._seed, None
+        self.encode(SimState.new_game(self.difficulty, self.mode, seed))
+        return self.obs, self._info()
+
+    def encode(self, state):
+        """Make `state` the current state and write its observation.
+
+        Also lets controllers encode positions that did not come from
+        `reset`, e.g. a live game converted with `BoardView.to_sim`.
+        """
+        self.state = state
+        self._grid = np.frombuffer(state.grid, dtype=np.uint8).reshape(state.height, state.width)
+
+        if self.observation == "window":
+            self._ice_mask.fill(False)
+            for x, y in state.ice:
+                self._ice_mask[y, x] = True
+        elif self.observation == "planes":
+            # Walls, obstacles and ice never move during a game
+            planes = self.obs
+            np.equal(self._grid, WALL, out=planes[0])
+            np.equal(self._grid, OBSTACLE, out=self._scratch)
+            np.logical_or(planes[0], self._scratch, out=planes[0])
+            planes[6].fill(0)
+            for x, y in state.ice:
+                planes[6, y, x] = 1
+        self._observe()
+        return self.obs
+
+    def step(self, action):
+        state = self.state
+        snake = state.snakes[0]
+        if self.relative_actions:
+            if action == 1:
+                direction = TURN_LEFT[snake.direction]
+            elif action == 2:
+                direction = TURN_RIGHT[snake.direction]
+            else:
+                direction = snake.direction
+        else:
+            direction = ACTIONS[action]
+
+        outcome = state.step((direction,))[0]
+        rewards = self.rewards
+        reward = rewards['survival']
+        if outcome == ATE_FOOD:
+            reward += rewards['food']
+        elif outcome == ATE_SPECIAL:
+            reward += rewards['special']
+        terminated = outcome in CRASHES
+        if terminated:
+            reward = rewards['death']
+        truncated = not terminated and state.tick >= self.max_steps
+
+        if not terminated:
+            self._observe()
+        info = self._info()
+        info['outcome'] = outcome
+        return self.obs, reward, terminated, truncated, info
+
+    def _info(self):
+        state = self.state
+        return {'score': state.snakes[0].score, 'tick': state.tick,
+                'length': len(state.snakes[0].body)}
+
+    # -- observation encoders ----------------------------------------------
+    def _observe(self):
+        if self.observation == "window":
+            self._observe_window()
+        elif self.observation == "planes":
+            self._observe_planes()
+        else:
+            self._observe_rays()
+
+    def _observe_window(self):
+        state = self.state
+        interior = self._interior
+        np.copyto(interior, self._grid)
+        np.equal(interior, EMPTY, out=self._scratch)
+        np.logical_and(self._scratch, self._ice_mask, out=self._scratch)
+        np.copyto(interior, OBS_ICE, where=self._scratch)
+        fx, fy = state.food
+        interior[fy, fx] = OBS_FOOD
+        if state.special_food is not None:
+            sx, sy = state.special_food
+            interior[sy, sx] = OBS_SPECIAL
+
+        snake = state.snakes[0]
+        hx, hy = snake.body[0]
+        size = self.window_size
+        window = self._padded[hy:hy + size, hx:hx + size]
+        np.copyto(self.obs, np.rot90(window, _ROTATIONS[snake.direction]))
+
+    def _observe_planes(self):
+        state = self.state
+        planes = self.obs
+        grid = self._grid
+        np.equal(grid, BODY, out=planes[1])
+        np.greater(grid, BODY, out=planes[3])
+        planes[2].fill(0)
+        hx, hy = state.snakes[0].body[0]
+        planes[2, hy, hx] = 1
+        planes[4].fill(0)
+        fx, fy = state.food
+        planes[4, fy, fx] = 1
+        planes[5].fill(0)
+        if state.special_food is not None:
+            sx, sy = state.special_food
+            planes[5, sy, sx] = 1
+
+    def _observe_rays(self):
+        state = self.state
+        obs = self.obs
+        grid, width, height = state.grid, state.width, state.height
+        snake = state.snakes[0]
+        hx, hy = snake.body[0]
+        food = state.food
+        special = state.special_food
+        for r, (dx, dy) in enumerate(RAY_DIRECTIONS):
+            hazard = food_seen = body = 0.0
+            x, y, dist = hx + dx, hy + dy, 1
+            while 0 <= x < width and 0 <= y < height:
+                code = grid[y * width + x]
+                if code == BODY and not body:
+                    body = 1.0 / dist
+                if code != EMPTY and not hazard:
+                    hazard = 1.0 / dist
+                if not food_seen and ((x, y) == food or (x, y) == special):
+                    food_seen = 1.0 / dist
+                if hazard and code in (WALL, OBSTACLE):
+                    break
+                x += dx
+                y += dy
+                dist += 1
+            base = r * 3
+            obs[base] = hazard
+            obs[base + 1] = food_seen
+            obs[base + 2] = body
+        heading = len(RAY_DIRECTIONS) * 3
+        for i, direction in enumerate(ACTIONS):
+            obs[heading + i] = 1.0 if snake.direction == direction else 0.0
+
+
+class VectorSnakeEnv:
+    """Runs several SnakeEnv instances into one batched observation buffer.
+
+    Finished games are reset automatically; the observation returned for
+    such an env is the first one of its new game and the final info is kept
+    under ``info['final_info']``.
+    """
+
+    def __init__(self, num_envs, seed=None, **kwargs):
+        probe = SnakeEnv(**kwargs)
+        self.num_envs = num_envs
+        self.observation_shape = probe.observation_shape
+        self.n_actions = probe.n_actions
+        self.obs = np.zeros((num_envs,) + probe.observation_shape, dtype=probe.obs.dtype)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.terminated = np.zeros(num_envs, dtype=bool)
+        self.truncated = np.zeros(num_envs, dtype=bool)
+        self.envs = [SnakeEnv(out=self.obs[i], **kwargs) for i in range(num_envs)]
+        self._seed = seed
+
+    def reset(self, seed=None):
+        if seed is None:
+            seed = self._seed
+        infos = []
+        for i, env in enumerate(self.envs):
+            infos.append(env.reset(None if seed is None else seed + i)[1])
+        return self.obs, infos
+
+    def step(self, actions):
+        infos = []
+        for i, env in enumerate(self.envs):
+            _, reward, terminated, truncated, info = env.step(int(actions[i]))
+            if terminated or truncated:
+                final_info = info
+                info = env.reset()[1]
+                info['final_info'] = final_info
+            self.rewards[i] = reward
+            self.terminated[i] = terminated
+            self.truncated[i] = truncated
+            infos.append(info)
+        return self.obs, self.rewards, self.terminated, self.truncated, infos
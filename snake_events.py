@@ -0,0 +1,94 @@
+"""Typed game events and a per-tick event bus.
+
+The rules only emit events; audio, particles, persistence and statistics
+are subscribers.  Events are collected during a tick and handed to every
+enabled subscriber as one batch by `EventBus.flush`.  While no subscriber is
+enabled, `emit` does nothing, so headless runs pay nothing for presentation.
+"""
+from collections import Counter, namedtuple
+
+FoodEaten = namedtuple('FoodEaten', 'player pos score')
+SpecialFoodEaten = namedtuple('SpecialFoodEaten', 'player pos score')
+Slip = namedtuple('Slip', 'player pos')
+Crash = namedtuple('Crash', 'player pos')
+SpeedChanged = namedtuple('SpeedChanged', 'speed')
+HighScore = namedtuple('HighScore', 'score')
+
+
+class Subscriber:
+    """Base class for event consumers.
+
+    `events` lists the event types to receive; leave it empty for all.
+    """
+
+    name = 'subscriber'
+    events = ()
+
+    def handle(self, events):
+        raise NotImplementedError
+
+
+class EventBus:
+    def __init__(self):
+        self.subscribers = []
+        self.disabled = set()
+        self.pending = []
+        self.active = False
+
+    def subscribe(self, subscriber, enabled=True):
+        self.subscribers.append(subscriber)
+        self.set_enabled(subscriber.name, enabled)
+        return subscriber
+
+    def unsubscribe(self, name):
+        self.subscribers = [s for s in self.subscribers if s.name != name]
+        self.disabled.discard(name)
+        self._refresh()
+
+    def set_enabled(self, name, enabled):
+        if enabled:
+            self.disabled.discard(name)
+        else:
+            self.disabled.add(name)
+        self._refresh()
+
+    def is_enabled(self, name):
+        return name not in self.disabled
+
+    def _refresh(self):
+        self.active = any(s.name not in self.disabled for s in self.subscribers)
+        if not self.active:
+            self.pending.clear()
+
+    def emit(self, event):
+        if self.active:
+            self.pending.append(event)
+
+    def flush(self):
+        """Deliver the events of the current tick."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        for subscriber in self.subscribers:
+            if subscriber.name in self.disabled:
+                continue
+            if subscriber.events:
+                events = [e for e in batch if isinstance(e, subscriber.events)]
+                if not events:
+                    continue
+            else:
+                events = batch
+            subscriber.handle(events)
+
+
+class StatsSubscriber(Subscriber):
+    """Counts events by type over the whole session."""
+
+    name = 'stats'
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def handle(self, events):
+        for event in events:
+            self.counts[type(event).__name__] += 1
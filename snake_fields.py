@@ -0,0 +1,212 @@
+"""Static distance fields for fast AI safety checks.
+
+A `HazardField` is computed once per board layout.  For every cell it stores
+the BFS distance to the nearest hazard (border or obstacle, distance 0 on the
+hazard itself), the distance to the nearest ice block, and whether the cell
+lies in a dead end - a pocket that can only be left the way it was entered.
+All tables are flat bytearrays indexed by ``y * width + x``, so checking a
+candidate move is a single lookup.
+
+When obstacles are added or removed the fields are repaired locally instead
+of being rebuilt.  `field_for_layout` shares one field per layout, so those
+changes are only allowed on a private copy (``private=True`` or `copy()`).
+"""
+from collections import deque
+
+from snake_constants import GRID_WIDTH, GRID_HEIGHT
+
+FAR = 255  # distance stored for cells that cannot reach a source
+
+
+class DistanceLayer:
+    """Multi-source BFS distances with incremental source changes."""
+
+    def __init__(self, width, height, sources=()):
+        self.width = width
+        self.height = height
+        self.sources = set()
+        self.dist = bytearray([FAR]) * (width * height)
+        self._neighbours = [self._cell_neighbours(i) for i in range(width * height)]
+        for index in sources:
+            self.sources.add(index)
+            self.dist[index] = 0
+        self._relax(deque(self.sources))
+
+    def copy(self):
+        layer = DistanceLayer.__new__(DistanceLayer)
+        layer.width, layer.height = self.width, self.height
+        layer.sources = set(self.sources)
+        layer.dist = bytearray(self.dist)
+        layer._neighbours = self._neighbours  # never changes
+        return layer
+
+    def _cell_neighbours(self, index):
+        x, y = index % self.width, index // self.width
+        cells = []
+        if x > 0:
+            cells.append(index - 1)
+        if x < self.width - 1:
+            cells.append(index + 1)
+        if y > 0:
+            cells.append(index - self.width)
+        if y < self.height - 1:
+            cells.append(index + self.width)
+        return cells
+
+    def _relax(self, queue):
+        dist, neighbours = self.dist, self._neighbours
+        while queue:
+            index = queue.popleft()
+            d = dist[index] + 1
+            if d >= FAR:
+                continue
+            for n in neighbours[index]:
+                if dist[n] > d:
+                    dist[n] = d
+                    queue.append(n)
+
+    def add_source(self, index):
+        if index in self.sources:
+            return
+        self.sources.add(index)
+        self.dist[index] = 0
+        self._relax(deque([index]))
+
+    def remove_source(self, index):
+        """Forget a source and repair only the cells that depended on it."""
+        if index not in self.sources:
+            return
+        self.sources.discard(index)
+        dist, neighbours = self.dist, self._neighbours
+
+        # Cells whose distance can be explained through the removed source
+        stale = [index]
+        stale_set = {index}
+        queue = deque([index])
+        while queue:
+            cell = queue.popleft()
+            for n in neighbours[cell]:
+                if n not in stale_set and n not in self.sources and dist[n] == dist[cell] + 1:
+                    stale_set.add(n)
+                    stale.append(n)
+                    queue.append(n)
+        for cell in stale:
+            dist[cell] = FAR
+
+        # Re-seed them from their still-valid neighbours
+        frontier = deque()
+        for cell in stale:
+            best = FAR
+            for n in neighbours[cell]:
+                if n not in stale_set and dist[n] + 1 < best:
+                    best = dist[n] + 1
+            if best < FAR:
+                dist[cell] = best
+                frontier.append(cell)
+        self._relax(frontier)
+
+
+class HazardField:
+    def __init__(self, obstacles=(), ice=(), width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.width = width
+        self.height = height
+        border = [i for i in range(width * height)
+                  if i % width in (0, width - 1) or i // width in (0, height - 1)]
+        self.border = frozenset(border)
+        self.hazards = DistanceLayer(width, height, border + [self.index(c) for c in obstacles])
+        self.ice = DistanceLayer(width, height, [self.index(c) for c in ice])
+        self.dead_end = bytearray(width * height)
+        self._mark_dead_ends()
+        self.shared = False  # set on fields handed out by field_for_layout
+
+    def copy(self):
+        """Private copy that may be changed without affecting other users."""
+        field = HazardField.__new__(HazardField)
+        field.width, field.height, field.border = self.width, self.height, self.border
+        field.hazards = self.hazards.copy()
+        field.ice = self.ice.copy()
+        field.dead_end = bytearray(self.dead_end)
+        field.shared = False
+        return field
+
+    def index(self, cell):
+        return cell[1] * self.width + cell[0]
+
+    # -- lookups -----------------------------------------------------------
+    def distance(self, cell):
+        """Steps from `cell` to the nearest border or obstacle (0 = hazard)."""
+        return self.hazards.dist[cell[1] * self.width + cell[0]]
+
+    def is_hazard(self, cell):
+        return self.hazards.dist[cell[1] * self.width + cell[0]] == 0
+
+    def ice_distance(self, cell):
+        return self.ice.dist[cell[1] * self.width + cell[0]]
+
+    def is_dead_end(self, cell):
+        return self.dead_end[cell[1] * self.width + cell[0]] == 1
+
+    # -- layout changes ----------------------------------------------------
+    def _check_private(self):
+        if self.shared:
+            raise RuntimeError("shared HazardField; change a copy() instead")
+
+    def add_obstacle(self, cell):
+        self._check_private()
+        index = self.index(cell)
+        self.hazards.add_source(index)
+        self.dead_end[index] = 0
+        self._peel(self.hazards._neighbours[index])
+
+    def remove_obstacle(self, cell):
+        self._check_private()
+        index = self.index(cell)
+        if index in self.border:
+            return
+        self.hazards.remove_source(index)
+        # Opening a cell can free a whole corridor, so re-derive the markers
+        self._mark_dead_ends()
+
+    def add_ice(self, cell):
+        self._check_private()
+        self.ice.add_source(self.index(cell))
+
+    def remove_ice(self, cell):
+        self._check_private()
+        self.ice.remove_source(self.index(cell))
+
+    # -- dead ends ---------------------------------------------------------
+    def _open_degree(self, index):
+        dist, dead = self.hazards.dist, self.dead_end
+        return sum(1 for n in self.hazards._neighbours[index] if dist[n] and not dead[n])
+
+    def _peel(self, candidates):
+        """Mark free cells with at most one open neighbour, spreading inwards."""
+        dist, dead = self.hazards.dist, self.dead_end
+        queue = deque(candidates)
+        while queue:
+            index = queue.popleft()
+            if dist[index] == 0 or dead[index] or self._open_degree(index) > 1:
+                continue
+            dead[index] = 1
+            queue.extend(self.hazards._neighbours[index])
+
+    def _mark_dead_ends(self):
+        for i in range(len(self.dead_end)):
+            self.dead_end[i] = 0
+        self._peel(range(self.width * self.height))
+
+
+_cache = {}
+
+
+def field_for_layout(obstacles, ice=(), width=GRID_WIDTH, height=GRID_HEIGHT, private=False):
+    """HazardField for a layout, shared and read-only unless `private` is set."""
+    key = (width, height, frozenset(obstacles), frozenset(ice))
+    field = _cache.get(key)
+    if field is None:
+        if len(_cache) >= 64:
+            _cache.clear()
+        field = _cache[key] = HazardField(obstacles, ice, width, height)
+        field.shared = True
+    return field.copy() if private else field
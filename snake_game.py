@@ -1,29 +1,47 @@
+import time
+
+_IMPORT_START = time.perf_counter()  # for --profile-startup
+
 import pygame
+_PYGAME_IMPORTED = time.perf_counter()  # pygame pulls in numpy and pkg_resources itself
+import argparse
 import random
-import time
 import sys
 import json
 import os
-from pygame import mixer
 import math
-import numpy as np
-
-# Initialize pygame
-pygame.init()
-mixer.init()
+import importlib.util
+import threading
+
+from snake_constants import (
+    GAME_WIDTH, GAME_HEIGHT, GRID_SIZE, GRID_WIDTH, GRID_HEIGHT,
+    UP, DOWN, LEFT, RIGHT, DIRECTIONS,
+    NORMAL, DEAD_OF_NIGHT, WINTER, MULTIPLAYER, AI_MODE,
+    SPECIAL_FOOD_CHANCE, SPECIAL_FOOD_LIFETIME, SLIP_CHANCE, DIFFICULTY_SPEED,
+    MAX_SPEED, MIN_SPEED, FOOD_SCORE, SPECIAL_FOOD_SCORE, SPEEDUP_EVERY,
+)
+from snake_ai import ControllerRunner, make_controller
+from snake_fields import field_for_layout
+from snake_events import (
+    EventBus, Subscriber, StatsSubscriber,
+    FoodEaten, SpecialFoodEaten, Slip, Crash, SpeedChanged, HighScore,
+)
+from snake_input import InputQueue, LatencyMeter, is_reversal
+from snake_quality import QualityGovernor, TIER_NAMES
+from snake_rewind import RewindBuffer
+from snake_levels import LevelLibrary, LEVEL_DIR
+from snake_audio import AudioManager
+from snake_rules import RULESETS
+from snake_render import BACKENDS, open_renderer
+from snake_ghost import GhostLibrary, GHOST_DIR, encode_tick
+from snake_telemetry import (
+    Telemetry, FRAMES, TICKS, AI_MOVES, AI_OVERRUNS, SAVES, LOADS,
+    SAVE_ERRORS, LOAD_ERRORS, HIGH_SCORE_ERRORS, SUBMISSION_ERRORS,
+    FRAME_MS, WORK_MS, TICK_LATE_MS, AI_MS, SAVE_MS, LOAD_MS,
+)
 
 # Game constants
 WINDOW_WIDTH, WINDOW_HEIGHT = 800, 700
-GAME_WIDTH, GAME_HEIGHT = 600, 600
-GRID_SIZE = 20
-GRID_WIDTH = GAME_WIDTH // GRID_SIZE
-GRID_HEIGHT = GAME_HEIGHT // GRID_SIZE
-
-# Directions
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
 
 # Colors
 BLACK = (0, 0, 0)
@@ -41,6 +59,8 @@ BUTTON_HOVER = (70, 70, 70)
 SPECIAL_FOOD_COLOR = (255, 100, 100)
 PLAYER2_COLOR = (255, 165, 0)  # رنگ نارنجی برای بازیکن دوم
 AI_COLOR = (0, 200, 200)  # رنگ فیروزه‌ای برای هوش مصنوعی
+GHOST_COLOR = (200, 200, 255)
+GHOST_ALPHA = 110
 DISABLED_COLOR = (100, 100, 100)  # رنگ برای گزینه غیرفعال
 
 # Game states
@@ -52,12 +72,193 @@ SETTINGS = 4
 NAME_INPUT = 5  # حالت دریافت نام بازیکنان
 AI_PLAYING = 6  # حالت تماشای بازی هوش مصنوعی
 
-# Game modes
-NORMAL = 0
-DEAD_OF_NIGHT = 1
-WINTER = 2
-MULTIPLAYER = 3  # حالت چند نفره
-AI_MODE = 4  # حالت هوش مصنوعی
+# Ticks the simulation may replay in one frame to catch up after a slow frame
+MAX_CATCH_UP_TICKS = 3
+
+# Practice mode: how much play is kept and how far one rewind goes (seconds)
+REWIND_HISTORY = 10
+REWIND_STEP = 3
+
+# High-score runs that can be checked with snake_verify.py
+SUBMISSIONS_FILE = 'submissions.jsonl'
+
+# Idle screens (menus, pause, game over) sleep until input or a timer
+IDLE_WAIT_MS = 1000
+CARET_BLINK = 0.5  # seconds
+
+# Sounds: name -> (frequency in Hz, duration in seconds)
+SOUND_SPECS = {
+    'eat': (440, 0.2),
+    'crash': (220, 0.5),
+    'click': (660, 0.1),
+    'slip': (330, 0.3),
+    'special': (880, 0.3),
+}
+
+# Movement keys
+PLAYER1_KEYS = {pygame.K_w: UP, pygame.K_s: DOWN, pygame.K_a: LEFT, pygame.K_d: RIGHT}
+PLAYER2_KEYS = {pygame.K_UP: UP, pygame.K_DOWN: DOWN, pygame.K_LEFT: LEFT, pygame.K_RIGHT: RIGHT}
+
+
+_fonts = {}
+
+
+def get_font(size, bold=False):
+    """Pygame's bundled font, loaded once per size and shared.
+
+    `pygame.font.SysFont` can scan every system font directory, which is
+    the slowest part of startup on kiosk machines.
+    """
+    font = _fonts.get((size, bold))
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        path = os.path.join(os.path.dirname(pygame.__file__), pygame.font.get_default_font())
+        font = pygame.font.Font(path if os.path.exists(path) else None, size)
+        font.set_bold(bold)
+        _fonts[(size, bold)] = font
+    return font
+
+
+def lighter(color):
+    return (min(color[0] + 50, 255),
+            min(color[1] + 50, 255),
+            min(color[2] + 50, 255))
+
+
+def draw_segment(surface, rect, color, outline):
+    pygame.draw.rect(surface, color, rect)
+    if outline:
+        pygame.draw.rect(surface, BLACK, rect, 1)
+
+
+def draw_food_cell(surface, rect):
+    pygame.draw.rect(surface, RED, rect)
+    pygame.draw.rect(surface, (100, 0, 0), rect, 2)
+
+
+def draw_special_food_cell(surface, rect):
+    pygame.draw.rect(surface, SPECIAL_FOOD_COLOR, rect)
+
+    # Draw a star pattern on special food
+    center_x = rect.centerx
+    center_y = rect.centery
+    radius = GRID_SIZE // 2 - 2
+
+    # Draw a star
+    points = []
+    for i in range(5):
+        angle = math.pi / 2 + 2 * math.pi * i / 5
+        points.append((
+            center_x + radius * math.cos(angle),
+            center_y + radius * math.sin(angle)
+        ))
+        angle += math.pi / 5
+        points.append((
+            center_x + radius * 0.4 * math.cos(angle),
+            center_y + radius * 0.4 * math.sin(angle)
+        ))
+
+    pygame.draw.polygon(surface, WHITE, points)
+    pygame.draw.rect(surface, (150, 0, 0), rect, 2)
+
+
+def draw_flashlight(surface, center, radius, step):
+    """Cut a soft-edged hole into a darkness surface."""
+    # Draw gradient circle for flashlight
+    for r in range(radius, 0, -step):
+        alpha = min(255, r * 2)
+        pygame.draw.circle(surface, (0, 0, 0, alpha), center, r)
+
+
+def create_beep_sound(frequency, duration):
+    """Generate simple beep sounds programmatically"""
+    import numpy as np
+
+    sample_rate = 44100
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    wave = (32767 * np.sin(2 * math.pi * frequency * t)).astype(np.int16)
+    buffer = np.column_stack((wave, wave))  # Left and right channel
+    return pygame.mixer.Sound(buffer)
+
+
+class SilentSound:
+    def play(self, *args, **kwargs):
+        return None
+
+
+class SoundBank:
+    """Sounds generated on first use; the mixer is started by the first one.
+
+    If numpy or an audio device is missing the game carries on silently.
+    """
+
+    def __init__(self, specs):
+        self.specs = specs
+        self.sounds = {}
+        self.available = None
+        self.lock = threading.Lock()
+
+    def __getitem__(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            with self.lock:
+                sound = self.sounds.get(name)
+                if sound is None:
+                    sound = self.sounds[name] = self._create(*self.specs[name])
+        return sound
+
+    def _create(self, frequency, duration):
+        if self.available is None:
+            self.available = self._init_mixer()
+        if not self.available:
+            return SilentSound()
+        return create_beep_sound(frequency, duration)
+
+    @staticmethod
+    def _init_mixer():
+        if importlib.util.find_spec("numpy") is None:
+            print("Sound disabled: numpy is not installed", file=sys.stderr)
+            return False
+        try:
+            pygame.mixer.init(44100, -16, 2)
+            return True
+        except pygame.error as e:
+            print(f"Sound disabled: {e}", file=sys.stderr)
+            return False
+
+    def preload(self):
+        for name in self.specs:
+            self[name]
+
+
+class StartupProfiler:
+    """Time to first frame broken down by phase (--profile-startup)."""
+
+    TARGET = 0.2  # seconds to an interactive menu
+
+    def __init__(self, start):
+        self.start = self.last = start
+        self.phases = []
+
+    def mark(self, phase, now=None):
+        if now is None:
+            now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        total = self.last - self.start
+        lines = ["Startup profile:"]
+        for phase, seconds in self.phases:
+            lines.append(f"  {phase:<14}{seconds * 1000:8.1f} ms")
+        if total <= self.TARGET:
+            verdict = "OK"
+        else:
+            verdict = f"over target, mostly {max(self.phases, key=lambda p: p[1])[0]}"
+        lines.append(f"  {'total':<14}{total * 1000:8.1f} ms "
+                     f"({verdict}, target {self.TARGET * 1000:.0f} ms)")
+        return "\n".join(lines)
 
 
 class Button:
@@ -69,15 +270,17 @@ class Button:
         self.hover_color = hover_color if enabled else DISABLED_COLOR
         self.is_hovered = False
         self.enabled = enabled
+        self.text_surf = None  # rendered on first draw
 
     def draw(self, surface):
         color = self.hover_color if (self.is_hovered and self.enabled) else self.color
         pygame.draw.rect(surface, color, self.rect, border_radius=5)
         pygame.draw.rect(surface, WHITE, self.rect, 2, border_radius=5)
 
-        text_surf = self.font.render(self.text, True, WHITE if self.enabled else (150, 150, 150))
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        surface.blit(text_surf, text_rect)
+        if self.text_surf is None:
+            self.text_surf = self.font.render(self.text, True, WHITE if self.enabled else (150, 150, 150))
+        text_rect = self.text_surf.get_rect(center=self.rect.center)
+        surface.blit(self.text_surf, text_rect)
 
     def check_hover(self, pos):
         self.is_hovered = self.rect.collidepoint(pos) and self.enabled
@@ -119,15 +322,136 @@ class TextInputBox:
         text_rect = text_surf.get_rect(center=self.rect.center)
         surface.blit(text_surf, text_rect)
 
+        # Blinking caret while the box has focus
+        if self.active and int(time.time() / CARET_BLINK) % 2 == 0:
+            x = text_rect.right + 2
+            pygame.draw.line(surface, WHITE, (x, self.rect.top + 10), (x, self.rect.bottom - 10), 2)
+
+
+class ScreenCompositor:
+    """Reusable overlays, text and frozen backgrounds for modal screens.
+
+    While GAME_OVER or pause is shown the board does not change, so it is
+    drawn once, blended with its overlay and kept as a single surface.
+    """
 
-class SnakeGame:
     def __init__(self):
-        self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-        pygame.display.set_caption("Ultimate Snake Game")
+        self.size = None
+        self.overlays = {}
+        self.texts = {}
+        self.background = None
+
+    def overlay(self, size, alpha):
+        """Window-sized translucent black surface, allocated once per size."""
+        if size != self.size:
+            self.size = size
+            self.overlays.clear()
+            self.background = None
+        surface = self.overlays.get(alpha)
+        if surface is None:
+            surface = pygame.Surface(size, pygame.SRCALPHA)
+            surface.fill((0, 0, 0, alpha))
+            self.overlays[alpha] = surface
+        return surface
+
+    def text(self, font, text, color):
+        key = (id(font), text, color)
+        surface = self.texts.get(key)
+        if surface is None:
+            if len(self.texts) > 256:
+                self.texts.clear()
+            surface = self.texts[key] = font.render(text, True, color)
+        return surface
+
+    def invalidate(self):
+        """Forget the frozen background, e.g. when the board changes again."""
+        self.background = None
+
+    def frozen(self, screen, compose):
+        """Blit the cached background, running `compose()` to build it first."""
+        if self.background is None or self.background.get_size() != screen.get_size():
+            compose()
+            self.background = screen.copy()
+        else:
+            screen.blit(self.background, (0, 0))
+
+
+class AudioSubscriber(Subscriber):
+    """Hands each tick's sounds to the audio manager, which merges repeats."""
+
+    name = 'audio'
+    SOUNDS = {FoodEaten: 'eat', SpecialFoodEaten: 'special', Slip: 'slip', Crash: 'crash'}
+    events = tuple(SOUNDS)
+
+    def __init__(self, audio):
+        self.audio = audio
+
+    def handle(self, events):
+        for event in events:
+            self.audio.play(self.SOUNDS[type(event)])
+        self.audio.flush()
+
+
+class ParticleSubscriber(Subscriber):
+    name = 'particles'
+    EFFECTS = {FoodEaten: (GOLD, 8), SpecialFoodEaten: (SPECIAL_FOOD_COLOR, 12), Crash: (RED, 15)}
+    events = tuple(EFFECTS)
+
+    def __init__(self, game):
+        self.game = game
+
+    def handle(self, events):
+        for event in events:
+            color, count = self.EFFECTS[type(event)]
+            self.game.add_particles(event.pos, color, count)
+
+
+class PersistenceSubscriber(Subscriber):
+    name = 'persistence'
+    events = (HighScore, Crash)
+
+    def __init__(self, game):
+        self.game = game
+
+    def handle(self, events):
+        for event in events:
+            if isinstance(event, HighScore):
+                self.game.save_high_score()
+            else:
+                # Every finished run, so the submissions are not only record scores
+                self.game.save_submission()
+                self.game.save_ghost()
+
+
+class SnakeGame:
+    def __init__(self, ai_controller="greedy", player1_controller=None, ai_budget=0.05,
+                 disabled_subscribers=(), measure_latency=False, profiler=None, quality="auto",
+                 level_dir=LEVEL_DIR, ai_process=False, renderer="auto", telemetry_dir=None,
+                 ghost_dir=GHOST_DIR):
+        self.profiler = profiler
+        if profiler:
+            profiler.mark("game modules")
+        # Operational counters and timings, written to rotating logs if a directory is given
+        self.telemetry = Telemetry(telemetry_dir)
+        self.last_frame = None  # perf_counter at the start of the previous simulated frame
+
+        # Only the subsystems the menu needs; the mixer starts with the first sound
+        pygame.display.init()
+        self.gpu = open_renderer(renderer, (WINDOW_WIDTH, WINDOW_HEIGHT), "Ultimate Snake Game")
+        if self.gpu:
+            # Software-drawn screens go to an off-screen surface, see snake_render
+            self.screen = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+            pygame.display.set_caption("Ultimate Snake Game")
         self.clock = pygame.time.Clock()
-        self.font_large = pygame.font.SysFont('Arial', 48, bold=True)
-        self.font_medium = pygame.font.SysFont('Arial', 32)
-        self.font_small = pygame.font.SysFont('Arial', 24)
+        if profiler:
+            profiler.mark("display")
+        self.font_large = get_font(48, bold=True)
+        self.font_medium = get_font(32)
+        self.font_small = get_font(24)
+        if profiler:
+            profiler.mark("fonts")
 
         # Game positioning
         self.game_x = (WINDOW_WIDTH - GAME_WIDTH) // 2
@@ -141,9 +465,11 @@ class SnakeGame:
         self.load_high_score()
         self.game_mode = NORMAL
         self.flashlight_radius = 5
-        self.slip_chance = 0.3
+        self.slip_chance = SLIP_CHANCE
         self.special_food = None
-        self.special_food_timer = 0
+        self.special_food_expires = 0  # tick on which the special food disappears
+        self.ticks = 0
+        self.rng = random.Random()
         self.player_names = ["Player 1", "Player 2"]  # نام‌های پیش‌فرض بازیکنان
         self.name_inputs = [
             TextInputBox(WINDOW_WIDTH // 2 - 150, 250, 300, 50, self.font_medium),
@@ -151,6 +477,26 @@ class SnakeGame:
         ]
         self.current_input = 0
         self.ai_active = False  # آیا حالت هوش مصنوعی فعال است؟
+        self.practice_mode = False  # حالت تمرین با امکان برگشت به عقب
+        self.rewind = RewindBuffer(REWIND_HISTORY)
+        self.levels = LevelLibrary(level_dir)
+        self.play_state = PLAYING  # state to return to after a rewind
+        self.ghost_mode = False  # race the best recorded run of the course in NORMAL mode
+        self.ghosts = GhostLibrary(ghost_dir)
+        self.ghost = None  # GhostReader while racing
+        self.sprites = {}  # ghost cell sprites, see cell_sprite
+        self.ghost_blits = None  # (key, blit list) kept between ghost moves
+
+        # AI controllers: one optional runner per snake, see snake_ai
+        self.controller_specs = [player1_controller, ai_controller]
+        self.ai_budget = ai_budget  # seconds per move
+        self.runners = [None, None]
+        self.ai_process = ai_process  # run controllers in worker processes (snake_shm)
+        self.runner_cache = {}
+
+        # Buffered key presses, one queue per snake, see snake_input
+        self.input_queues = [InputQueue(), InputQueue()]
+        self.latency = LatencyMeter() if measure_latency else None
 
         # Game Over buttons
         button_width = 200
@@ -174,194 +520,197 @@ class SnakeGame:
             "Watch AI", self.font_medium
         )
 
-        # Initialize sound system with dummy sounds
-        self.sounds = {
-            'eat': self.create_beep_sound(440, 0.2),
-            'crash': self.create_beep_sound(220, 0.5),
-            'click': self.create_beep_sound(660, 0.1),
-            'slip': self.create_beep_sound(330, 0.3),
-            'special': self.create_beep_sound(880, 0.3)
-        }
-
-        # Initialize game elements
-        self.reset_game()
+        self.compositor = ScreenCompositor()
+        self.darkness = None  # DEAD_OF_NIGHT overlay, allocated on first use
+        if quality == "auto":
+            self.quality = QualityGovernor()
+        else:
+            self.quality = QualityGovernor(tier=TIER_NAMES.index(quality), fixed=True)
 
-    def create_beep_sound(self, frequency, duration):
-        """Generate simple beep sounds programmatically"""
-        sample_rate = 44100
-        samples = int(duration * sample_rate)
-        buffer = numpy.zeros((samples, 2), dtype=numpy.int16)
+        # Sounds are generated on first use (or preloaded after the first frame)
+        self.sounds = SoundBank(SOUND_SPECS)
+        self.audio = AudioManager(self.sounds)
 
-        for s in range(samples):
-            t = float(s) / sample_rate
-            val = int(32767 * math.sin(2 * math.pi * frequency * t))
-            buffer[s][0] = val  # Left channel
-            buffer[s][1] = val  # Right channel
+        # Side effects of the rules are event subscribers, see snake_events
+        self.events = EventBus()
+        self.events.subscribe(AudioSubscriber(self.audio))
+        self.events.subscribe(ParticleSubscriber(self))
+        self.events.subscribe(PersistenceSubscriber(self))
+        self.stats = self.events.subscribe(StatsSubscriber())
+        for name in disabled_subscribers:
+            self.events.set_enabled(name, False)
 
-        sound = pygame.mixer.Sound(buffer)
-        return sound
+        # Initialize game elements
+        self.reset_game()
+        if profiler:
+            profiler.mark("game state")
 
     def reset_game(self):
+        # Everything random during play comes from a seeded generator, so a run
+        # can be re-played from its seed and turns (see snake_verify)
+        self.seed = self.choose_seed()
+        self.rng = random.Random(self.seed)
+        self.ticks = 0
+        self.turns = []  # (tick, direction index) whenever player 1 turns
+        self.trace = bytearray()  # one byte per tick for ghosts, see snake_ghost
+        self.verifiable = True
+        self.open_ghost()
+        self.apply_ruleset()
+
         # Snake for player 1
         self.snake = [(GRID_WIDTH // 3, GRID_HEIGHT // 2)]
         self.direction = RIGHT
         self.next_direction = RIGHT
 
         # Snake for player 2 or AI
-        if self.game_mode == MULTIPLAYER:
-            self.snake2 = [(GRID_WIDTH * 2 // 3, GRID_HEIGHT // 2)]
-            self.direction2 = LEFT
-            self.next_direction2 = LEFT
-        elif self.game_mode == AI_MODE:
+        if self.rules.snakes == 2:
             self.snake2 = [(GRID_WIDTH * 2 // 3, GRID_HEIGHT // 2)]
             self.direction2 = LEFT
             self.next_direction2 = LEFT
         else:
             self.snake2 = []
 
-        self.obstacles = self.create_obstacles()
-        self.food = self.create_food()
+        # Obstacle and ice layout from the difficulty's level pack, picked by
+        # the seed so a ghost races on its own course
+        self.level = self.levels.level(self.difficulty, random.Random(self.seed))
+        self.obstacles = list(self.level.obstacles)
+        self.ice_blocks = list(self.level.ice) if self.rules.ice else []
         self.special_food = None
-        self.special_food_timer = 0
+        self.food = self.create_food()
+        self.special_food_expires = 0
         self.score = 0
-        self.score2 = 0 if self.game_mode in [MULTIPLAYER, AI_MODE] else 0
+        self.score2 = 0
         self.game_over = False
         self.paused = False
         self.speed = self.get_speed()
         self.base_speed = self.speed
         self.last_move = time.time()
-        self.last_ai_move = time.time()
         self.particles = []
-        self.ice_blocks = []
         self.slipping = False
-
-        # Initialize ice blocks for WINTER mode
-        if self.game_mode == WINTER:
-            self.ice_blocks = self.create_ice_blocks(10)
-
-        # Difficulty settings
-        if self.difficulty == "EASY":
-            self.obstacles = []
-            self.speed = 8
-            self.base_speed = 8
-        elif self.difficulty == "HARD":
-            self.speed = 15
-            self.base_speed = 15
-            self.obstacles = self.create_obstacles(10)
-
-    def ai_move(self):
-        """هوش مصنوعی برای کنترل مار دوم"""
-        if not self.snake2 or len(self.snake2) == 0:
+        self.slipping2 = False
+
+        self.hazard_field = field_for_layout(self.obstacles, self.ice_blocks)
+        for queue in self.input_queues:
+            queue.clear()
+        self.compositor.invalidate()
+        self.rewind.clear()
+        if self.practice_mode:
+            self.rewind.capture(self)
+        self.setup_controllers()
+
+    def choose_seed(self):
+        """A fresh course, or the course of the best ghost when racing."""
+        if self.ghost_mode and self.game_mode == NORMAL:
+            seed = self.ghosts.best(self.difficulty)
+            if seed is not None:
+                return seed
+        return random.getrandbits(32)
+
+    def open_ghost(self):
+        if self.ghost:
+            self.ghost.close()
+        self.ghost = None
+        if self.ghost_mode and self.game_mode == NORMAL:
+            self.ghost = self.ghosts.open(self.difficulty, self.seed)
+
+    def save_ghost(self):
+        """Keep a finished NORMAL run as the ghost of its course if it is the best one."""
+        if not (self.ghost_mode and self.game_mode == NORMAL and self.verifiable):
             return
-
-        head_x, head_y = self.snake2[0]
-        food_x, food_y = self.food
-
-        # مسیرهای ممکن
-        possible_directions = []
-
-        # چک کردن مسیرهای ممکن بدون برخورد
-        for dir in [UP, DOWN, LEFT, RIGHT]:
-            new_head = ((head_x + dir[0]) % GRID_WIDTH, (head_y + dir[1]) % GRID_HEIGHT)
-
-            # جلوگیری از حرکت به عقب
-            if (dir[0] * -1, dir[1] * -1) == self.direction2:
-                continue
-
-            # چک کردن برخورد با خودش
-            if new_head in self.snake2[1:]:
+        try:
+            self.ghosts.save(self.difficulty, self.seed, self.score,
+                             (GRID_WIDTH // 3, GRID_HEIGHT // 2), self.trace)
+        except OSError as e:
+            print(f"Ghost not saved: {e}", file=sys.stderr)
+
+    def setup_controllers(self):
+        """Attach a controller runner to every AI-driven snake."""
+        ai_snake2 = self.rules.ai or (self.rules.snakes == 2 and self.ai_active)
+        specs = [self.controller_specs[0], self.controller_specs[1] if ai_snake2 else None]
+        for i, spec in enumerate(specs):
+            if spec is None:
+                self.runners[i] = None
                 continue
+            runner = self.runner_cache.get((i, spec))
+            if runner is None:
+                if self.ai_process:
+                    from snake_shm import ProcessControllerRunner
+                    runner = ProcessControllerRunner(spec, self.ai_budget)
+                else:
+                    runner = ControllerRunner(make_controller(spec), self.ai_budget)
+                self.runner_cache[(i, spec)] = runner
+            runner.reset()
+            self.runners[i] = runner
+        self.request_ai_moves()
+
+    def request_ai_moves(self):
+        """Hand the current board to every controller for the next tick."""
+        budget = min(self.ai_budget, 1.0 / self.speed)
+        for i, runner in enumerate(self.runners):
+            if runner is not None and (self.snake2 if i else self.snake):
+                runner.submit_game(self, i, budget)
 
-            # چک کردن برخورد با موانع
-            if new_head in self.obstacles:
+    def ai_move(self):
+        """حرکت مارهایی که هوش مصنوعی کنترل می‌کند"""
+        for i, runner in enumerate(self.runners):
+            if runner is None:
                 continue
-
-            # چک کردن برخورد با دیوارها (در صورت غیر فعال بودن حالت عبور از دیوار)
-            if (new_head[0] == 0 or new_head[0] == GRID_WIDTH - 1 or
-                    new_head[1] == 0 or new_head[1] == GRID_HEIGHT - 1):
+            direction = runner.collect()
+            if direction is None:
                 continue
-
-            possible_directions.append(dir)
-
-        if not possible_directions:
-            return  # اگر هیچ مسیری ایمن نبود، همان جهت را ادامه دهد
-
-        # انتخاب مسیری که به غذا نزدیکتر می‌شود
-        best_dir = possible_directions[0]
-        min_distance = float('inf')
-
-        for dir in possible_directions:
-            new_head = ((head_x + dir[0]) % GRID_WIDTH, (head_y + dir[1]) % GRID_HEIGHT)
-            dist = abs(new_head[0] - food_x) + abs(new_head[1] - food_y)  # فاصله منهتن
-
-            if dist < min_distance:
-                min_distance = dist
-                best_dir = dir
-
-        self.next_direction2 = best_dir
-
-    def create_ice_blocks(self, count=5):
-        ice_blocks = []
-        for _ in range(count):
-            while True:
-                ice = (random.randint(1, GRID_WIDTH - 2),
-                       random.randint(1, GRID_HEIGHT - 2))
-                if (ice not in self.snake and
-                        ice not in self.obstacles and
-                        ice != self.food and
-                        (not hasattr(self, 'snake2') or ice not in self.snake2)):
-                    ice_blocks.append(ice)
-                    break
-        return ice_blocks
+            self.telemetry.count(AI_MOVES)
+            if runner.latency is None:
+                self.telemetry.count(AI_OVERRUNS)
+            else:
+                self.telemetry.observe(AI_MS, runner.latency)
+            if i == 0:
+                self.next_direction = direction
+            else:
+                self.next_direction2 = direction
 
     def get_speed(self):
-        if self.difficulty == "EASY": return 8
-        if self.difficulty == "MEDIUM": return 12
-        return 15
+        return DIFFICULTY_SPEED[self.difficulty]
 
     def create_food(self):
         while True:
-            food = (random.randint(1, GRID_WIDTH - 2),
-                    random.randint(1, GRID_HEIGHT - 2))
+            food = (self.rng.randint(1, GRID_WIDTH - 2),
+                    self.rng.randint(1, GRID_HEIGHT - 2))
             if (food not in self.snake and
                     food not in self.obstacles and
-                    (self.game_mode != WINTER or food not in self.ice_blocks) and
+                    (not self.rules.ice or food not in self.ice_blocks) and
                     food != self.special_food and
                     (not hasattr(self, 'snake2') or food not in self.snake2)):
                 return food
 
     def create_special_food(self):
         while True:
-            food = (random.randint(1, GRID_WIDTH - 2),
-                    random.randint(1, GRID_HEIGHT - 2))
+            food = (self.rng.randint(1, GRID_WIDTH - 2),
+                    self.rng.randint(1, GRID_HEIGHT - 2))
             if (food not in self.snake and
                     food not in self.obstacles and
-                    (self.game_mode != WINTER or food not in self.ice_blocks) and
+                    (not self.rules.ice or food not in self.ice_blocks) and
                     food != self.food and
                     (not hasattr(self, 'snake2') or food not in self.snake2)):
                 return food
 
-    def create_obstacles(self, count=5):
-        obstacles = []
-        for _ in range(count):
-            while True:
-                obstacle = (random.randint(1, GRID_WIDTH - 2),
-                            random.randint(1, GRID_HEIGHT - 2))
-                if obstacle not in self.snake and (not hasattr(self, 'snake2') or obstacle not in self.snake2):
-                    obstacles.append(obstacle)
-                    break
-        return obstacles
-
     def load_high_score(self):
         try:
             with open('highscore.dat', 'r') as f:
                 self.high_score = int(f.read())
-        except:
+        except FileNotFoundError:
+            self.high_score = 0
+        except (OSError, ValueError) as e:
+            self.telemetry.count(HIGH_SCORE_ERRORS)
+            print(f"High score not loaded: {e}", file=sys.stderr)
             self.high_score = 0
 
     def save_high_score(self):
-        with open('highscore.dat', 'w') as f:
-            f.write(str(self.high_score))
+        try:
+            with open('highscore.dat', 'w') as f:
+                f.write(str(self.high_score))
+        except OSError as e:
+            self.telemetry.count(HIGH_SCORE_ERRORS)
+            print(f"High score not saved: {e}", file=sys.stderr)
 
     def save_game(self):
         game_state = {
@@ -382,14 +731,43 @@ class SnakeGame:
             "ai_active": self.ai_active
         }
 
+        start = time.perf_counter()
         try:
             with open('snake_save.json', 'w') as f:
                 json.dump(game_state, f)
-            return True
-        except:
+        except (OSError, TypeError, ValueError) as e:
+            self.telemetry.count(SAVE_ERRORS)
+            print(f"Game not saved: {e}", file=sys.stderr)
             return False
+        self.telemetry.count(SAVES)
+        self.telemetry.observe(SAVE_MS, time.perf_counter() - start)
+        return True
+
+    def save_submission(self):
+        """Append this run to the leaderboard queue if it can be re-played."""
+        if not self.verifiable or self.rules.snakes != 1:
+            return
+        submission = {
+            "name": self.player_names[0],
+            "score": self.score,
+            "ticks": self.ticks,
+            "seed": self.seed,
+            "difficulty": self.difficulty,
+            "mode": self.game_mode,
+            "obstacles": self.obstacles,
+            "ice": self.ice_blocks,
+            "turns": self.turns,
+            "controller": self.controller_specs[0],
+        }
+        try:
+            with open(SUBMISSIONS_FILE, 'a') as f:
+                f.write(json.dumps(submission) + "\n")
+        except OSError as e:
+            self.telemetry.count(SUBMISSION_ERRORS)
+            print(f"Submission not saved: {e}", file=sys.stderr)
 
     def load_game(self):
+        start = time.perf_counter()
         try:
             with open('snake_save.json', 'r') as f:
                 data = json.load(f)
@@ -402,6 +780,7 @@ class SnakeGame:
             self.next_direction2 = tuple(data.get("direction2", LEFT))
             self.food = tuple(data["food"])
             self.special_food = tuple(data["special_food"]) if data["special_food"] else None
+            self.special_food_expires = self.ticks + int(SPECIAL_FOOD_LIFETIME * data["speed"])
             self.obstacles = [tuple(obs) for obs in data["obstacles"]]
             self.score = data["score"]
             self.score2 = data.get("score2", 0)
@@ -411,12 +790,32 @@ class SnakeGame:
             self.game_mode = data.get("game_mode", NORMAL)
             self.player_names = data.get("player_names", ["Player 1", "Player 2"])
             self.ai_active = data.get("ai_active", False)
+            if self.ghost:
+                self.ghost.close()
+                self.ghost = None
+            self.apply_ruleset()
             self.state = PLAYING
-            return True
-        except:
+            self.verifiable = False
+            self.hazard_field = field_for_layout(self.obstacles, self.ice_blocks)
+            for queue in self.input_queues:
+                queue.clear()
+            self.compositor.invalidate()
+            self.rewind.clear()
+            if self.practice_mode:
+                self.rewind.capture(self)
+            self.setup_controllers()
+        except FileNotFoundError:
             return False
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            self.telemetry.count(LOAD_ERRORS)
+            print(f"Saved game not loaded: {e}", file=sys.stderr)
+            return False
+        self.telemetry.count(LOADS)
+        self.telemetry.observe(LOAD_MS, time.perf_counter() - start)
+        return True
 
     def add_particles(self, pos, color, count=5):
+        count = min(count, self.quality.settings['max_particles'] - len(self.particles))
         for _ in range(count):
             self.particles.append({
                 'pos': [pos[0] * GRID_SIZE + self.game_x,
@@ -435,111 +834,113 @@ class SnakeGame:
             if p['life'] <= 0:
                 self.particles.remove(p)
 
-    def handle_events(self):
+    def handle_events(self, events=None):
+        """Process input; returns True if the screen needs to be redrawn."""
         mouse_pos = pygame.mouse.get_pos()
+        if events is None:
+            events = pygame.event.get()
+        redraw = False
+
+        for event in events:
+            if event.type != pygame.MOUSEMOTION:
+                redraw = True
 
-        for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if self.latency:
+                    print(self.latency.report())
+                for runner in self.runner_cache.values():
+                    runner.close()
                 pygame.quit()
                 sys.exit()
 
             elif event.type == pygame.KEYDOWN:
                 if self.state == PLAYING and not self.game_over:
                     # Player 1 controls (WASD)
-                    if event.key == pygame.K_w:
-                        if self.direction != DOWN:
-                            self.next_direction = UP
-                    elif event.key == pygame.K_s:
-                        if self.direction != UP:
-                            self.next_direction = DOWN
-                    elif event.key == pygame.K_a:
-                        if self.direction != RIGHT:
-                            self.next_direction = LEFT
-                    elif event.key == pygame.K_d:
-                        if self.direction != LEFT:
-                            self.next_direction = RIGHT
-
-                    # Player 2 controls (Arrow keys) - only in MULTIPLAYER mode
-                    if self.game_mode == MULTIPLAYER and not self.ai_active:
-                        if event.key == pygame.K_UP:
-                            if self.direction2 != DOWN:
-                                self.next_direction2 = UP
-                        elif event.key == pygame.K_DOWN:
-                            if self.direction2 != UP:
-                                self.next_direction2 = DOWN
-                        elif event.key == pygame.K_LEFT:
-                            if self.direction2 != RIGHT:
-                                self.next_direction2 = LEFT
-                        elif event.key == pygame.K_RIGHT:
-                            if self.direction2 != LEFT:
-                                self.next_direction2 = RIGHT
+                    if event.key in PLAYER1_KEYS:
+                        self.input_queues[0].push(PLAYER1_KEYS[event.key], self.direction)
+
+                    # Player 2 controls (Arrow keys) - only with a human second player
+                    if self.rules.snakes == 2 and not (self.rules.ai or self.ai_active):
+                        if event.key in PLAYER2_KEYS:
+                            self.input_queues[1].push(PLAYER2_KEYS[event.key], self.direction2)
 
                     # Common controls
                     if event.key == pygame.K_SPACE:
                         self.paused = not self.paused
-                        self.sounds['click'].play()
+                        self.compositor.invalidate()
+                        self.last_move = time.time()
+                        self.audio.play('click')
                     elif event.key == pygame.K_p:
                         if self.save_game():
-                            self.sounds['click'].play()
+                            self.audio.play('click')
                     elif event.key == pygame.K_l:
                         if self.load_game():
-                            self.sounds['click'].play()
+                            self.audio.play('click')
+                    elif event.key == pygame.K_u:
+                        if self.rewind_game():
+                            self.audio.play('click')
 
                 elif self.state == MENU:
                     if event.key == pygame.K_1:
                         self.difficulty = "EASY"
                         self.state = PLAYING
                         self.reset_game()
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_2:
                         self.difficulty = "MEDIUM"
                         self.state = PLAYING
                         self.reset_game()
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_3:
                         self.difficulty = "HARD"
                         self.state = PLAYING
                         self.reset_game()
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_s:
                         self.state = SETTINGS
-                        self.sounds['click'].play()
+                        self.audio.play('click')
 
                 elif self.state == SETTINGS:
                     if event.key == pygame.K_ESCAPE:
                         self.state = MENU
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_1:
                         self.snake_color = GREEN
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_2:
                         self.snake_color = GOLD
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_3:
                         self.snake_color = PURPLE
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_4:
                         self.game_mode = NORMAL
                         self.ai_active = False
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_5:
                         self.game_mode = DEAD_OF_NIGHT
                         self.ai_active = False
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_6:
                         self.game_mode = WINTER
                         self.ai_active = False
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_7 and not self.ai_active:  # فقط اگر هوش مصنوعی فعال نباشد
                         self.game_mode = MULTIPLAYER
                         self.state = NAME_INPUT
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_8:
                         self.game_mode = AI_MODE
                         self.ai_active = True
                         self.state = AI_PLAYING
                         self.reset_game()
-                        self.sounds['click'].play()
+                        self.audio.play('click')
+                    elif event.key == pygame.K_9:
+                        self.practice_mode = not self.practice_mode
+                        self.audio.play('click')
+                    elif event.key == pygame.K_0:
+                        self.ghost_mode = not self.ghost_mode
+                        self.audio.play('click')
 
                 elif self.state == NAME_INPUT:
                     if event.key == pygame.K_RETURN:
@@ -548,45 +949,51 @@ class SnakeGame:
                         self.player_names[1] = self.name_inputs[1].text or "Player 2"
                         self.state = PLAYING
                         self.reset_game()
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif event.key == pygame.K_TAB:
                         # جابجایی بین فیلدهای ورودی
                         self.current_input = (self.current_input + 1) % 2
                     elif event.key == pygame.K_ESCAPE:
                         self.state = SETTINGS
-                        self.sounds['click'].play()
+                        self.audio.play('click')
 
                 elif self.state == GAME_OVER:
                     if event.key == pygame.K_r:
                         self.state = PLAYING
                         self.reset_game()
-                        self.sounds['click'].play()
+                        self.audio.play('click')
+                    elif event.key == pygame.K_u:
+                        if self.rewind_game():
+                            self.audio.play('click')
 
                 elif self.state == AI_PLAYING:
                     if event.key == pygame.K_ESCAPE:
                         self.state = SETTINGS
-                        self.sounds['click'].play()
+                        self.audio.play('click')
 
             elif event.type == pygame.MOUSEMOTION:
                 if self.state == GAME_OVER:
-                    self.restart_button.check_hover(mouse_pos)
-                    self.menu_button.check_hover(mouse_pos)
-                    if self.game_mode == AI_MODE:
-                        self.ai_button.check_hover(mouse_pos)
+                    buttons = [self.restart_button, self.menu_button]
+                    if self.rules.ai:
+                        buttons.append(self.ai_button)
+                    for button in buttons:
+                        was_hovered = button.is_hovered
+                        if button.check_hover(mouse_pos) != was_hovered:
+                            redraw = True
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if self.state == GAME_OVER:
                     if self.restart_button.is_clicked(mouse_pos, event):
                         self.state = PLAYING
                         self.reset_game()
-                        self.sounds['click'].play()
+                        self.audio.play('click')
                     elif self.menu_button.is_clicked(mouse_pos, event):
                         self.state = MENU
-                        self.sounds['click'].play()
-                    elif self.game_mode == AI_MODE and self.ai_button.is_clicked(mouse_pos, event):
+                        self.audio.play('click')
+                    elif self.rules.ai and self.ai_button.is_clicked(mouse_pos, event):
                         self.state = AI_PLAYING
                         self.reset_game()
-                        self.sounds['click'].play()
+                        self.audio.play('click')
 
             # Handle name input
             if self.state == NAME_INPUT:
@@ -599,50 +1006,233 @@ class SnakeGame:
                             self.player_names[1] = self.name_inputs[1].text or "Player 2"
                             self.state = PLAYING
                             self.reset_game()
-                            self.sounds['click'].play()
+                            self.audio.play('click')
+
+        return redraw
+
+    def is_simulating(self):
+        return self.state in (PLAYING, AI_PLAYING) and not self.paused and not self.game_over
+
+    def idle_timeout(self):
+        """Milliseconds until the next timer-driven redraw on an idle screen."""
+        if self.state == NAME_INPUT and any(box.active for box in self.name_inputs):
+            until_blink = CARET_BLINK - time.time() % CARET_BLINK
+            return max(1, int(until_blink * 1000))
+        return IDLE_WAIT_MS
+
+    def idle_step(self):
+        """Block until input or a timer instead of redrawing a static screen."""
+        timeout = self.idle_timeout()
+        event = pygame.event.wait(timeout)
+        if event.type == pygame.NOEVENT:
+            # Timed out: only a blink timer needs a new frame
+            if timeout < IDLE_WAIT_MS:
+                self.draw()
+            return
+        redraw = self.handle_events([event] + pygame.event.get())
+        self.audio.flush()
+        if redraw:
+            self.draw()
+
+    def rewind_game(self, seconds=REWIND_STEP):
+        """Practice mode: go back a few seconds, also after a crash."""
+        if not self.practice_mode or not self.rewind.rewind(self, seconds):
+            return False
+        if self.game_over:
+            self.game_over = False
+            self.state = self.play_state
+        self.verifiable = False
+        if self.ghost:
+            self.ghost.seek(self.ticks)
+        self.particles = []
+        for queue in self.input_queues:
+            queue.clear()
+        self.compositor.invalidate()
+        self.last_move = time.time()
+        self.request_ai_moves()
+        return True
 
     def update(self):
         if self.state not in [PLAYING, AI_PLAYING] or self.paused or self.game_over:
             return
 
+        # Fixed time step: a slow frame is followed by catch-up ticks, so the
+        # game speed does not depend on how long drawing takes
         current_time = time.time()
-
-        # حرکت هوش مصنوعی با سرعت کمتر برای قابل مشاهده بودن
-        if (self.state == AI_PLAYING or (
-                self.game_mode == MULTIPLAYER and self.ai_active)) and current_time - self.last_ai_move > 0.2:
+        ticks = 0
+        while (current_time - self.last_move >= 1.0 / self.speed and
+               ticks < MAX_CATCH_UP_TICKS and not self.game_over):
+            self.last_move += 1.0 / self.speed
+            # How late this tick runs compared with its slot
+            self.telemetry.observe(TICK_LATE_MS, current_time - self.last_move)
+            self.telemetry.count(TICKS)
             self.ai_move()
-            self.last_ai_move = current_time
-
-        if current_time - self.last_move < 1.0 / self.speed:
-            return
-
-        self.last_move = current_time
+            self.tick()
+            if self.practice_mode and not self.game_over:
+                self.rewind.capture(self)
+            self.events.flush()
+            self.request_ai_moves()
+            self.update_particles()
+            ticks += 1
+        if current_time - self.last_move >= 1.0 / self.speed:
+            self.last_move = current_time  # too far behind (e.g. window dragged): drop the backlog
+
+    def take_input(self, player):
+        """Direction for this move: the next queued key press, if there is one.
+
+        A controller's reversal is dropped like a reversed key press, as
+        SimState and snake_verify do.
+        """
+        current = self.direction if player == 0 else self.direction2
+        item = self.input_queues[player].pop(current)
+        if item is None:
+            planned = self.next_direction if player == 0 else self.next_direction2
+            return current if is_reversal(planned, current) else planned
+        direction, pressed_at = item
+        if self.latency:
+            self.latency.record(time.perf_counter() - pressed_at)
+        if player == 0:
+            self.next_direction = direction
+        else:
+            self.next_direction2 = direction
+        return direction
+
+    def apply_ruleset(self):
+        """Specialize the tick function and render layers for the current mode.
+
+        Called whenever a game starts or is loaded; afterwards neither the
+        tick nor drawing needs to look at `game_mode`.
+        """
+        rules = self.rules = RULESETS[self.game_mode]
+        self.steer = self.steer_on_ice if rules.ice else self.steer_snake
+        if rules.snakes == 2:
+            self.tick = self.tick_two
+        elif self.ghost:
+            self.tick = self.tick_racing
+        else:
+            self.tick = self.tick_one
+
+        self.background_color = DARK_NIGHT if rules.darkness else BLACK
+        self.snake2_color = AI_COLOR if rules.ai else PLAYER2_COLOR
+        layers = [self.draw_board, self.draw_obstacles]
+        if rules.ice:
+            layers.append(self.draw_ice)
+        layers.append(self.draw_food)
+        if rules.darkness:
+            layers.append(self.draw_darkness)
+        if self.ghost:
+            layers.append(self.draw_ghost)
+        layers.append(self.draw_player1)
+        if rules.snakes == 2:
+            layers.append(self.draw_player2)
+        layers += [self.draw_particles, self.draw_hud]
+        self.render_layers = layers
+
+        # The same layers as texture copies when drawing through SDL's renderer
+        layers = [self.texture_board, self.texture_food]
+        if rules.darkness:
+            layers.append(self.texture_darkness)
+        if self.ghost:
+            layers.append(self.texture_ghost)
+        layers.append(self.texture_player1)
+        if rules.snakes == 2:
+            layers.append(self.texture_player2)
+        layers += [self.texture_particles, self.texture_hud]
+        self.texture_layers = layers
+
+        # HUD texts that only depend on the mode
+        if rules.darkness:
+            mode_color = (100, 100, 255)
+        elif rules.ice:
+            mode_color = ICE_COLOR
+        elif rules.snakes == 2:
+            mode_color = self.snake2_color
+        else:
+            mode_color = WHITE
+        self.mode_label = (f"Mode: {rules.name}", mode_color)
+        if rules.snakes == 2 and not rules.ai:
+            self.controls_help = (f"{self.player_names[0]}: WASD | {self.player_names[1]}: Arrows"
+                                  " | SPACE: Pause")
+        elif rules.ai:
+            self.controls_help = "WASD: Move | SPACE: Pause | ESC: Exit"
+        else:
+            self.controls_help = "WASD/Arrows: Move | SPACE: Pause | P: Save | L: Load"
+
+    def steer_snake(self, player):
+        if player == 0:
+            previous = self.direction
+            self.direction = self.take_input(0)
+            if self.direction != previous:
+                self.turns.append((self.ticks, DIRECTIONS.index(self.direction)))
+        else:
+            self.direction2 = self.take_input(1)
 
-        # Handle slipping in WINTER mode
-        if self.game_mode == WINTER and not self.slipping:
-            head = self.snake[0]
-            if head in self.ice_blocks and random.random() < self.slip_chance:
-                self.slipping = True
-                self.sounds['slip'].play()
-                # Continue in same direction when slipping
+    def steer_on_ice(self, player):
+        """Steering on ice: a head on ice may slip instead of turning."""
+        if player == 0:
+            head, slipping = self.snake[0], self.slipping
+        else:
+            head, slipping = self.snake2[0], self.slipping2
+        slip = not slipping and head in self.ice_blocks and self.rng.random() < self.slip_chance
+        if player == 0:
+            self.slipping = slip
+        else:
+            self.slipping2 = slip
+        if slip:
+            self.events.emit(Slip(player, head))
+            # Continue in same direction when slipping; queued keys wait
+            if player == 0:
                 self.next_direction = self.direction
             else:
-                self.direction = self.next_direction
-        else:
-            if self.slipping:
-                self.slipping = False
-            self.direction = self.next_direction
+                self.next_direction2 = self.direction2
+            return
+        self.steer_snake(player)
 
+    def spawn_special_food(self):
         # Generate special food randomly (5% chance every move)
-        if self.special_food is None and random.random() < 0.05:
+        if self.special_food is None and self.rng.random() < SPECIAL_FOOD_CHANCE:
             self.special_food = self.create_special_food()
-            self.special_food_timer = time.time()
+            # Lives 10 seconds at the speed it appeared with, counted in ticks
+            self.special_food_expires = self.ticks + int(SPECIAL_FOOD_LIFETIME * self.speed)
 
-        # Remove special food after 10 seconds if not eaten
-        if (self.special_food and
-                time.time() - self.special_food_timer > 10):
+        # Remove special food if not eaten in time
+        elif self.special_food and self.ticks > self.special_food_expires:
             self.special_food = None
 
+    def collides(self, head, body, other):
+        return (head[0] == 0 or head[0] == GRID_WIDTH - 1 or
+                head[1] == 0 or head[1] == GRID_HEIGHT - 1 or
+                head in self.obstacles or head in body[1:] or head in other)
+
+    def tick_one(self):
+        """Apply the game rules for one move of a single snake; side effects go out as events."""
+        self.ticks += 1
+        self.steer(0)
+        self.spawn_special_food()
+
+        head_x, head_y = self.snake[0]
+        dir_x, dir_y = self.direction
+        new_head = ((head_x + dir_x) % GRID_WIDTH,
+                    (head_y + dir_y) % GRID_HEIGHT)
+        if self.collides(new_head, self.snake, ()):
+            self.crash(new_head, None)
+            return
+
+        self.snake.insert(0, new_head)
+        self.trace.append(encode_tick(self.direction, self.feed(0, new_head)))
+
+    def tick_racing(self):
+        """A single-snake tick with the ghost moving alongside."""
+        self.tick_one()
+        self.ghost.advance()
+
+    def tick_two(self):
+        """Apply the game rules for one move of both snakes."""
+        self.ticks += 1
+        self.steer(0)
+        self.steer(1)
+        self.spawn_special_food()
+
         # Move player 1 snake
         head_x, head_y = self.snake[0]
         dir_x, dir_y = self.direction
@@ -650,103 +1240,70 @@ class SnakeGame:
                     (head_y + dir_y) % GRID_HEIGHT)
 
         # Move player 2 or AI snake
-        if self.game_mode in [MULTIPLAYER, AI_MODE]:
-            head2_x, head2_y = self.snake2[0]
-            dir2_x, dir2_y = self.direction2
-            new_head2 = ((head2_x + dir2_x) % GRID_WIDTH,
-                         (head2_y + dir2_y) % GRID_HEIGHT)
-            self.direction2 = self.next_direction2
-
-        # Check collisions for player 1
-        player1_collision = (
-                new_head in self.snake[1:] or
-                new_head in self.obstacles or
-                new_head[0] == 0 or new_head[0] == GRID_WIDTH - 1 or
-                new_head[1] == 0 or new_head[1] == GRID_HEIGHT - 1 or
-                (self.game_mode in [MULTIPLAYER, AI_MODE] and new_head in self.snake2)
-        )
-
-        # Check collisions for player 2 or AI
-        player2_collision = False
-        if self.game_mode in [MULTIPLAYER, AI_MODE]:
-            player2_collision = (
-                    new_head2 in self.snake2[1:] or
-                    new_head2 in self.obstacles or
-                    new_head2[0] == 0 or new_head2[0] == GRID_WIDTH - 1 or
-                    new_head2[1] == 0 or new_head2[1] == GRID_HEIGHT - 1 or
-                    new_head2 in self.snake
-            )
-
-        # Handle game over conditions
-        if player1_collision or (self.game_mode in [MULTIPLAYER, AI_MODE] and player2_collision):
-            self.game_over = True
-            self.state = GAME_OVER
-            max_score = max(self.score, self.score2 if self.game_mode in [MULTIPLAYER, AI_MODE] else 0)
-            if max_score > self.high_score:
-                self.high_score = max_score
-                self.save_high_score()
-            self.sounds['crash'].play()
-            if player1_collision:
-                self.add_particles(new_head, RED, 15)
-            if self.game_mode in [MULTIPLAYER, AI_MODE] and player2_collision:
-                self.add_particles(new_head2, RED, 15)
+        head2_x, head2_y = self.snake2[0]
+        dir2_x, dir2_y = self.direction2
+        new_head2 = ((head2_x + dir2_x) % GRID_WIDTH,
+                     (head2_y + dir2_y) % GRID_HEIGHT)
+
+        player1_collision = self.collides(new_head, self.snake, self.snake2)
+        player2_collision = self.collides(new_head2, self.snake2, self.snake)
+        if player1_collision or player2_collision:
+            self.crash(new_head if player1_collision else None,
+                       new_head2 if player2_collision else None)
             return
 
-        # Update player 1 snake position
         self.snake.insert(0, new_head)
-
-        # Update player 2 or AI snake position
-        if self.game_mode in [MULTIPLAYER, AI_MODE]:
-            self.snake2.insert(0, new_head2)
-
-        # Check if food eaten by player 1
-        if new_head == self.food:
-            self.score += 10
-            self.sounds['eat'].play()
-            self.add_particles(new_head, GOLD, 8)
+        self.snake2.insert(0, new_head2)
+        self.feed(0, new_head)
+        self.feed(1, new_head2)
+
+    def crash(self, head, head2):
+        """Game over; `head`/`head2` is where each snake crashed, or None."""
+        self.game_over = True
+        self.play_state = self.state
+        self.state = GAME_OVER
+        self.compositor.invalidate()
+        max_score = max(self.score, self.score2)
+        if max_score > self.high_score:
+            self.high_score = max_score
+            self.events.emit(HighScore(max_score))
+        if head is not None:
+            self.events.emit(Crash(0, head))
+        if head2 is not None:
+            self.events.emit(Crash(1, head2))
+
+    def feed(self, player, head):
+        """Eat whatever is at `head`, or move the tail along; returns True if the snake grew."""
+        if head == self.food:
+            score = self.add_score(player, FOOD_SCORE)
+            self.events.emit(FoodEaten(player, head, score))
             self.food = self.create_food()
 
-            # Increase speed every 3 foods
-            if self.score % 30 == 0 and self.base_speed < 20:
+            # Increase speed every few foods (for both players)
+            if score % SPEEDUP_EVERY == 0 and self.base_speed < MAX_SPEED:
                 self.base_speed += 1
                 self.speed = self.base_speed
-        elif new_head == self.special_food:
-            self.score += 20
-            self.sounds['special'].play()
-            self.add_particles(new_head, SPECIAL_FOOD_COLOR, 12)
+                self.events.emit(SpeedChanged(self.speed))
+            return True
+        elif head == self.special_food:
+            score = self.add_score(player, SPECIAL_FOOD_SCORE)
+            self.events.emit(SpecialFoodEaten(player, head, score))
             self.special_food = None
 
             # Decrease speed when eating special food
-            if self.speed > 5:
+            if self.speed > MIN_SPEED:
                 self.speed -= 1
-        else:
-            self.snake.pop()
-
-        # Check if food eaten by player 2 or AI
-        if self.game_mode in [MULTIPLAYER, AI_MODE]:
-            if new_head2 == self.food:
-                self.score2 += 10
-                self.sounds['eat'].play()
-                self.add_particles(new_head2, GOLD, 8)
-                self.food = self.create_food()
-
-                # Increase speed every 3 foods (for both players)
-                if self.score2 % 30 == 0 and self.base_speed < 20:
-                    self.base_speed += 1
-                    self.speed = self.base_speed
-            elif new_head2 == self.special_food:
-                self.score2 += 20
-                self.sounds['special'].play()
-                self.add_particles(new_head2, SPECIAL_FOOD_COLOR, 12)
-                self.special_food = None
-
-                # Decrease speed when eating special food
-                if self.speed > 5:
-                    self.speed -= 1
-            else:
-                self.snake2.pop()
+                self.events.emit(SpeedChanged(self.speed))
+            return True
+        (self.snake2 if player else self.snake).pop()
+        return False
 
-        self.update_particles()
+    def add_score(self, player, points):
+        if player:
+            self.score2 += points
+            return self.score2
+        self.score += points
+        return self.score
 
     def draw_menu(self):
         self.screen.fill(BLACK)
@@ -788,18 +1345,24 @@ class SnakeGame:
         multiplayer_mode = self.font_medium.render("7. Multiplayer", True,
                                                    PLAYER2_COLOR if not self.ai_active else DISABLED_COLOR)
         ai_mode = self.font_medium.render("8. AI Mode", True, AI_COLOR)
+        practice = self.font_medium.render(
+            f"9. Practice (U: rewind): {'On' if self.practice_mode else 'Off'}", True, WHITE)
+        ghost = self.font_medium.render(
+            f"0. Ghost race (Normal): {'On' if self.ghost_mode else 'Off'}", True, GHOST_COLOR)
 
         back = self.font_medium.render("ESC. Back to Menu", True, WHITE)
 
-        self.screen.blit(green, (WINDOW_WIDTH // 2 - green.get_width() // 2, 200))
-        self.screen.blit(gold, (WINDOW_WIDTH // 2 - gold.get_width() // 2, 250))
-        self.screen.blit(purple, (WINDOW_WIDTH // 2 - purple.get_width() // 2, 300))
-        self.screen.blit(normal_mode, (WINDOW_WIDTH // 2 - normal_mode.get_width() // 2, 350))
-        self.screen.blit(night_mode, (WINDOW_WIDTH // 2 - night_mode.get_width() // 2, 400))
-        self.screen.blit(winter_mode, (WINDOW_WIDTH // 2 - winter_mode.get_width() // 2, 450))
-        self.screen.blit(multiplayer_mode, (WINDOW_WIDTH // 2 - multiplayer_mode.get_width() // 2, 500))
-        self.screen.blit(ai_mode, (WINDOW_WIDTH // 2 - ai_mode.get_width() // 2, 550))
-        self.screen.blit(back, (WINDOW_WIDTH // 2 - back.get_width() // 2, 620))
+        self.screen.blit(green, (WINDOW_WIDTH // 2 - green.get_width() // 2, 180))
+        self.screen.blit(gold, (WINDOW_WIDTH // 2 - gold.get_width() // 2, 225))
+        self.screen.blit(purple, (WINDOW_WIDTH // 2 - purple.get_width() // 2, 270))
+        self.screen.blit(normal_mode, (WINDOW_WIDTH // 2 - normal_mode.get_width() // 2, 315))
+        self.screen.blit(night_mode, (WINDOW_WIDTH // 2 - night_mode.get_width() // 2, 360))
+        self.screen.blit(winter_mode, (WINDOW_WIDTH // 2 - winter_mode.get_width() // 2, 405))
+        self.screen.blit(multiplayer_mode, (WINDOW_WIDTH // 2 - multiplayer_mode.get_width() // 2, 450))
+        self.screen.blit(ai_mode, (WINDOW_WIDTH // 2 - ai_mode.get_width() // 2, 495))
+        self.screen.blit(practice, (WINDOW_WIDTH // 2 - practice.get_width() // 2, 540))
+        self.screen.blit(ghost, (WINDOW_WIDTH // 2 - ghost.get_width() // 2, 585))
+        self.screen.blit(back, (WINDOW_WIDTH // 2 - back.get_width() // 2, 630))
 
     def draw_name_input(self):
         self.screen.fill(BLACK)
@@ -821,11 +1384,12 @@ class SnakeGame:
             input_box.draw(self.screen)
 
     def draw_game(self):
+        for layer in self.render_layers:
+            layer()
+
+    def draw_board(self):
         # Background
-        if self.game_mode == DEAD_OF_NIGHT:
-            self.screen.fill(DARK_NIGHT)
-        else:
-            self.screen.fill(BLACK)
+        self.screen.fill(self.background_color)
 
         # Game border with 3D effect
         border = pygame.Rect(self.game_x - 10, self.game_y - 10,
@@ -835,12 +1399,9 @@ class SnakeGame:
 
         # Game area
         game_area = pygame.Rect(self.game_x, self.game_y, GAME_WIDTH, GAME_HEIGHT)
-        if self.game_mode == DEAD_OF_NIGHT:
-            pygame.draw.rect(self.screen, DARK_NIGHT, game_area)
-        else:
-            pygame.draw.rect(self.screen, BLACK, game_area)
+        pygame.draw.rect(self.screen, self.background_color, game_area)
 
-        # Draw obstacles
+    def draw_obstacles(self):
         for obs in self.obstacles:
             rect = pygame.Rect(
                 self.game_x + obs[0] * GRID_SIZE,
@@ -849,198 +1410,311 @@ class SnakeGame:
             pygame.draw.rect(self.screen, BLUE, rect)
             pygame.draw.rect(self.screen, (0, 0, 100), rect, 2)
 
-        # Draw ice blocks for WINTER mode
-        if self.game_mode == WINTER:
-            for ice in self.ice_blocks:
-                rect = pygame.Rect(
-                    self.game_x + ice[0] * GRID_SIZE,
-                    self.game_y + ice[1] * GRID_SIZE,
-                    GRID_SIZE, GRID_SIZE)
-                pygame.draw.rect(self.screen, ICE_COLOR, rect)
-                pygame.draw.rect(self.screen, (150, 200, 255), rect, 1)
-
-                # Draw ice pattern
-                for i in range(3):
-                    offset = i * 3
-                    pygame.draw.line(self.screen, (220, 240, 255),
-                                     (rect.left + offset, rect.top + offset),
-                                     (rect.left + offset, rect.bottom - offset), 1)
-                    pygame.draw.line(self.screen, (220, 240, 255),
-                                     (rect.left + offset, rect.top + offset),
-                                     (rect.right - offset, rect.top + offset), 1)
-
-        # Draw food
-        food_rect = pygame.Rect(
-            self.game_x + self.food[0] * GRID_SIZE,
-            self.game_y + self.food[1] * GRID_SIZE,
-            GRID_SIZE, GRID_SIZE)
-        pygame.draw.rect(self.screen, RED, food_rect)
-        pygame.draw.rect(self.screen, (100, 0, 0), food_rect, 2)
+    def draw_ice(self):
+        quality = self.quality.settings
+        for ice in self.ice_blocks:
+            rect = pygame.Rect(
+                self.game_x + ice[0] * GRID_SIZE,
+                self.game_y + ice[1] * GRID_SIZE,
+                GRID_SIZE, GRID_SIZE)
+            pygame.draw.rect(self.screen, ICE_COLOR, rect)
+            pygame.draw.rect(self.screen, (150, 200, 255), rect, 1)
+
+            # Draw ice pattern
+            for i in range(quality['ice_lines']):
+                offset = i * 3
+                pygame.draw.line(self.screen, (220, 240, 255),
+                                 (rect.left + offset, rect.top + offset),
+                                 (rect.left + offset, rect.bottom - offset), 1)
+                pygame.draw.line(self.screen, (220, 240, 255),
+                                 (rect.left + offset, rect.top + offset),
+                                 (rect.right - offset, rect.top + offset), 1)
+
+    def cell_rect(self, cell):
+        return pygame.Rect(self.game_x + cell[0] * GRID_SIZE,
+                           self.game_y + cell[1] * GRID_SIZE,
+                           GRID_SIZE, GRID_SIZE)
+
+    def draw_food(self):
+        draw_food_cell(self.screen, self.cell_rect(self.food))
 
         # Draw special food
         if self.special_food:
-            food_rect = pygame.Rect(
-                self.game_x + self.special_food[0] * GRID_SIZE,
-                self.game_y + self.special_food[1] * GRID_SIZE,
-                GRID_SIZE, GRID_SIZE)
-            pygame.draw.rect(self.screen, SPECIAL_FOOD_COLOR, food_rect)
-
-            # Draw a star pattern on special food
-            center_x = food_rect.centerx
-            center_y = food_rect.centery
-            radius = GRID_SIZE // 2 - 2
-
-            # Draw a star
-            points = []
-            for i in range(5):
-                angle = math.pi / 2 + 2 * math.pi * i / 5
-                points.append((
-                    center_x + radius * math.cos(angle),
-                    center_y + radius * math.sin(angle)
-                ))
-                angle += math.pi / 5
-                points.append((
-                    center_x + radius * 0.4 * math.cos(angle),
-                    center_y + radius * 0.4 * math.sin(angle)
-                ))
-
-            pygame.draw.polygon(self.screen, WHITE, points)
-            pygame.draw.rect(self.screen, (150, 0, 0), food_rect, 2)
-
-        # Draw snake with flashlight effect for DEAD_OF_NIGHT mode
-        if self.game_mode == DEAD_OF_NIGHT:
-            # Create a surface for the darkness
-            darkness = pygame.Surface((GAME_WIDTH, GAME_HEIGHT), pygame.SRCALPHA)
-            darkness.fill((0, 0, 0, 220))  # Semi-transparent black
-
-            # Draw the flashlight around the snake's head
-            head = self.snake[0]
-            center = (head[0] * GRID_SIZE + GRID_SIZE // 2,
-                      head[1] * GRID_SIZE + GRID_SIZE // 2)
-########################################################
-            # Draw gradient circle for flashlight
-            for radius in range(self.flashlight_radius * GRID_SIZE, 0, -10):
-                alpha = min(255, radius * 2)
-                pygame.draw.circle(darkness, (0, 0, 0, alpha), center, radius)
-
-            self.screen.blit(darkness, (self.game_x, self.game_y))
-
-        # Draw player 1 snake
-        for i, segment in enumerate(self.snake):
-            color = self.snake_color
-            # Make head slightly different
-            if i == 0:
-                color = (min(self.snake_color[0] + 50, 255),
-                         min(self.snake_color[1] + 50, 255),
-                         min(self.snake_color[2] + 50, 255))
-
-            segment_rect = pygame.Rect(
-                self.game_x + segment[0] * GRID_SIZE,
-                self.game_y + segment[1] * GRID_SIZE,
-                GRID_SIZE, GRID_SIZE)
-            pygame.draw.rect(self.screen, color, segment_rect)
-            pygame.draw.rect(self.screen, BLACK, segment_rect, 1)
-
-        # Draw player 2 or AI snake
-        if self.game_mode in [MULTIPLAYER, AI_MODE]:
-            snake_color = PLAYER2_COLOR if self.game_mode == MULTIPLAYER else AI_COLOR
-            for i, segment in enumerate(self.snake2):
-                color = snake_color
-                # Make head slightly different
-                if i == 0:
-                    color = (min(snake_color[0] + 50, 255),
-                             min(snake_color[1] + 50, 255),
-                             min(snake_color[2] + 50, 255))
-
-                segment_rect = pygame.Rect(
-                    self.game_x + segment[0] * GRID_SIZE,
-                    self.game_y + segment[1] * GRID_SIZE,
-                    GRID_SIZE, GRID_SIZE)
-                pygame.draw.rect(self.screen, color, segment_rect)
-                pygame.draw.rect(self.screen, BLACK, segment_rect, 1)
-
-        # Draw particles
+            draw_special_food_cell(self.screen, self.cell_rect(self.special_food))
+
+    def draw_darkness(self):
+        # Surface for the darkness, reused every frame
+        if self.darkness is None:
+            self.darkness = pygame.Surface((GAME_WIDTH, GAME_HEIGHT), pygame.SRCALPHA)
+        darkness = self.darkness
+        darkness.fill((0, 0, 0, 220))  # Semi-transparent black
+
+        # Draw the flashlight around the snake's head
+        head = self.snake[0]
+        center = (head[0] * GRID_SIZE + GRID_SIZE // 2,
+                  head[1] * GRID_SIZE + GRID_SIZE // 2)
+        draw_flashlight(darkness, center, self.flashlight_radius * GRID_SIZE,
+                        self.quality.settings['flashlight_step'])
+
+        self.screen.blit(darkness, (self.game_x, self.game_y))
+
+    def draw_snake(self, body, snake_color):
+        """Draw a snake body; the head is drawn slightly lighter."""
+        outlines = self.quality.settings['segment_outlines']
+        head_color = lighter(snake_color)
+        for i, segment in enumerate(body):
+            draw_segment(self.screen, self.cell_rect(segment), head_color if i == 0 else snake_color, outlines)
+
+    def cell_sprite(self, color, outlines, alpha, over=None):
+        """Translucent cell sprite, or with `over` already blended onto that colour."""
+        key = (color, outlines, alpha, over)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((GRID_SIZE, GRID_SIZE), 0, self.screen)
+            if over is None:
+                # Segments fill their cell, so an opaque sprite with surface alpha
+                # will do, and it blends several times faster than per-pixel alpha
+                draw_segment(sprite, sprite.get_rect(), color, outlines)
+                sprite.set_alpha(alpha, pygame.RLEACCEL)
+            else:
+                sprite.fill(over)
+                sprite.blit(self.cell_sprite(color, outlines, alpha), (0, 0))
+                # A colour key it never uses gets SDL's RLE copy, which is
+                # several times faster than a plain copy for cell-sized blits
+                sprite.set_colorkey((255, 0, 255), pygame.RLEACCEL)
+            self.sprites[key] = sprite
+        return sprite
+
+    def draw_player1(self):
+        self.draw_snake(self.snake, self.snake_color)
+
+    def draw_player2(self):
+        self.draw_snake(self.snake2, self.snake2_color)
+
+    def draw_ghost(self):
+        # Over the plain board a translucent cell always comes out the same
+        # colour, so only cells over food or obstacles are blended; the rest
+        # are copied from pre-blended sprites.  The list changes once per tick
+        ghost = self.ghost
+        outlines = self.quality.settings['segment_outlines']
+        key = (ghost, ghost.tick, self.food, self.special_food, id(self.obstacles),
+               self.background_color, outlines)
+        if self.ghost_blits is None or self.ghost_blits[0] != key:
+            under = set(self.obstacles)
+            under.add(self.food)
+            under.add(self.special_food)
+            head_color = lighter(GHOST_COLOR)
+            plain = [self.cell_sprite(color, outlines, GHOST_ALPHA, self.background_color)
+                     for color in (head_color, GHOST_COLOR)]
+            blended = [self.cell_sprite(color, outlines, GHOST_ALPHA)
+                       for color in (head_color, GHOST_COLOR)]
+            game_x, game_y = self.game_x, self.game_y
+            blits = []
+            for i, cell in enumerate(ghost.body):
+                sprites = blended if cell in under else plain
+                blits.append((sprites[i > 0], (game_x + cell[0] * GRID_SIZE, game_y + cell[1] * GRID_SIZE)))
+            self.ghost_blits = (key, blits)
+        self.screen.blits(self.ghost_blits[1], doreturn=False)
+
+    def draw_particles(self):
         for p in self.particles:
             pygame.draw.circle(self.screen, p['color'],
                                (int(p['pos'][0]), int(p['pos'][1])),
                                p['size'])
 
-        # Draw UI
+    def hud_texts(self):
+        """(font, text, color, x, y, align) for every HUD line; x is the left
+        edge, right edge or centre depending on `align`."""
         # Player 1 score
-        score_text = self.font_medium.render(f"{self.player_names[0]}: {self.score}", True, self.snake_color)
-        self.screen.blit(score_text, (20, 20))
+        texts = [(self.font_medium, f"{self.player_names[0]}: {self.score}", self.snake_color, 20, 20, 'left')]
 
         # Player 2 or AI score
-        if self.game_mode == MULTIPLAYER:
-            score2_text = self.font_medium.render(f"{self.player_names[1]}: {self.score2}", True, PLAYER2_COLOR)
-            self.screen.blit(score2_text, (20, 60))
-        elif self.game_mode == AI_MODE:
-            score2_text = self.font_medium.render(f"AI: {self.score2}", True, AI_COLOR)
-            self.screen.blit(score2_text, (20, 60))
+        if self.rules.snakes == 2:
+            name = "AI" if self.rules.ai else self.player_names[1]
+            texts.append((self.font_medium, f"{name}: {self.score2}", self.snake2_color, 20, 60, 'left'))
         else:
-            hs_text = self.font_small.render(f"High Score: {self.high_score}", True, GOLD)
-            self.screen.blit(hs_text, (20, 60))
+            texts.append((self.font_small, f"High Score: {self.high_score}", GOLD, 20, 60, 'left'))
+            if self.ghost:
+                texts.append((self.font_small, f"Ghost: {self.ghost.score}", GHOST_COLOR, 20, 90, 'left'))
+
+        right = WINDOW_WIDTH - 20
+        texts.append((self.font_small, f"Difficulty: {self.difficulty}", WHITE, right, 20, 'right'))
 
-        diff_text = self.font_small.render(f"Difficulty: {self.difficulty}", True, WHITE)
-        self.screen.blit(diff_text, (WINDOW_WIDTH - diff_text.get_width() - 20, 20))
+        # Show current mode
+        texts.append((self.font_small, *self.mode_label, right, 60, 'right'))
 
         # Show current speed
-        speed_text = self.font_small.render(f"Speed: {self.speed}", True, WHITE)
-        self.screen.blit(speed_text, (WINDOW_WIDTH - speed_text.get_width() - 20, 100))
+        texts.append((self.font_small, f"Speed: {self.speed}", WHITE, right, 100, 'right'))
 
-        # Show current mode
-        if self.game_mode == DEAD_OF_NIGHT:
-            mode_text = self.font_small.render("Mode: Dead of Night", True, (100, 100, 255))
-        elif self.game_mode == WINTER:
-            mode_text = self.font_small.render("Mode: Winter", True, ICE_COLOR)
-        elif self.game_mode == MULTIPLAYER:
-            mode_text = self.font_small.render("Mode: Multiplayer", True, PLAYER2_COLOR)
-        elif self.game_mode == AI_MODE:
-            mode_text = self.font_small.render("Mode: AI", True, AI_COLOR)
-        else:
-            mode_text = self.font_small.render("Mode: Normal", True, WHITE)
-        self.screen.blit(mode_text, (WINDOW_WIDTH - mode_text.get_width() - 20, 60))
+        # Input latency in measurement mode
+        if self.latency:
+            stats = self.latency.summary()
+            if stats:
+                texts.append((self.font_small, f"Input: {stats['mean']:.0f} ms avg / {stats['p95']:.0f} ms p95",
+                              WHITE, right, 140, 'right'))
 
         # Pause text
         if self.paused:
-            pause_text = self.font_large.render("PAUSED", True, WHITE)
-            self.screen.blit(pause_text,
-                             (WINDOW_WIDTH // 2 - pause_text.get_width() // 2,
-                              WINDOW_HEIGHT // 2 - pause_text.get_height() // 2))
+            texts.append((self.font_large, "PAUSED", WHITE, WINDOW_WIDTH // 2,
+                          WINDOW_HEIGHT // 2 - self.font_large.get_height() // 2, 'center'))
 
         # Controls help
-        if self.game_mode == MULTIPLAYER:
-            controls = self.font_small.render(
-                f"{self.player_names[0]}: WASD | {self.player_names[1]}: Arrows | SPACE: Pause", True, WHITE)
-        elif self.game_mode == AI_MODE:
-            controls = self.font_small.render("WASD: Move | SPACE: Pause | ESC: Exit", True, WHITE)
-        else:
-            controls = self.font_small.render("WASD/Arrows: Move | SPACE: Pause | P: Save | L: Load", True, WHITE)
-        self.screen.blit(controls, (WINDOW_WIDTH // 2 - controls.get_width() // 2, WINDOW_HEIGHT - 30))
+        texts.append((self.font_small, self.controls_help, WHITE, WINDOW_WIDTH // 2, WINDOW_HEIGHT - 30, 'center'))
+        return texts
+
+    def draw_hud(self):
+        for font, text, color, x, y, align in self.hud_texts():
+            surface = self.compositor.text(font, text, color)
+            if align == 'right':
+                x -= surface.get_width()
+            elif align == 'center':
+                x -= surface.get_width() // 2
+            self.screen.blit(surface, (x, y))
+
+    # -- texture backend (snake_render) --------------------------------------
+    def texture_board(self):
+        """Background, border, obstacles and ice: one texture per layout."""
+        gpu = self.gpu
+        key = ('board', self.background_color, id(self.obstacles), len(self.obstacles),
+               id(self.ice_blocks), len(self.ice_blocks), self.quality.settings['ice_lines'])
+        if key not in gpu.textures:
+            gpu.forget('board')
+        gpu.texture(key, self.compose_board, opaque=True).draw()
+
+    def compose_board(self):
+        self.draw_board()
+        self.draw_obstacles()
+        if self.rules.ice:
+            self.draw_ice()
+        return self.screen
+
+    def sprite(self, key, draw):
+        """Cell-sized texture drawn once by `draw(surface, rect)`."""
+        def build():
+            surface = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
+            draw(surface, surface.get_rect())
+            return surface
+        return self.gpu.texture(key, build)
+
+    def texture_food(self):
+        x, y = self.food
+        self.sprite(('food',), draw_food_cell).draw(
+            dstrect=(self.game_x + x * GRID_SIZE, self.game_y + y * GRID_SIZE))
+        if self.special_food:
+            x, y = self.special_food
+            self.sprite(('special',), draw_special_food_cell).draw(
+                dstrect=(self.game_x + x * GRID_SIZE, self.game_y + y * GRID_SIZE))
+
+    def texture_darkness(self):
+        # A mask twice the board size with the flashlight in the middle; the
+        # part that lines the light up with the head is copied each frame
+        radius = self.flashlight_radius * GRID_SIZE
+        step = self.quality.settings['flashlight_step']
+
+        def build():
+            mask = pygame.Surface((2 * GAME_WIDTH, 2 * GAME_HEIGHT), pygame.SRCALPHA)
+            mask.fill((0, 0, 0, 220))
+            draw_flashlight(mask, (GAME_WIDTH, GAME_HEIGHT), radius, step)
+            return mask
+        head = self.snake[0]
+        left = GAME_WIDTH - head[0] * GRID_SIZE - GRID_SIZE // 2
+        top = GAME_HEIGHT - head[1] * GRID_SIZE - GRID_SIZE // 2
+        self.gpu.texture(('darkness', radius, step), build).draw(
+            srcrect=(left, top, GAME_WIDTH, GAME_HEIGHT),
+            dstrect=(self.game_x, self.game_y, GAME_WIDTH, GAME_HEIGHT))
+
+    def texture_snake(self, body, snake_color, alpha=None):
+        outlines = self.quality.settings['segment_outlines']
+        head_color = lighter(snake_color)
+        head = self.sprite(('segment', head_color, outlines, alpha),
+                           lambda surface, rect: draw_segment(surface, rect, head_color, outlines))
+        cell = self.sprite(('segment', snake_color, outlines, alpha),
+                           lambda surface, rect: draw_segment(surface, rect, snake_color, outlines))
+        if alpha is not None:
+            head.alpha = cell.alpha = alpha
+        game_x, game_y = self.game_x, self.game_y
+        sprite = head
+        for x, y in body:
+            sprite.draw(dstrect=(game_x + x * GRID_SIZE, game_y + y * GRID_SIZE))
+            sprite = cell
+
+    def texture_player1(self):
+        self.texture_snake(self.snake, self.snake_color)
+
+    def texture_player2(self):
+        self.texture_snake(self.snake2, self.snake2_color)
+
+    def texture_ghost(self):
+        self.texture_snake(self.ghost.body, GHOST_COLOR, GHOST_ALPHA)
+
+    def texture_particles(self):
+        # One white disc per size, tinted per particle
+        for p in self.particles:
+            size = p['size']
+
+            def build(size=size):
+                surface = pygame.Surface((2 * size, 2 * size), pygame.SRCALPHA)
+                pygame.draw.circle(surface, WHITE, (size, size), size)
+                return surface
+            disc = self.gpu.texture(('particle', size), build)
+            disc.color = p['color']
+            disc.draw(dstrect=(int(p['pos'][0]) - size, int(p['pos'][1]) - size))
+
+    def texture_hud(self):
+        for font, text, color, x, y, align in self.hud_texts():
+            texture = self.gpu.text(font, text, color)
+            if align == 'right':
+                x -= texture.width
+            elif align == 'center':
+                x -= texture.width // 2
+            texture.draw(dstrect=(x, y))
+
+    def texture_ai_playing(self):
+        # draw_ai_playing as texture copies: the overlay is uploaded once
+        for layer in self.texture_layers:
+            layer()
+        size = (WINDOW_WIDTH, WINDOW_HEIGHT)
+        self.gpu.texture(('overlay', 100), lambda: self.compositor.overlay(size, 100)).draw()
+        ai_text = self.gpu.text(self.font_large, "AI IS PLAYING...", AI_COLOR)
+        ai_text.draw(dstrect=(WINDOW_WIDTH // 2 - ai_text.width // 2, 50))
+        controls = self.gpu.text(self.font_medium, "Press ESC to return to settings", WHITE)
+        controls.draw(dstrect=(WINDOW_WIDTH // 2 - controls.width // 2, WINDOW_HEIGHT - 50))
 
     def draw_ai_playing(self):
         self.draw_game()
 
         # Dark overlay
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 100))
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.compositor.overlay(self.screen.get_size(), 100), (0, 0))
 
         # AI playing text
-        ai_text = self.font_large.render("AI IS PLAYING...", True, AI_COLOR)
+        ai_text = self.compositor.text(self.font_large, "AI IS PLAYING...", AI_COLOR)
         self.screen.blit(ai_text, (WINDOW_WIDTH // 2 - ai_text.get_width() // 2, 50))
 
         # Controls help
-        controls = self.font_medium.render("Press ESC to return to settings", True, WHITE)
+        controls = self.compositor.text(self.font_medium, "Press ESC to return to settings", WHITE)
         self.screen.blit(controls, (WINDOW_WIDTH // 2 - controls.get_width() // 2, WINDOW_HEIGHT - 50))
 
+    def draw_paused(self):
+        # The board is frozen while paused
+        self.compositor.frozen(self.screen, self.draw_game)
+
     def draw_game_over(self):
+        # Board, overlay and result text never change on this screen
+        self.compositor.frozen(self.screen, self.draw_game_over_background)
+
+        # Draw buttons
+        self.restart_button.draw(self.screen)
+        self.menu_button.draw(self.screen)
+
+        # Add AI button in AI mode
+        if self.rules.ai:
+            self.ai_button.draw(self.screen)
+
+    def draw_game_over_background(self):
         self.draw_game()
 
         # Dark overlay
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.compositor.overlay(self.screen.get_size(), 180), (0, 0))
 
         # Game over text
         game_over = self.font_large.render("GAME OVER", True, RED)
@@ -1049,7 +1723,7 @@ class SnakeGame:
                           WINDOW_HEIGHT // 2 - 100))
 
         # Score text
-        if self.game_mode == MULTIPLAYER:
+        if self.rules.snakes == 2 and not self.rules.ai:
             score_text = self.font_medium.render(f"{self.player_names[0]}: {self.score}", True, self.snake_color)
             score2_text = self.font_medium.render(f"{self.player_names[1]}: {self.score2}", True, PLAYER2_COLOR)
 
@@ -1071,7 +1745,7 @@ class SnakeGame:
             self.screen.blit(winner_text,
                              (WINDOW_WIDTH // 2 - winner_text.get_width() // 2,
                               WINDOW_HEIGHT // 2 + 50))
-        elif self.game_mode == AI_MODE:
+        elif self.rules.ai:
             score_text = self.font_medium.render(f"You: {self.score}", True, self.snake_color)
             score2_text = self.font_medium.render(f"AI: {self.score2}", True, AI_COLOR)
 
@@ -1106,15 +1780,23 @@ class SnakeGame:
                                  (WINDOW_WIDTH // 2 - hs_text.get_width() // 2,
                                   WINDOW_HEIGHT // 2 + 20))
 
-        # Draw buttons
-        self.restart_button.draw(self.screen)
-        self.menu_button.draw(self.screen)
-
-        # Add AI button in AI mode
-        if self.game_mode == AI_MODE:
-            self.ai_button.draw(self.screen)
+        if self.practice_mode and len(self.rewind) > 1:
+            rewind_text = self.font_small.render(f"U: Rewind {REWIND_STEP} seconds", True, WHITE)
+            self.screen.blit(rewind_text,
+                             (WINDOW_WIDTH // 2 - rewind_text.get_width() // 2,
+                              WINDOW_HEIGHT // 2 + 110))
 
     def draw(self):
+        if self.gpu and self.state == PLAYING and not self.paused:
+            for layer in self.texture_layers:
+                layer()
+            self.gpu.present()
+            return
+        if self.gpu and self.state == AI_PLAYING:
+            self.texture_ai_playing()
+            self.gpu.present()
+            return
+
         if self.state == MENU:
             self.draw_menu()
         elif self.state == SETTINGS:
@@ -1125,29 +1807,81 @@ class SnakeGame:
             self.draw_ai_playing()
         elif self.state == GAME_OVER:
             self.draw_game_over()
+        elif self.paused:
+            self.draw_paused()
         else:
             self.draw_game()
 
-        pygame.display.flip()
+        if self.gpu:
+            self.gpu.present_surface(self.screen)
+        else:
+            pygame.display.flip()
 
     def run(self):
+        self.draw()
+        if self.profiler:
+            self.profiler.mark("first frame")
+            print(self.profiler.report())
+        # Warm up the mixer and sounds while the player looks at the menu
+        threading.Thread(target=self.sounds.preload, daemon=True).start()
+
         while True:
+            if not self.is_simulating():
+                self.idle_step()
+                self.last_frame = None
+                continue
+            frame_start = time.perf_counter()
+            if self.last_frame is not None:
+                self.telemetry.observe(FRAME_MS, frame_start - self.last_frame)
+            self.last_frame = frame_start
             self.handle_events()
+            self.audio.flush()
             self.update()
             self.draw()
+            work = time.perf_counter() - frame_start
+            self.telemetry.count(FRAMES)
+            self.telemetry.observe(WORK_MS, work)
+            if self.quality.record(work):
+                del self.particles[self.quality.settings['max_particles']:]
             self.clock.tick(60)  # 60 FPS for smooth animations
 
 
 if __name__ == "__main__":
-    # We need numpy for sound generation
-    try:
-        import numpy
-    except ImportError:
-        print("Installing required numpy package...")
-        import subprocess
-
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "numpy"])
-        import numpy
-
-    game = SnakeGame()
+    parser = argparse.ArgumentParser(description="Ultimate Snake Game")
+    parser.add_argument("--ai", default="greedy",
+                        help="controller for the AI snake: greedy, path, mcts, hamilton, a .py plugin or a .npz model; "
+                             "names take options, e.g. mcts:workers=4 to spread rollouts over 4 processes")
+    parser.add_argument("--player1-ai", default=None,
+                        help="let a controller drive player 1 as well")
+    parser.add_argument("--ai-budget", type=float, default=50,
+                        help="per-move time budget for controllers in milliseconds")
+    parser.add_argument("--disable", action="append", default=[], metavar="SUBSCRIBER",
+                        choices=["audio", "particles", "persistence", "stats"],
+                        help="turn off an event subscriber (repeatable)")
+    parser.add_argument("--measure-latency", action="store_true",
+                        help="show and report key-press-to-move latency in milliseconds")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print time to first frame broken down by phase")
+    parser.add_argument("--quality", default="auto", choices=["auto"] + TIER_NAMES,
+                        help="visual quality tier; auto adapts to frame time")
+    parser.add_argument("--levels", default=LEVEL_DIR, metavar="DIR",
+                        help="directory with level packs (built by snake_levels.py)")
+    parser.add_argument("--ai-process", action="store_true",
+                        help="run AI controllers in worker processes sharing the board through shared memory")
+    parser.add_argument("--renderer", default="auto", choices=BACKENDS,
+                        help="draw with SDL textures (texture, texture-software) or on a surface; "
+                             "auto uses the GPU when there is one")
+    parser.add_argument("--telemetry", default=None, metavar="DIR",
+                        help="record session telemetry in rotating logs in DIR (read with snake_telemetry.py)")
+    parser.add_argument("--ghosts", default=GHOST_DIR, metavar="DIR",
+                        help="directory for ghost runs raced in Normal mode (setting 0)")
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile_startup:
+        profiler = StartupProfiler(_IMPORT_START)
+        profiler.mark("pygame import", _PYGAME_IMPORTED)
+    game = SnakeGame(args.ai, args.player1_ai, args.ai_budget / 1000, args.disable,
+                     args.measure_latency, profiler, args.quality, args.levels, args.ai_process,
+                     args.renderer, args.telemetry, args.ghosts)
     game.run()
\ No newline at end of file
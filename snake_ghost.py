@@ -0,0 +1,129 @@
+"""Ghost racing: the best run on a course, replayed next to the player.
+
+A ghost file stores one byte per tick after a small header: the direction
+index in the low two bits and a "grew" flag in bit 2, so a 10,000-tick run
+is 10 KB.  `GhostReader` decodes it as a stream, one tick ahead of the
+board, through a small read buffer; a ghost is never loaded whole.  Files
+are kept per course, ``<difficulty>-<seed>.ghost``, and only a better
+score replaces one.
+"""
+import glob
+import os
+import struct
+from collections import deque
+
+from snake_constants import DIRECTIONS, GRID_WIDTH, GRID_HEIGHT
+
+GHOST_DIR = 'ghosts'
+MAGIC = b'SNGH'
+VERSION = 1
+HEADER = struct.Struct('<4sBIIIBB')  # magic, version, seed, score, ticks, start x, start y
+GREW = 4
+READ_SIZE = 4096  # ticks decoded per file read
+
+
+def encode_tick(direction, grew):
+    return DIRECTIONS.index(direction) | (GREW if grew else 0)
+
+
+class GhostLibrary:
+    def __init__(self, directory=GHOST_DIR):
+        self.directory = directory
+
+    def path(self, difficulty, seed):
+        return os.path.join(self.directory, f"{difficulty}-{seed}.ghost")
+
+    @staticmethod
+    def read_header(path):
+        """``(seed, score, ticks, start)`` of a ghost file, or None."""
+        try:
+            with open(path, 'rb') as f:
+                magic, version, seed, score, ticks, x, y = HEADER.unpack(f.read(HEADER.size))
+        except (OSError, struct.error):
+            return None
+        if magic != MAGIC or version != VERSION:
+            return None
+        return seed, score, ticks, (x, y)
+
+    def score(self, difficulty, seed):
+        header = self.read_header(self.path(difficulty, seed))
+        return None if header is None else header[1]
+
+    def best(self, difficulty):
+        """Seed of the highest-scoring ghost for `difficulty`, or None."""
+        best = None
+        for path in glob.glob(os.path.join(self.directory, f"{difficulty}-*.ghost")):
+            header = self.read_header(path)
+            if header is not None and (best is None or header[1] > best[1]):
+                best = header
+        return None if best is None else best[0]
+
+    def save(self, difficulty, seed, score, start, trace):
+        """Keep this run if it beats the stored one; returns True if written."""
+        stored = self.score(difficulty, seed)
+        if stored is not None and stored >= score:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(difficulty, seed)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, seed, score, len(trace), start[0], start[1]))
+            f.write(trace)
+        os.replace(path + '.tmp', path)
+        return True
+
+    def open(self, difficulty, seed):
+        path = self.path(difficulty, seed)
+        if self.read_header(path) is None:
+            return None
+        return GhostReader(path)
+
+
+class GhostReader:
+    """A recorded run, advanced one tick at a time."""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        _, _, self.seed, self.score, self.ticks, x, y = HEADER.unpack(self.file.read(HEADER.size))
+        self.start = (x, y)
+        self.seek(0)
+
+    def _read(self):
+        if self._pos == len(self._buffer):
+            self._buffer = self.file.read(READ_SIZE)
+            self._pos = 0
+            if not self._buffer:
+                return None
+        code = self._buffer[self._pos]
+        self._pos += 1
+        return code
+
+    def advance(self):
+        """Move the ghost one tick; it stays where it is once its run is over."""
+        code = self._next
+        if code is None:
+            return
+        self._next = self._read()
+        dx, dy = DIRECTIONS[code & 3]
+        x, y = self.body[0]
+        self.body.appendleft(((x + dx) % GRID_WIDTH, (y + dy) % GRID_HEIGHT))
+        if not code & GREW:
+            self.body.pop()
+        self.tick += 1
+
+    @property
+    def finished(self):
+        return self._next is None
+
+    def seek(self, tick):
+        """Restart the replay and run it forward to `tick`, e.g. after a rewind."""
+        self.file.seek(HEADER.size)
+        self._buffer = b''
+        self._pos = 0
+        self.body = deque([self.start])
+        self.tick = 0
+        self._next = self._read()
+        while self.tick < tick and self._next is not None:
+            self.advance()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,333 @@
+"""Hamiltonian-cycle AI that never traps itself.
+
+The interior is split into 2x2 macro cells.  A spanning tree over the macro
+cells without obstacles is thickened into one closed path that visits every
+cell of those macro cells once; free cells left over next to obstacles are
+spliced in pairwise where the path runs alongside them.  The result is
+cached per board size and obstacle layout.
+
+A cycle cannot cover every free cell in general: it alternates between the
+two colours of the checkerboard, so a layout with more free cells of one
+colour always leaves some out.  For each cell left out the cycle stores a
+detour - enter from one cycle cell, run through the pocket of left-out
+cells, rejoin further along - so food there can still be eaten.
+
+Each tick the controller looks up the cycle positions of the head, the tail
+and the food (flat tables, so the cost does not depend on the board size)
+and takes the neighbour that jumps furthest along the cycle without passing
+the food or getting close to its own tail.  The body then always lies in
+cycle order behind the head, so following the cycle is always possible.
+"""
+from collections import deque
+
+from snake_constants import GRID_WIDTH, GRID_HEIGHT
+from snake_ai import Controller
+
+GROWTH_MARGIN = 4  # cells kept free in front of the tail for growth
+SHORTCUT_LIMIT = 0.5  # no shortcuts once the snake covers this much of the cycle
+POCKET_LIMIT = 8  # left-out cells searched for detours, per pocket
+
+
+class Cycle:
+    """Cycle order of the cells: `cells[k]` and `position[index] -> k` (-1 = off the cycle)."""
+
+    def __init__(self, cells, width, height):
+        self.width = width
+        self.height = height
+        self.cells = cells
+        self.length = len(cells)
+        self.position = [-1] * (width * height)
+        for k, (x, y) in enumerate(cells):
+            self.position[y * width + x] = k
+        self.detours = {}  # left-out cell -> (entry, cells through the pocket, exit)
+
+    def __len__(self):
+        return self.length
+
+    def pos(self, cell):
+        return self.position[cell[1] * self.width + cell[0]]
+
+    def next_cell(self, cell):
+        return self.cells[(self.pos(cell) + 1) % self.length]
+
+
+def _macro_tree(free, start):
+    """Spanning tree (DFS) of the free macro cells reachable from `start`; returns its edges."""
+    edges = []
+    seen = {start}
+    stack = [start]
+    while stack:
+        mx, my = stack[-1]
+        for nxt in ((mx + 1, my), (mx, my + 1), (mx - 1, my), (mx, my - 1)):
+            if nxt in free and nxt not in seen:
+                seen.add(nxt)
+                edges.append(((mx, my), nxt))
+                stack.append(nxt)
+                break
+        else:
+            stack.pop()
+    return seen, edges
+
+
+def _link(adjacent, a, b):
+    adjacent.setdefault(a, set()).add(b)
+    adjacent.setdefault(b, set()).add(a)
+
+
+def _unlink(adjacent, a, b):
+    adjacent[a].discard(b)
+    adjacent[b].discard(a)
+
+
+def build_cycle(obstacles, width=GRID_WIDTH, height=GRID_HEIGHT):
+    blocked = set(obstacles)
+    macro_w, macro_h = (width - 2) // 2, (height - 2) // 2
+
+    def corners(mx, my):
+        x, y = 1 + 2 * mx, 1 + 2 * my
+        return (x, y), (x + 1, y), (x + 1, y + 1), (x, y + 1)  # clockwise from top-left
+
+    free = {(mx, my) for mx in range(macro_w) for my in range(macro_h)
+            if not blocked.intersection(corners(mx, my))}
+    if not free:
+        raise ValueError("no room for a cycle")
+
+    # Largest connected group of free macro cells
+    best = set()
+    rest = set(free)
+    while rest:
+        component, _ = _macro_tree(rest, next(iter(rest)))
+        rest -= component
+        if len(component) > len(best):
+            best = component
+    component, edges = _macro_tree(best, min(best))
+
+    # Every macro cell is a 4-cycle; each tree edge merges two of them into one
+    adjacent = {}
+    for m in component:
+        ring = corners(*m)
+        for i in range(4):
+            _link(adjacent, ring[i], ring[(i + 1) % 4])
+    for a, b in edges:
+        a, b = min(a, b), max(a, b)
+        tl_a, tr_a, br_a, bl_a = corners(*a)
+        tl_b, tr_b, br_b, bl_b = corners(*b)
+        if a[1] == b[1]:  # b is right of a
+            _unlink(adjacent, tr_a, br_a)
+            _unlink(adjacent, tl_b, bl_b)
+            _link(adjacent, tr_a, tl_b)
+            _link(adjacent, br_a, bl_b)
+        else:  # b is below a
+            _unlink(adjacent, bl_a, br_a)
+            _unlink(adjacent, tl_b, tr_b)
+            _link(adjacent, bl_a, tl_b)
+            _link(adjacent, br_a, tr_b)
+
+    _splice_leftovers(adjacent, blocked, width, height)
+
+    # Walk the cycle
+    start = min(adjacent)
+    cells = [start]
+    previous, cell = None, start
+    while True:
+        a, b = adjacent[cell]
+        previous, cell = cell, (a if a != previous else b)
+        if cell == start:
+            break
+        cells.append(cell)
+    cycle = Cycle(cells, width, height)
+    _add_detours(cycle, blocked)
+    return cycle
+
+
+def _splice_leftovers(adjacent, blocked, width, height):
+    """Replace cycle edges a-b by a-u-v-b for free pairs u-v running alongside."""
+    changed = True
+    while changed:
+        changed = False
+        for x in range(1, width - 1):
+            for y in range(1, height - 1):
+                u = (x, y)
+                if u in adjacent or u in blocked:
+                    continue
+                for dx, dy in ((1, 0), (0, 1), (-1, 0), (0, -1)):
+                    v = (x + dx, y + dy)
+                    if v in adjacent or v in blocked or not (0 < v[0] < width - 1 and 0 < v[1] < height - 1):
+                        continue
+                    for sx, sy in ((dy, dx), (-dy, -dx)):  # the sides of the u-v pair
+                        a, b = (u[0] + sx, u[1] + sy), (v[0] + sx, v[1] + sy)
+                        if a in adjacent and b in adjacent[a]:
+                            _unlink(adjacent, a, b)
+                            _link(adjacent, a, u)
+                            _link(adjacent, u, v)
+                            _link(adjacent, v, b)
+                            changed = True
+                            break
+                    if u in adjacent:
+                        break
+
+
+def _add_detours(cycle, blocked):
+    """Find the shortest detour through each free cell the cycle leaves out.
+
+    A detour is a simple path through left-out cells from a neighbour of one
+    cycle cell (the entry) to a neighbour of another one further along (the
+    exit).  Cells in a dead end get none.
+    """
+    width, height, n = cycle.width, cycle.height, cycle.length
+
+    def neighbours(cell):
+        x, y = cell
+        for nxt in ((x + 1, y), (x, y + 1), (x - 1, y), (x, y - 1)):
+            if 0 < nxt[0] < width - 1 and 0 < nxt[1] < height - 1 and nxt not in blocked:
+                yield nxt
+
+    left_out = {(x, y) for x in range(1, width - 1) for y in range(1, height - 1)
+                if (x, y) not in blocked and cycle.pos((x, y)) < 0}
+    seen = set()
+    for first in left_out:
+        if first in seen:
+            continue
+        pocket, _ = _macro_tree(left_out, first)  # cells, not macro cells, here
+        seen |= pocket
+        if len(pocket) > POCKET_LIMIT:
+            continue
+        best = {}  # cell -> (skipped, length, detour)
+
+        def extend(path):
+            entries = [c for c in neighbours(path[0]) if cycle.pos(c) >= 0]
+            exits = [c for c in neighbours(path[-1]) if cycle.pos(c) >= 0]
+            for entry in entries:
+                for exit in exits:
+                    skipped = (cycle.pos(exit) - cycle.pos(entry)) % n
+                    if skipped == 0:
+                        continue
+                    key = (skipped, len(path))
+                    for cell in path:
+                        if cell not in best or key < best[cell][:2]:
+                            best[cell] = key + ((entry, tuple(path), exit),)
+            for nxt in neighbours(path[-1]):
+                if nxt in pocket and nxt not in path:
+                    extend(path + [nxt])
+
+        for start in pocket:
+            extend([start])
+        for cell, (_, _, detour) in best.items():
+            cycle.detours[cell] = detour
+
+
+_cache = {}
+
+
+def cycle_for_layout(obstacles, width=GRID_WIDTH, height=GRID_HEIGHT):
+    key = (width, height, frozenset(obstacles))
+    cycle = _cache.get(key)
+    if cycle is None:
+        if len(_cache) >= 16:
+            _cache.clear()
+        cycle = _cache[key] = build_cycle(obstacles, width, height)
+    return cycle
+
+
+class HamiltonController(Controller):
+    """Follows a Hamiltonian cycle and takes shortcuts that keep the body in cycle order."""
+
+    name = 'hamilton'
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.route = deque()  # cells left to visit on the detour being taken
+        self.rejoined = {}  # left-out body cell -> cycle cell the head rejoined at after it
+        self.length = 0
+        self.idle = 0  # ticks since the snake last grew
+
+    def choose(self, view):
+        safe = view.safe_directions()
+        if not safe:
+            return view.direction
+        cycle = cycle_for_layout(view.obstacles, view.width, view.height)
+        n = cycle.length
+        body = view.body
+        head = body[0]
+        if len(body) != self.length:
+            self.length, self.idle = len(body), 0
+        else:
+            self.idle += 1
+
+        if self.route:
+            step = self.route.popleft()
+            for d in safe:
+                if view.neighbour(head, d) == step:
+                    return d
+            self.route.clear()  # a move was missed or the way is blocked: back to the cycle
+
+        head_pos = cycle.pos(head)
+        if head_pos < 0:
+            # Off the cycle without a detour to follow: rejoin as early as possible
+            back = cycle.pos(body[1]) if len(body) > 1 else 0
+            on_cycle = [d for d in safe if cycle.pos(view.neighbour(head, d)) >= 0]
+            if not on_cycle:
+                return safe[0]
+            return min(on_cycle, key=lambda d: (cycle.pos(view.neighbour(head, d)) - back) % n)
+
+        # Left-out cells just behind the head were a detour that rejoined here
+        i = 1
+        while i < len(body) and cycle.pos(body[i]) < 0:
+            self.rejoined[body[i]] = head
+            i += 1
+        # Measure the room from the last body cell on the cycle
+        tail = body[-1]
+        if cycle.pos(tail) < 0:
+            tail = self.rejoined.get(tail)
+            if tail is None or tail not in view.occupied:  # the rejoining tick was not seen
+                tail = next(cell for cell in reversed(body) if cycle.pos(cell) >= 0)
+        room = n if tail == head else (cycle.pos(tail) - head_pos) % n
+        shortcuts = len(body) < n * SHORTCUT_LIMIT
+
+        food = view.food
+        detour = None
+        reserve = 0  # cycle cells a detour to the food will skip
+        if food is None:
+            target = n
+        elif cycle.pos(food) >= 0:
+            target = (cycle.pos(food) - head_pos) % n
+        else:
+            detour = cycle.detours.get(food)
+            target = n
+            if detour:
+                entry, path, exit = detour
+                target = (cycle.pos(entry) - head_pos) % n
+                reserve = (cycle.pos(exit) - cycle.pos(entry)) % n
+
+        if detour is not None and target == 0:
+            # Without shortcuts the tail catches up with every skipped cell, so
+            # this is as much room as there will be: the board is as full as
+            # this layout allows, and the game ends on the food like a full board
+            stuck = self.idle > len(body) + n
+            if ((stuck or reserve < room - GROWTH_MARGIN) and
+                    view.occupied.isdisjoint(path)):
+                for d in safe:
+                    if view.neighbour(head, d) == path[0]:
+                        self.route.extend(path[1:] + (exit,))
+                        return d
+        elif food is not None and detour is None and cycle.pos(food) < 0:
+            # Food in a dead end can only be eaten at the cost of the game
+            for d in safe:
+                if view.neighbour(head, d) == food:
+                    return d
+
+        best, best_dist = None, 0
+        for d in safe:
+            p = cycle.pos(view.neighbour(head, d))
+            if p < 0:
+                continue
+            dist = (p - head_pos) % n
+            if dist != 1:
+                if (not shortcuts or dist == 0 or dist >= room - GROWTH_MARGIN - reserve or
+                        dist > target):
+                    continue
+            if dist > best_dist:
+                best, best_dist = d, dist
+        return best if best is not None else safe[0]
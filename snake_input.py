@@ -0,0 +1,85 @@
+"""Buffered direction input.
+
+Key presses are queued per snake and consumed one per move, so a quick
+up-then-left between two ticks turns twice instead of losing the first key.
+Each press is checked against the direction the snake will have once the
+presses before it have been applied, which stops a fast reversal from
+slipping through.
+"""
+import time
+from collections import deque
+
+
+def is_reversal(a, b):
+    return a[0] == -b[0] and a[1] == -b[1]
+
+
+class InputQueue:
+    def __init__(self, maxlen=3):
+        self.maxlen = maxlen
+        self.items = deque()
+
+    def __len__(self):
+        return len(self.items)
+
+    def clear(self):
+        self.items.clear()
+
+    def planned_direction(self, current):
+        """Direction after every queued press has been applied."""
+        return self.items[-1][0] if self.items else current
+
+    def push(self, direction, current, timestamp=None):
+        """Queue a press; returns False if it is a no-op, a reversal or the queue is full."""
+        planned = self.planned_direction(current)
+        if direction == planned or is_reversal(direction, planned) or len(self.items) >= self.maxlen:
+            return False
+        self.items.append((direction, time.perf_counter() if timestamp is None else timestamp))
+        return True
+
+    def pop(self, current):
+        """Next ``(direction, timestamp)`` that is valid for `current`, or None."""
+        while self.items:
+            direction, timestamp = self.items.popleft()
+            if direction != current and not is_reversal(direction, current):
+                return direction, timestamp
+        return None
+
+
+class LatencyMeter:
+    """Input-to-move latency samples in milliseconds."""
+
+    def __init__(self, size=1000):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self._summary = None  # the HUD asks every frame; samples come once per move
+
+    def record(self, seconds):
+        self.samples.append(seconds * 1000)
+        self.count += 1
+        self._summary = None
+
+    def summary(self):
+        if not self.samples:
+            return None
+        if self._summary is None:
+            self._summary = self._compute()
+        return self._summary
+
+    def _compute(self):
+        ordered = sorted(self.samples)
+        n = len(ordered)
+        return {
+            'count': self.count,
+            'mean': sum(ordered) / n,
+            'p50': ordered[n // 2],
+            'p95': ordered[min(n - 1, int(n * 0.95))],
+            'max': ordered[-1],
+        }
+
+    def report(self):
+        stats = self.summary()
+        if stats is None:
+            return "Input latency: no samples"
+        return ("Input latency: mean {mean:.1f} ms, p50 {p50:.1f} ms, p95 {p95:.1f} ms, "
+                "max {max:.1f} ms ({count} moves)".format(**stats))
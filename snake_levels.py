@@ -0,0 +1,287 @@
+"""Procedural obstacle and ice layouts that never cut the board apart.
+
+`generate_level` places obstacles (optionally in mirrored or rotated pairs)
+and ice blocks from a seed, keeps the spawn area clear and rejects any
+layout in which a flood fill from the first spawn cell does not reach every
+free cell.  Levels can be generated in bulk with a process pool and stored
+in a pack: a small header followed by one record per level holding its seed
+and two bitsets (obstacles, ice) of ``width * height`` bits each.  A pack is
+read with a single file read and records are decoded on demand.
+
+    python snake_levels.py build --count 500 --workers 4
+"""
+import argparse
+import os
+import random
+import struct
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from snake_constants import (
+    GRID_WIDTH, GRID_HEIGHT, RIGHT, LEFT,
+    DIFFICULTY_OBSTACLES, ICE_BLOCK_COUNT,
+)
+
+Level = namedtuple('Level', 'seed obstacles ice')
+
+SYMMETRIES = ('none', 'mirror', 'rotate')
+
+# Per-difficulty generator settings used for the game's packs
+LEVEL_PRESETS = {
+    "EASY": {'obstacles': DIFFICULTY_OBSTACLES["EASY"], 'symmetry': 'none'},
+    "MEDIUM": {'obstacles': DIFFICULTY_OBSTACLES["MEDIUM"], 'symmetry': 'mirror'},
+    "HARD": {'obstacles': DIFFICULTY_OBSTACLES["HARD"], 'symmetry': 'rotate'},
+}
+
+LEVEL_DIR = 'levels'
+PACK_MAGIC = b'SNLV'
+PACK_VERSION = 1
+_HEADER = struct.Struct('<4sBBBI')  # magic, version, width, height, level count
+_SEED = struct.Struct('<I')
+
+SPAWN_CLEARANCE = 3  # free cells kept in front of each starting snake
+
+
+def spawn_points(width=GRID_WIDTH, height=GRID_HEIGHT):
+    """Starting cell and direction of each snake."""
+    return [((width // 3, height // 2), RIGHT), ((width * 2 // 3, height // 2), LEFT)]
+
+
+def spawn_area(width=GRID_WIDTH, height=GRID_HEIGHT):
+    """Cells that must stay free: the spawn cells and the first few moves."""
+    cells = set()
+    for (x, y), (dx, dy) in spawn_points(width, height):
+        for step in range(SPAWN_CLEARANCE + 1):
+            cells.add((x + dx * step, y + dy * step))
+    return cells
+
+
+def _mirror_cells(cell, symmetry, width, height):
+    x, y = cell
+    if symmetry == 'mirror':
+        return {cell, (width - 1 - x, y)}
+    if symmetry == 'rotate':
+        return {cell, (width - 1 - x, height - 1 - y)}
+    return {cell}
+
+
+def is_connected(obstacles, width=GRID_WIDTH, height=GRID_HEIGHT, start=None):
+    """True if every free interior cell can be reached from `start`."""
+    blocked = bytearray(width * height)
+    for x in range(width):
+        blocked[x] = blocked[(height - 1) * width + x] = 1
+    for y in range(height):
+        blocked[y * width] = blocked[y * width + width - 1] = 1
+    for x, y in obstacles:
+        blocked[y * width + x] = 1
+    free = blocked.count(0)
+    if start is None:
+        start = spawn_points(width, height)[0][0]
+    index = start[1] * width + start[0]
+    if blocked[index]:
+        return False
+
+    blocked[index] = 1
+    reached = 1
+    queue = deque([index])
+    while queue:
+        index = queue.popleft()
+        for n in (index - 1, index + 1, index - width, index + width):
+            if not blocked[n]:
+                blocked[n] = 1
+                reached += 1
+                queue.append(n)
+    return reached == free
+
+
+def _scatter(rng, count, symmetry, taken, width, height):
+    """Up to `count` new cells in symmetric groups, avoiding `taken`."""
+    cells = []
+    while len(cells) < count:
+        cell = (rng.randint(1, width - 2), rng.randint(1, height - 2))
+        group = _mirror_cells(cell, symmetry, width, height)
+        if len(cells) + len(group) > count:
+            group = {cell}  # odd leftover: a single cell
+        if group & taken:
+            continue
+        taken |= group
+        cells.extend(sorted(group))
+    return cells
+
+
+def generate_level(seed=None, obstacles=5, ice=ICE_BLOCK_COUNT, symmetry='none', density=None,
+                   width=GRID_WIDTH, height=GRID_HEIGHT, rng=None, max_attempts=200):
+    """Random connected layout.
+
+    `density`, if given, is the fraction of interior cells to fill with
+    obstacles and overrides `obstacles`.  Pass `rng` to draw from an existing
+    random.Random instead of seeding a new one.
+    """
+    if symmetry not in SYMMETRIES:
+        raise ValueError(f"unknown symmetry {symmetry!r}")
+    if density is not None:
+        obstacles = round(density * (width - 2) * (height - 2))
+    if rng is None:
+        rng = random.Random(seed)
+    reserved = spawn_area(width, height)
+    if obstacles + ice + len(reserved) > (width - 2) * (height - 2):
+        raise ValueError("board too small for the requested layout")
+
+    for _ in range(max_attempts):
+        taken = set(reserved)
+        placed = _scatter(rng, obstacles, symmetry, taken, width, height)
+        if is_connected(placed, width, height):
+            break
+    else:
+        raise RuntimeError(f"no connected layout with {obstacles} obstacles after {max_attempts} attempts")
+    cold = _scatter(rng, ice, symmetry, taken, width, height)
+    return Level(seed, tuple(placed), tuple(cold))
+
+
+# -- packs -----------------------------------------------------------------
+def _bitset(cells, width, size):
+    bits = 0
+    for x, y in cells:
+        bits |= 1 << (y * width + x)
+    return bits.to_bytes(size, 'little')
+
+
+def _cells(data, width):
+    bits = int.from_bytes(data, 'little')
+    cells = []
+    while bits:
+        low = bits & -bits
+        index = low.bit_length() - 1
+        cells.append((index % width, index // width))
+        bits ^= low
+    return tuple(cells)
+
+
+class LevelPack:
+    """Levels read from a pack file; records are decoded when accessed."""
+
+    def __init__(self, data):
+        magic, version, width, height, count = _HEADER.unpack_from(data)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError("not a level pack")
+        self.width = width
+        self.height = height
+        self.bitset_size = (width * height + 7) // 8
+        self.record_size = _SEED.size + 2 * self.bitset_size
+        if len(data) != _HEADER.size + count * self.record_size:
+            raise ValueError("truncated level pack")
+        self.data = data
+        self.count = count
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        offset = _HEADER.size + i * self.record_size
+        seed, = _SEED.unpack_from(self.data, offset)
+        offset += _SEED.size
+        obstacles = _cells(self.data[offset:offset + self.bitset_size], self.width)
+        offset += self.bitset_size
+        ice = _cells(self.data[offset:offset + self.bitset_size], self.width)
+        return Level(seed, obstacles, ice)
+
+
+def save_pack(path, levels, width=GRID_WIDTH, height=GRID_HEIGHT):
+    size = (width * height + 7) // 8
+    parts = [_HEADER.pack(PACK_MAGIC, PACK_VERSION, width, height, len(levels))]
+    for level in levels:
+        parts.append(_SEED.pack(level.seed))
+        parts.append(_bitset(level.obstacles, width, size))
+        parts.append(_bitset(level.ice, width, size))
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b''.join(parts))
+
+
+def build_levels(count, seed=0, workers=None, **params):
+    """Generate `count` levels with seeds ``seed .. seed + count - 1``."""
+    seeds = range(seed, seed + count)
+    if workers == 1:
+        return [generate_level(s, **params) for s in seeds]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(partial(generate_level, **params), seeds, chunksize=32))
+
+
+def pack_path(difficulty, directory=LEVEL_DIR):
+    return os.path.join(directory, f"{difficulty.lower()}.pack")
+
+
+class LevelLibrary:
+    """Per-difficulty packs, loaded on first use; falls back to generating."""
+
+    def __init__(self, directory=LEVEL_DIR, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.directory = directory
+        self.width = width
+        self.height = height
+        self.packs = {}
+
+    def pack(self, difficulty):
+        if difficulty not in self.packs:
+            pack = None
+            try:
+                pack = LevelPack.load(pack_path(difficulty, self.directory))
+                if (pack.width, pack.height) != (self.width, self.height) or not len(pack):
+                    pack = None
+            except (OSError, ValueError, struct.error):
+                pack = None
+            self.packs[difficulty] = pack
+        return self.packs[difficulty]
+
+    def level(self, difficulty, rng=random):
+        pack = self.pack(difficulty)
+        if pack is not None:
+            return pack[rng.randrange(len(pack))]
+        return generate_level(rng.getrandbits(32), width=self.width, height=self.height,
+                              **LEVEL_PRESETS[difficulty])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snake level packs")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="generate level packs in parallel")
+    build.add_argument('--difficulty', choices=list(LEVEL_PRESETS), action='append',
+                       help="repeat for several; default: all")
+    build.add_argument('--count', type=int, default=500)
+    build.add_argument('--seed', type=int, default=0)
+    build.add_argument('--workers', type=int, default=None)
+    build.add_argument('--symmetry', choices=SYMMETRIES, default=None, help="override the preset")
+    build.add_argument('--density', type=float, default=None, help="obstacle fraction, overrides the preset")
+    build.add_argument('--out', default=LEVEL_DIR)
+    info = sub.add_parser('info', help="describe a pack")
+    info.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        pack = LevelPack.load(args.path)
+        print(f"{args.path}: {len(pack)} levels, {pack.width}x{pack.height}")
+        return
+
+    for difficulty in args.difficulty or list(LEVEL_PRESETS):
+        params = dict(LEVEL_PRESETS[difficulty])
+        if args.symmetry:
+            params['symmetry'] = args.symmetry
+        if args.density is not None:
+            params['density'] = args.density
+        levels = build_levels(args.count, args.seed, args.workers, **params)
+        path = pack_path(difficulty, args.out)
+        save_pack(path, levels)
+        print(f"{path}: {len(levels)} levels, {os.path.getsize(path)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Lookahead AI: open-loop Monte Carlo tree search over SimState.
+
+Every iteration clones the root position with a fresh random stream and
+replays the action sequence of a tree path, so food spawns, special-food
+expiry and Winter slips are sampled rather than assumed; a node's value is
+the average over those samples.  Leaves are scored with a short greedy
+rollout.  The subtree of the chosen move is kept for the next tick when the
+snake ended up where the search expected.
+
+With ``workers > 1`` the same search also runs in worker processes from the
+same root and the root statistics are added up before choosing.  There are
+never more searches than CPUs: a worker without a core of its own only
+slows the game and the main search down.
+
+The search takes the time the runner allows for the move (its `deadline`)
+minus a safety margin for handing the move back, capped by `budget`.
+"""
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from snake_constants import DIRECTIONS
+from snake_sim import EMPTY, CRASHES, ATE_FOOD, ATE_SPECIAL
+from snake_ai import Controller
+
+REWARDS = {ATE_FOOD: 1.0, ATE_SPECIAL: 2.0}
+DEATH = -5.0
+DISCOUNT = 0.95
+DEADLINE_SHARE = 0.7  # of the time left before the runner's deadline
+DEADLINE_MARGIN = 0.001  # seconds kept back on top of that
+
+
+class Node:
+    __slots__ = ('children', 'visits', 'total')
+
+    def __init__(self):
+        self.children = {}  # direction -> Node
+        self.visits = 0
+        self.total = 0.0
+
+
+def _moves(state, i):
+    """Directions snake `i` may take: everything but a reversal."""
+    dx, dy = state.snakes[i].direction
+    return [d for d in DIRECTIONS if d[0] != -dx or d[1] != -dy]
+
+
+def _safe_moves(state, i):
+    """Moves that do not crash on the next tick, or all moves if every one does.
+
+    Expanding certain deaths would pull down the average of every node
+    next to a wall, and the search would learn to stay away from walls -
+    and from food next to them.
+    """
+    snake = state.snakes[i]
+    moves = _moves(state, i)
+    return [d for d in moves if _free(state, snake, d)] or moves
+
+
+def _free(state, snake, direction):
+    x, y = snake.body[0]
+    return state.grid[(y + direction[1]) * state.width + x + direction[0]] == EMPTY
+
+
+def _greedy(state, i, rng):
+    """Rollout policy: a free move towards the food, sometimes a random free one."""
+    snake = state.snakes[i]
+    free = [d for d in _moves(state, i) if _free(state, snake, d)]
+    if not free:
+        return snake.direction
+    if rng.random() < 0.2:
+        return rng.choice(free)
+    (hx, hy), (fx, fy) = snake.body[0], state.food
+    return min(free, key=lambda d: abs(hx + d[0] - fx) + abs(hy + d[1] - fy))
+
+
+def _step(state, action, rng):
+    """Advance with our action, the other snakes follow the rollout policy."""
+    actions = [action] + [_greedy(state, i, rng) for i in range(1, len(state.snakes))]
+    outcome = state.step(actions)[0]
+    if outcome in CRASHES:
+        return DEATH
+    if state.done:  # another snake crashed
+        return 0.0
+    return REWARDS.get(outcome, 0.0)
+
+
+def search(root_state, budget, root=None, seed=None, exploration=1.0, max_depth=30,
+           rollout_depth=20, iterations=None):
+    """Run MCTS from `root_state` for `budget` seconds; returns the root Node."""
+    rng = random.Random(seed)
+    root = root or Node()
+    deadline = time.perf_counter() + budget
+    count = 0
+    while True:
+        if iterations is not None:
+            if count >= iterations:
+                break
+        elif count & 7 == 0 and time.perf_counter() > deadline:
+            break
+        count += 1
+
+        state = root_state.copy(random.Random(rng.getrandbits(32)))
+        node = root
+        path = [root]
+        value = 0.0
+        scale = 1.0
+        depth = 0
+        while not state.done and depth < max_depth:
+            moves = _safe_moves(state, 0)
+            untried = [d for d in moves if d not in node.children]
+            if untried:
+                move = rng.choice(untried)
+                child = node.children[move] = Node()
+            else:
+                log_n = math.log(node.visits + 1)
+                move = max(moves, key=lambda d: _ucb(node.children[d], log_n, exploration))
+                child = node.children[move]
+            value += scale * _step(state, move, rng)
+            scale *= DISCOUNT
+            depth += 1
+            node = child
+            path.append(node)
+            if untried:
+                break
+
+        # Rollout from the new leaf
+        for _ in range(rollout_depth):
+            if state.done:
+                break
+            value += scale * _step(state, _greedy(state, 0, rng), rng)
+            scale *= DISCOUNT
+
+        for node in path:
+            node.visits += 1
+            node.total += value
+    return root
+
+
+def _ucb(node, log_n, exploration):
+    if not node.visits:
+        return math.inf
+    return node.total / node.visits + exploration * math.sqrt(log_n / node.visits)
+
+
+def _root_stats(state, budget, seed, kwargs):
+    """Worker entry point: independent search, root child statistics only."""
+    root = search(state, budget, seed=seed, **kwargs)
+    return {move: (child.visits, child.total) for move, child in root.children.items()}
+
+
+class MCTSController(Controller):
+    """Time-budgeted open-loop MCTS with subtree reuse between ticks."""
+
+    name = 'mcts'
+
+    def __init__(self, budget=0.03, workers=1, seed=None, **search_kwargs):
+        self.budget = budget
+        self.workers = workers = max(1, min(workers, os.cpu_count() or 1))
+        self.search_kwargs = search_kwargs
+        self.rng = random.Random(seed)
+        self.pool = ProcessPoolExecutor(workers - 1) if workers > 1 else None
+        self.tree = None
+        self.expected = ()  # heads at which self.tree is still valid
+        self.iterations = 0
+
+    def reset(self):
+        self.tree = None
+        self.expected = ()
+
+    def choose(self, view):
+        safe = view.safe_directions()
+        if len(safe) <= 1:
+            self.reset()
+            return safe[0] if safe else view.direction
+
+        state = view.to_sim()
+        state.rng = random.Random(self.rng.getrandbits(32))
+        budget = min(self.budget, 0.8 / view.speed)
+        if self.deadline is not None:
+            left = self.deadline - time.perf_counter()
+            budget = max(0.0, min(budget, left * DEADLINE_SHARE - DEADLINE_MARGIN))
+        end = time.perf_counter() + budget
+        root = self.tree if view.head in self.expected else None
+
+        futures = []
+        if self.pool is not None:
+            futures = [self.pool.submit(_root_stats, state, budget, self.rng.getrandbits(32),
+                                        self.search_kwargs)
+                       for _ in range(self.workers - 1)]
+        visits_before = root.visits if root else 0
+        # Handing the work to the pool took part of the budget
+        root = search(state, max(0.0, end - time.perf_counter()), root, self.rng.getrandbits(32),
+                      **self.search_kwargs)
+        self.iterations += root.visits - visits_before
+
+        stats = {move: [child.visits, child.total] for move, child in root.children.items()}
+        # Workers that missed the budget (e.g. while starting up) do not count
+        done, late = wait(futures, max(0.0, end - time.perf_counter()) + DEADLINE_MARGIN)
+        for future in late:
+            future.cancel()
+        for future in done:
+            for move, (visits, total) in future.result().items():
+                entry = stats.setdefault(move, [0, 0.0])
+                entry[0] += visits
+                entry[1] += total
+                self.iterations += visits
+
+        candidates = [d for d in safe if d in stats] or safe
+        move = max(candidates, key=lambda d: (stats[d][0], stats[d][1]) if d in stats else (0, 0))
+
+        # Keep the chosen subtree if the next position is the one we searched
+        head = view.head
+        self.tree = root.children.get(move)
+        self.expected = {view.neighbour(head, move), view.neighbour(head, view.direction)}
+        return move
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
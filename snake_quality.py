@@ -0,0 +1,59 @@
+"""Frame-budget governor that trades visual detail for frame time.
+
+The governor watches how long recent frames took to produce and steps
+through QUALITY_TIERS: down as soon as the average goes over budget, back up
+only after a stretch of comfortably fast frames, so it does not oscillate.
+It only changes what is drawn; the simulation runs on its own clock.
+"""
+from collections import deque
+
+QUALITY_TIERS = [
+    {'name': 'high', 'max_particles': 300, 'ice_lines': 3, 'flashlight_step': 10, 'segment_outlines': True},
+    {'name': 'medium', 'max_particles': 100, 'ice_lines': 1, 'flashlight_step': 20, 'segment_outlines': True},
+    {'name': 'low', 'max_particles': 40, 'ice_lines': 0, 'flashlight_step': 50, 'segment_outlines': False},
+    {'name': 'minimal', 'max_particles': 0, 'ice_lines': 0, 'flashlight_step': 100, 'segment_outlines': False},
+]
+TIER_NAMES = [tier['name'] for tier in QUALITY_TIERS]
+
+
+class QualityGovernor:
+    def __init__(self, budget=1 / 60, window=30, upgrade_after=120, headroom=0.6, tier=0, fixed=False):
+        self.budget = budget
+        self.window = window
+        self.upgrade_after = upgrade_after  # fast frames needed before stepping up
+        self.headroom = headroom  # "fast" means under this fraction of the budget
+        self.tier = tier
+        self.fixed = fixed
+        self.frames = deque(maxlen=window)
+        self.total = 0.0
+        self.fast_streak = 0
+
+    @property
+    def settings(self):
+        return QUALITY_TIERS[self.tier]
+
+    def record(self, seconds):
+        """Feed one frame's work time; returns True when the tier changed."""
+        if self.fixed:
+            return False
+        if len(self.frames) == self.window:
+            self.total -= self.frames[0]
+        self.frames.append(seconds)
+        self.total += seconds
+        self.fast_streak = self.fast_streak + 1 if seconds < self.budget * self.headroom else 0
+
+        if len(self.frames) < self.window:
+            return False
+        if self.total / self.window > self.budget and self.tier < len(QUALITY_TIERS) - 1:
+            self._set_tier(self.tier + 1)
+            return True
+        if self.fast_streak >= self.upgrade_after and self.tier > 0:
+            self._set_tier(self.tier - 1)
+            return True
+        return False
+
+    def _set_tier(self, tier):
+        self.tier = tier
+        self.frames.clear()
+        self.total = 0.0
+        self.fast_streak = 0
@@ -0,0 +1,100 @@
+"""Drawing through SDL2's Renderer and Texture API (pygame._sdl2.video).
+
+The surface backend redraws every frame with `pygame.draw` on the display
+surface and flips it.  With `TextureRenderer` the parts that do not change
+are uploaded once as textures - the board with its obstacles and ice, one
+sprite per cell type and colour, the flashlight mask, rendered text - and a
+frame is a batch of texture copies, blended with alpha where needed.
+Screens that are drawn rarely (menus, pause, game over) are still drawn on a
+software surface and shown through one streaming texture.
+
+`open_renderer` picks the backend at startup:
+
+* ``surface``          the plain pygame display surface (returns None),
+* ``texture``          any SDL renderer, preferring the GPU,
+* ``texture-software`` SDL's software renderer, for machines without a GPU,
+* ``auto``             a GPU renderer if there is one, else ``surface`` without
+                       a warning.
+"""
+import sys
+
+import pygame
+
+BACKENDS = ["auto", "surface", "texture", "texture-software"]
+ACCELERATION = {"auto": 1, "texture": -1, "texture-software": 0}  # Renderer(accelerated=...)
+MAX_TEXTS = 256
+
+
+def open_renderer(backend, size, title):
+    """A TextureRenderer for `backend`, or None for the surface backend."""
+    if backend == "surface":
+        return None
+    try:
+        return TextureRenderer(size, title, ACCELERATION[backend])
+    except (ImportError, RuntimeError) as e:  # pygame.error and pygame._sdl2's error
+        if backend != "auto":  # auto falls back quietly, most machines have no GPU renderer
+            print(f"Texture renderer unavailable ({e}), drawing on a surface", file=sys.stderr)
+        return None
+
+
+class TextureRenderer:
+    def __init__(self, size, title, accelerated=-1):
+        from pygame._sdl2 import video
+        self.video = video
+        self.size = size
+        self.window = video.Window(title, size=size)
+        try:
+            self.renderer = video.Renderer(self.window, accelerated=accelerated)
+        except RuntimeError:
+            self.window.destroy()
+            raise
+        self.textures = {}  # key -> Texture, uploaded once
+        self.texts = {}
+        self.frame = None  # streaming texture for software-drawn screens
+
+    def texture(self, key, build, opaque=False):
+        """Texture for `key`, uploading the surface returned by `build()` on first use.
+
+        Opaque textures are copied without blending, which matters a lot for
+        large ones on the software renderer.
+        """
+        texture = self.textures.get(key)
+        if texture is None:
+            texture = self.upload(build(), opaque)
+            self.textures[key] = texture
+        return texture
+
+    def upload(self, surface, opaque=False):
+        texture = self.video.Texture.from_surface(self.renderer, surface)
+        texture.blend_mode = pygame.BLENDMODE_NONE if opaque else pygame.BLENDMODE_BLEND
+        return texture
+
+    def forget(self, prefix):
+        """Drop cached textures whose key starts with `prefix`, e.g. an old board."""
+        for key in [key for key in self.textures if key[0] == prefix]:
+            del self.textures[key]
+
+    def text(self, font, text, color):
+        key = (id(font), text, color)
+        texture = self.texts.get(key)
+        if texture is None:
+            if len(self.texts) > MAX_TEXTS:
+                self.texts.clear()
+            texture = self.texts[key] = self.upload(font.render(text, True, color))
+        return texture
+
+    def clear(self, color):
+        self.renderer.draw_color = color
+        self.renderer.clear()
+
+    def present(self):
+        self.renderer.present()
+
+    def present_surface(self, surface):
+        """Show a frame drawn in software."""
+        if self.frame is None:
+            self.frame = self.video.Texture(self.renderer, surface.get_size(), streaming=True)
+            self.frame.blend_mode = pygame.BLENDMODE_NONE
+        self.frame.update(surface)
+        self.frame.draw()
+        self.renderer.present()
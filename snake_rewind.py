@@ -0,0 +1,88 @@
+"""Rewind for practice mode.
+
+`RewindBuffer` keeps one snapshot per tick in a fixed-size ring.  A snapshot
+does not copy the snakes: it stores the head each snake gained and the tail
+it lost on that tick, plus the handful of scalar fields, so capturing is
+O(1) and memory stays bounded however long the snakes get.  Rewinding
+undoes the body deltas newest-first and restores the scalars of the target
+tick.
+"""
+from collections import deque, namedtuple
+
+from snake_constants import MAX_SPEED
+
+Snapshot = namedtuple('Snapshot', [
+    'heads', 'tails',  # per snake: head added and tail removed (or None) on this tick
+    'food', 'special_food', 'special_food_expires', 'ticks',
+    'score', 'score2', 'direction', 'direction2',
+    'speed', 'base_speed', 'slipping', 'slipping2',
+])
+
+
+class RewindBuffer:
+    def __init__(self, seconds=5, tick_rate=MAX_SPEED):
+        self.snapshots = deque(maxlen=int(seconds * tick_rate) + 1)
+        self._lengths = (0, 0)
+        self._tails = (None, None)
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def clear(self):
+        self.snapshots.clear()
+
+    def _bodies(self, game):
+        return (game.snake, game.snake2 or [])
+
+    def capture(self, game):
+        """Record the state of `game` after a tick (or right after a reset)."""
+        bodies = self._bodies(game)
+        first = not self.snapshots
+        heads = tuple(body[0] if body and not first else None for body in bodies)
+        tails = tuple(
+            None if first or not body or len(body) != length else tail
+            for body, length, tail in zip(bodies, self._lengths, self._tails))
+        self.snapshots.append(Snapshot(
+            heads, tails, game.food, game.special_food, game.special_food_expires, game.ticks,
+            game.score, game.score2, game.direction, getattr(game, 'direction2', None),
+            game.speed, game.base_speed, game.slipping, game.slipping2))
+        self._lengths = tuple(len(body) for body in bodies)
+        self._tails = tuple(body[-1] if body else None for body in bodies)
+
+    def rewind(self, game, seconds):
+        """Undo up to `seconds` of play; returns the number of ticks undone."""
+        undone = 0
+        elapsed = 0.0
+        bodies = self._bodies(game)
+        undone_snapshots = []
+        while len(self.snapshots) > 1 and elapsed < seconds:
+            snapshot = self.snapshots.pop()
+            elapsed += 1.0 / snapshot.speed
+            undone_snapshots.append(snapshot)
+            undone += 1
+        # Undoing a tick drops the head and gives back the tail: as a queue,
+        # all the tails go on the end and all the heads come off the front
+        for i, body in enumerate(bodies):
+            body.extend([s.tails[i] for s in undone_snapshots if s.tails[i] is not None])
+            del body[:sum(1 for s in undone_snapshots if s.heads[i] is not None)]
+        if undone:
+            self._restore(game, self.snapshots[-1])
+        return undone
+
+    def _restore(self, game, snapshot):
+        game.food = snapshot.food
+        game.special_food = snapshot.special_food
+        game.special_food_expires = snapshot.special_food_expires
+        game.ticks = snapshot.ticks
+        game.score = snapshot.score
+        game.score2 = snapshot.score2
+        game.direction = game.next_direction = snapshot.direction
+        if snapshot.direction2 is not None:
+            game.direction2 = game.next_direction2 = snapshot.direction2
+        game.speed = snapshot.speed
+        game.base_speed = snapshot.base_speed
+        game.slipping = snapshot.slipping
+        game.slipping2 = snapshot.slipping2
+        bodies = self._bodies(game)
+        self._lengths = tuple(len(body) for body in bodies)
+        self._tails = tuple(body[-1] if body else None for body in bodies)
@@ -0,0 +1,21 @@
+"""Game modes described as data.
+
+A `Ruleset` lists the features of a mode - how many snakes, ice, darkness,
+whether the second snake is an AI.  `SnakeGame.apply_ruleset` turns it into
+a tick function and a list of render layers when a game starts, so nothing
+in the per-tick or per-frame path asks which mode is active.  A new mode is
+a new entry here, e.g. ``Ruleset("Winter Duel", 2, True, False, False)``.
+"""
+from collections import namedtuple
+
+from snake_constants import NORMAL, DEAD_OF_NIGHT, WINTER, MULTIPLAYER, AI_MODE
+
+Ruleset = namedtuple('Ruleset', 'name snakes ice darkness ai')
+
+RULESETS = {
+    NORMAL: Ruleset("Normal", 1, False, False, False),
+    DEAD_OF_NIGHT: Ruleset("Dead of Night", 1, False, True, False),
+    WINTER: Ruleset("Winter", 1, True, False, False),
+    MULTIPLAYER: Ruleset("Multiplayer", 2, False, False, False),
+    AI_MODE: Ruleset("AI", 2, False, False, True),
+}
@@ -0,0 +1,441 @@
+"""Board state in shared memory for controllers running in other processes.
+
+`SharedBoard` lays the position out as fixed-size NumPy arrays inside one
+`multiprocessing.shared_memory` segment:
+
+* ``header``   int64 scalars (sequence number, food, speed, per-snake ring
+  start, length and direction, ...),
+* ``bodies``   int16 ``(snakes, 2 * width * height, 2)`` rings, head at the
+  ring start, so a normal move writes one cell instead of the whole body.
+  Every cell is also written one capacity further on, so a body is always
+  one contiguous slice of its ring,
+* ``layout``   uint8 ``(height, width)`` with obstacles (1) and ice (2),
+  rewritten only when the layout changes,
+* ``occupied`` uint8 ``width * height`` count of body cells on each cell,
+  updated for the new head and the dropped tail only,
+* ``decision`` int64 ``[answered sequence, direction index, ready]``.
+
+The writer makes the sequence number odd while it updates and even again
+when done; a reader that sees an odd number, or a different number after
+reading, simply reads again (a seqlock), so neither side ever waits on a
+lock.  The decision slot has a single writer, the worker, which stores the
+direction before the sequence number it answers.
+
+Reading copies nothing but the header: `SharedBoardView` hands controllers
+NumPy slices of the rings and looks cells up in the shared occupancy grid.
+A normal move only writes ring slots outside the current bodies, and once
+the next position is published the runner no longer waits for an answer
+to this one, so a view stays good for as long as a controller needs it.
+
+`ProcessControllerRunner` is a drop-in for `snake_ai.ControllerRunner` that
+runs the controller in a worker process on top of this.
+
+    python snake_shm.py   # measure publish and read cost
+"""
+import atexit
+import multiprocessing
+import sys
+import time
+from collections.abc import Sequence
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from snake_constants import GRID_WIDTH, GRID_HEIGHT, DIRECTIONS, NORMAL
+from snake_ai import BoardView, make_controller
+from snake_fields import field_for_layout
+
+MAX_SNAKES = 2
+POLL_INTERVAL = 0.0002  # seconds between checks while waiting
+STARTUP_TIMEOUT = 10.0  # seconds to wait for the worker to load its controller
+
+# Header slots
+(SEQ, EPOCH, TICK, COUNT, INDEX, FOOD_X, FOOD_Y, SPECIAL_X, SPECIAL_Y, SPECIAL_TICKS,
+ SPEED, MODE, LAYOUT, BUDGET) = range(14)
+SNAKES = 14  # per snake i: ring start, length, dx, dy at SNAKES + 4 * i
+HEADER_SIZE = SNAKES + 4 * MAX_SNAKES
+ANSWERED, DECISION, READY = 0, 1, 2
+
+
+class RingBody(Sequence):
+    """A snake's cells, head first, read in place from its ring."""
+
+    __slots__ = ('cells',)
+
+    def __init__(self, cells):
+        self.cells = cells  # (length, 2) slice of the ring
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(map(tuple, self.cells[i].tolist()))
+        x, y = self.cells[i].tolist()
+        return (x, y)
+
+    def __iter__(self):
+        return map(tuple, self.cells.tolist())
+
+
+class Occupancy:
+    """``cell in occupied`` for the published bodies, from the shared grid."""
+
+    __slots__ = ('counts', 'width')
+
+    def __init__(self, counts, width):
+        self.counts = counts  # memoryview, one byte per cell
+        self.width = width
+
+    def __contains__(self, cell):
+        return self.counts[cell[1] * self.width + cell[0]] > 0
+
+    def isdisjoint(self, cells):
+        return not any(cell in self for cell in cells)
+
+
+class SharedBoardView(BoardView):
+    """BoardView whose bodies and occupied cells stay in shared memory."""
+
+    __slots__ = ()
+
+    def __init__(self, index, bodies, directions, occupied, obstacles, ice, field, food,
+                 special_food, special_ticks, mode, speed, width, height):
+        self.index = index
+        self.bodies = bodies  # RingBody per snake
+        self.directions = directions
+        self.occupied = occupied
+        self.obstacles = obstacles
+        self.ice = ice
+        self.field = field
+        self.food = food
+        self.special_food = special_food
+        self.special_ticks = special_ticks
+        self.mode = mode
+        self.speed = speed
+        self.width = width
+        self.height = height
+
+
+class SharedBoard:
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, name=None, create=True):
+        self.width = width
+        self.height = height
+        self.capacity = width * height
+        sizes = [8 * HEADER_SIZE, 8 * 3, 2 * MAX_SNAKES * 2 * self.capacity * 2,
+                 width * height, self.capacity]
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=sum(sizes))
+        self.name = self.shm.name
+        buf = self.shm.buf
+        offset = 0
+        self.header = np.ndarray((HEADER_SIZE,), np.int64, buf, offset)
+        offset += sizes[0]
+        self.decision = np.ndarray((3,), np.int64, buf, offset)
+        offset += sizes[1]
+        self.bodies = np.ndarray((MAX_SNAKES, 2 * self.capacity, 2), np.int16, buf, offset)
+        offset += sizes[2]
+        self.layout = np.ndarray((height, width), np.uint8, buf, offset)
+        offset += sizes[3]
+        self.counts = buf[offset:offset + self.capacity]  # bytes index faster than NumPy
+        self.occupied = Occupancy(self.counts, width)
+        if create:
+            self.header[:] = 0
+            self.decision[:] = 0
+            self.counts[:] = bytes(self.capacity)
+        self._written = [None] * MAX_SNAKES  # (head, tail) last written per snake
+        self._layout_key = None
+        self._layout_seen = -1
+        self._obstacles = self._ice = frozenset()
+        self._field = None
+
+    # -- writer ------------------------------------------------------------
+    def publish(self, index, bodies, directions, food, special_food=None, special_ticks=None,
+                speed=12, mode=NORMAL, obstacles=(), ice=(), tick=0, budget=None):
+        """Write a position and the seconds allowed for the move; returns its sequence number."""
+        h = self.header
+        seq = int(h[SEQ]) + 1
+        h[SEQ] = seq  # odd: update in progress
+        snakes = []
+        for i, body in enumerate(bodies):
+            snakes += self._write_body(i, body, directions[i])
+        for i in range(len(bodies), MAX_SNAKES):
+            if h[SNAKES + 4 * i + 1]:
+                self._count(i, -1)
+                self._written[i] = None
+                snakes += (0, 0, 0, 0)
+        h[SNAKES:SNAKES + len(snakes)] = snakes
+        special_x, special_y = special_food or (-1, -1)
+        h[TICK:LAYOUT] = (tick, len(bodies), index, food[0], food[1], special_x, special_y,
+                          -1 if special_ticks is None else special_ticks, speed, mode)
+        h[BUDGET] = -1 if budget is None else int(budget * 1e6)
+        key = (id(obstacles), len(obstacles), id(ice), len(ice))
+        if key != self._layout_key:
+            self._layout_key = key
+            self.layout[:] = 0
+            for x, y in obstacles:
+                self.layout[y, x] = 1
+            for x, y in ice:
+                self.layout[y, x] = 2
+            h[LAYOUT] += 1
+        h[SEQ] = seq + 1  # even: consistent
+        return seq + 1
+
+    def _write_body(self, i, body, direction):
+        """Update snake i's ring; returns its header fields."""
+        h, ring, cap, counts = self.header, self.bodies[i], self.capacity, self.counts
+        slot = SNAKES + 4 * i
+        start, length = int(h[slot]), int(h[slot + 1])
+        written = self._written[i]
+        n = len(body)
+        head, tail = tuple(body[0]), tuple(body[-1])
+        if (written is not None and n >= 2 and tuple(body[1]) == written[0] and
+                length <= n <= length + 1 and
+                ring[start + n - 2].tolist() == list(tail)):
+            # One move: prepend the head, the tail follows from the length
+            if n == length:
+                x, y = ring[start + length - 1].tolist()
+                counts[y * self.width + x] -= 1
+            start = (start - 1) % cap
+            ring[start] = ring[start + cap] = head
+            counts[head[1] * self.width + head[0]] += 1
+        else:
+            self._count(i, -1)
+            start = 0
+            ring[:n] = ring[cap:cap + n] = body
+            h[slot:slot + 2] = start, n
+            self._count(i, 1)
+        self._written[i] = (head, tail)
+        return start, n, direction[0], direction[1]
+
+    def _count(self, i, step):
+        """Add `step` to the occupancy of every cell of snake i as in the header."""
+        slot = SNAKES + 4 * i
+        start, length = int(self.header[slot]), int(self.header[slot + 1])
+        if not length:
+            return
+        cells = self.bodies[i, start:start + length].astype(np.intp)
+        counts = np.ndarray((self.capacity,), np.uint8, self.counts)
+        np.add.at(counts, cells[:, 1] * self.width + cells[:, 0], np.uint8(step % 256))
+
+    def new_game(self):
+        """Tell readers to reset their controller."""
+        self.header[EPOCH] += 1
+        self._written = [None] * MAX_SNAKES
+        self._layout_key = None
+
+    # -- reader ------------------------------------------------------------
+    def read(self):
+        """Consistent ``(seq, SharedBoardView)`` of the last published position."""
+        h = self.header
+        while True:
+            seq = int(h[SEQ])
+            if seq & 1 or seq == 0:
+                time.sleep(0)
+                continue
+            values = h.tolist()
+            if int(h[SEQ]) != seq:
+                continue  # written meanwhile: read again
+            break
+        bodies, directions = [], []
+        for i in range(values[COUNT]):
+            start, length, dx, dy = values[SNAKES + 4 * i:SNAKES + 4 * i + 4]
+            bodies.append(RingBody(self.bodies[i, start:start + length]))
+            directions.append((dx, dy))
+        if values[LAYOUT] != self._layout_seen:
+            # The layout only changes between games, when nobody waits for a move
+            ys, xs = np.nonzero(self.layout == 1)
+            self._obstacles = frozenset(zip(xs.tolist(), ys.tolist()))
+            ys, xs = np.nonzero(self.layout == 2)
+            self._ice = frozenset(zip(xs.tolist(), ys.tolist()))
+            self._field = field_for_layout(self._obstacles, self._ice, self.width, self.height)
+            self._layout_seen = values[LAYOUT]
+        special = (values[SPECIAL_X], values[SPECIAL_Y]) if values[SPECIAL_X] >= 0 else None
+        special_ticks = values[SPECIAL_TICKS] if values[SPECIAL_TICKS] >= 0 else None
+        return seq, SharedBoardView(values[INDEX], tuple(bodies), tuple(directions), self.occupied,
+                                    self._obstacles, self._ice, self._field,
+                                    (values[FOOD_X], values[FOOD_Y]), special, special_ticks,
+                                    values[MODE], values[SPEED], self.width, self.height)
+
+    def current(self, seq):
+        """Whether `seq` is still the last published position."""
+        return self.header[SEQ] == seq
+
+    def answer(self, seq, direction):
+        self.decision[DECISION] = DIRECTIONS.index(direction)
+        self.decision[ANSWERED] = seq
+
+    def answer_for(self, seq):
+        """The worker's direction for `seq`, or None if it has not answered yet."""
+        if self.decision[ANSWERED] != seq:
+            return None
+        return DIRECTIONS[int(self.decision[DECISION])]
+
+    def close(self, unlink=False):
+        self.header = self.decision = self.bodies = self.layout = None
+        self.counts.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _worker(name, width, height, spec, stop):
+    board = SharedBoard(width, height, name, create=False)
+    controller = make_controller(spec)
+    board.decision[READY] = 1
+    answered = 0
+    epoch = 0
+    last = None
+    try:
+        while not stop.is_set():
+            seq = int(board.header[SEQ])
+            if seq == answered or seq & 1 or seq == 0:
+                time.sleep(POLL_INTERVAL)
+                continue
+            if board.header[EPOCH] != epoch:
+                epoch = int(board.header[EPOCH])
+                controller.reset()
+            seen = time.perf_counter()
+            seq, view = board.read()
+            budget = int(board.header[BUDGET])
+            # Counted from when the position was noticed, at most a poll interval late
+            controller.deadline = None if budget < 0 else seen + budget / 1e6 - POLL_INTERVAL
+            try:
+                direction = controller.choose(view)
+            except Exception as e:
+                if board.current(seq):
+                    print(f"Controller {controller.name} failed: {e}", file=sys.stderr)
+                    safe = view.safe_directions()
+                    direction = last if last in safe else (safe[0] if safe else view.direction)
+                # else the board moved on under the controller and nobody waits for this
+            view = None  # holds slices of the segment, which close() needs free
+            if board.current(seq):
+                board.answer(seq, direction)
+                last = direction
+            answered = seq
+    finally:
+        controller.close()
+        board.close()
+
+
+class ProcessControllerRunner:
+    """Like snake_ai.ControllerRunner, but the controller runs in its own process."""
+
+    def __init__(self, spec, budget=0.05, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.spec = spec
+        self.budget = budget
+        self.moves = 0
+        self.overruns = 0
+        self.worst = 0.0
+        self.latency = None
+        self.board = SharedBoard(width, height)
+        context = multiprocessing.get_context('spawn')  # no inherited pygame state
+        self._stop = context.Event()
+        self._process = context.Process(target=_worker, name=f"ai-{spec}", daemon=True,
+                                        args=(self.board.name, width, height, spec, self._stop))
+        self._process.start()
+        # Without this the first moves of a game fall back while the worker imports
+        limit = time.perf_counter() + STARTUP_TIMEOUT
+        while (not self.board.decision[READY] and self._process.is_alive() and
+               time.perf_counter() < limit):
+            time.sleep(0.01)
+        self._reported = False  # the worker's exit was reported
+        self._seq = None
+        self._game = None
+        self._deadline = 0
+        self._last_move = None
+        atexit.register(self.close)
+
+    def reset(self):
+        self._seq = None
+        self._last_move = None
+        self.board.new_game()
+
+    def submit_game(self, game, index, budget=None):
+        bodies = [game.snake]
+        directions = [game.direction]
+        if game.snake2:
+            bodies.append(game.snake2)
+            directions.append(game.direction2)
+        special_ticks = max(0, game.special_food_expires - game.ticks) if game.special_food else None
+        budget = self.budget if budget is None else budget
+        self._seq = self.board.publish(index, bodies, directions, game.food, game.special_food,
+                                       special_ticks, game.speed, game.game_mode,
+                                       game.obstacles, game.ice_blocks, game.ticks, budget)
+        self._game, self._index = game, index
+        self._submitted = time.perf_counter()
+        self._deadline = self._submitted + budget
+
+    def collect(self):
+        """Decision for the last submitted position, or the fallback move."""
+        if self._seq is None:
+            return None
+        seq, self._seq = self._seq, None
+        direction = self.board.answer_for(seq)
+        while direction is None and time.perf_counter() < self._deadline:
+            if not self._process.is_alive():
+                if not self._reported:
+                    self._reported = True
+                    print(f"AI worker for {self.spec} exited (code {self._process.exitcode}), "
+                          "using fallback moves", file=sys.stderr)
+                break
+            time.sleep(POLL_INTERVAL)
+            direction = self.board.answer_for(seq)
+        self.moves += 1
+        if direction is None:
+            self.overruns += 1
+            self.latency = None
+            view = BoardView.from_game(self._game, self._index)
+            safe = view.safe_directions()
+            direction = self._last_move if self._last_move in safe else (safe[0] if safe else view.direction)
+        else:
+            self.latency = time.perf_counter() - self._submitted
+            self.worst = max(self.worst, self.latency)
+        self._last_move = direction
+        return direction
+
+    def close(self):
+        if self.board is None:
+            return
+        self._stop.set()
+        self._process.join(1)
+        if self._process.is_alive():
+            self._process.terminate()
+        self.board.close(unlink=True)
+        self.board = None
+
+
+def benchmark(ticks=20000, length=200):
+    """Microseconds per publish (one move of two snakes, one `length` long),
+    per read, and per read plus the safe moves most controllers start with."""
+    board = SharedBoard()
+    cells = [(x, y) for y in range(GRID_HEIGHT) for x in (range(GRID_WIDTH) if y % 2 else
+                                                           range(GRID_WIDTH - 1, -1, -1))]
+    body = cells[length - 1::-1]
+    other = cells[-20:]
+    obstacles, ice = [], []
+    start = time.perf_counter()
+    for t in range(ticks):
+        # Both snakes walk the board in a serpentine without growing
+        body.insert(0, cells[(length + t) % len(cells)])
+        body.pop()
+        other.insert(0, cells[t % len(cells)])
+        other.pop()
+        board.publish(0, [body, other], [(1, 0), (-1, 0)], (7, 7), None, None, 12, NORMAL,
+                      obstacles, ice, t)
+    publish = (time.perf_counter() - start) / ticks * 1e6
+    start = time.perf_counter()
+    for _ in range(1000):
+        board.read()
+    read = (time.perf_counter() - start) / 1000 * 1e6
+    start = time.perf_counter()
+    for _ in range(1000):
+        board.read()[1].safe_directions()
+    safe = (time.perf_counter() - start) / 1000 * 1e6
+    board.close(unlink=True)
+    return publish, read, safe
+
+
+if __name__ == "__main__":
+    publish, read, safe = benchmark()
+    print(f"publish {publish:.1f} us/tick, read {read:.1f} us/snapshot, "
+          f"read + safe_directions {safe:.1f} us")
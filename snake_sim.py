@@ -0,0 +1,295 @@
+"""Headless, tick-based version of the game rules.
+
+`SnakeGame.update` drives the rules from the wall clock and mixes them with
+sound, particles and drawing.  `SimState` steps the same rules one tick at a
+time with nothing but the standard library, so it can be used for training,
+search and verification.  Time-based rules are expressed in ticks: the
+special food lives for ``SPECIAL_FOOD_LIFETIME * speed`` ticks, which is the
+same ten seconds at the speed it spawned with.
+"""
+import random
+from collections import deque
+
+from snake_constants import (
+    GRID_WIDTH, GRID_HEIGHT,
+    NORMAL,
+    DIFFICULTY_SPEED, ICE_BLOCK_COUNT,
+    MAX_SPEED, MIN_SPEED, FOOD_SCORE, SPECIAL_FOOD_SCORE, SPEEDUP_EVERY,
+    SPECIAL_FOOD_CHANCE, SPECIAL_FOOD_LIFETIME, SLIP_CHANCE,
+)
+from snake_levels import LEVEL_PRESETS, generate_level, spawn_points
+from snake_rules import RULESETS
+
+# Cell codes stored in SimState.grid; snake i is stored as BODY + i
+EMPTY = 0
+WALL = 1
+OBSTACLE = 2
+BODY = 3
+
+# Per-snake outcomes returned by SimState.step
+MOVED = 'moved'
+ATE_FOOD = 'food'
+ATE_SPECIAL = 'special'
+CRASH_WALL = 'wall'
+CRASH_OBSTACLE = 'obstacle'
+CRASH_SELF = 'self'
+CRASH_SNAKE = 'snake'
+CRASHES = (CRASH_WALL, CRASH_OBSTACLE, CRASH_SELF, CRASH_SNAKE)
+
+
+def snake_count(mode):
+    return RULESETS[mode].snakes
+
+
+def walled_grid(width, height):
+    """Empty occupancy grid with the border cells marked as WALL."""
+    grid = bytearray(width * height)
+    for x in range(width):
+        grid[x] = grid[(height - 1) * width + x] = WALL
+    for y in range(height):
+        grid[y * width] = grid[y * width + width - 1] = WALL
+    return grid
+
+
+class SnakeState:
+    __slots__ = ('body', 'direction', 'score', 'slipping')
+
+    def __init__(self, body, direction, score=0, slipping=False):
+        self.body = body
+        self.direction = direction
+        self.score = score
+        self.slipping = slipping
+
+    def copy(self):
+        return SnakeState(deque(self.body), self.direction, self.score, self.slipping)
+
+
+class SimState:
+    """Complete game state on a flat occupancy grid (index = y * width + x)."""
+
+    __slots__ = ('width', 'height', 'mode', 'difficulty', 'rng', 'grid', 'snakes',
+                 'obstacles', 'ice', 'food', 'special_food', 'special_expires',
+                 'speed', 'base_speed', 'tick', 'done', 'slip_chance')
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.width = width
+        self.height = height
+        self.mode = None
+        self.difficulty = None
+        self.rng = None
+        self.grid = None
+        self.snakes = []
+        self.obstacles = ()
+        self.ice = frozenset()
+        self.food = None
+        self.special_food = None
+        self.special_expires = 0
+        self.speed = 0
+        self.base_speed = 0
+        self.tick = 0
+        self.done = False
+        self.slip_chance = SLIP_CHANCE
+
+    @classmethod
+    def new_game(cls, difficulty="MEDIUM", mode=NORMAL, seed=None, obstacles=None, ice=None,
+                 width=GRID_WIDTH, height=GRID_HEIGHT):
+        """Start a game the way `SnakeGame.reset_game` does.
+
+        The layout comes from `snake_levels.generate_level` with the
+        difficulty's preset, drawn from the game's own rng.  `obstacles` and
+        `ice` override it, e.g. with a level loaded from a pack.
+        """
+        state = cls(width, height)
+        state.mode = mode
+        state.difficulty = difficulty
+        state.rng = random.Random(seed)
+        state.speed = state.base_speed = DIFFICULTY_SPEED[difficulty]
+
+        grid = walled_grid(width, height)
+        state.grid = grid
+
+        starts = spawn_points(width, height)
+        for i in range(snake_count(mode)):
+            cell, direction = starts[i]
+            grid[cell[1] * width + cell[0]] = BODY + i
+            state.snakes.append(SnakeState(deque([cell]), direction))
+
+        if obstacles is None:
+            level = generate_level(width=width, height=height, rng=state.rng,
+                                   **LEVEL_PRESETS[difficulty])
+            obstacles = level.obstacles
+            if ice is None:
+                ice = level.ice if RULESETS[mode].ice else ()
+        for x, y in obstacles:
+            grid[y * width + x] = OBSTACLE
+        state.obstacles = tuple(obstacles)
+
+        if ice is None:
+            ice = []
+            if RULESETS[mode].ice:
+                taken = set()
+                while len(ice) < ICE_BLOCK_COUNT:
+                    cell = state.random_free_cell()
+                    if cell not in taken:
+                        taken.add(cell)
+                        ice.append(cell)
+        state.ice = frozenset(ice)
+
+        state.food = state.random_free_cell(avoid_ice=True)
+        return state
+
+    @classmethod
+    def from_position(cls, snakes, obstacles, food, special_food=None, ice=(),
+                      mode=NORMAL, difficulty="MEDIUM", speed=None, seed=None,
+                      width=GRID_WIDTH, height=GRID_HEIGHT, special_ticks=None):
+        """Build a state from a live position.
+
+        `snakes` is a sequence of ``(body, direction)`` or
+        ``(body, direction, score)`` with the head first.  `special_ticks`
+        is how long the special food has left; by default its full lifetime.
+        """
+        state = cls(width, height)
+        state.mode = mode
+        state.difficulty = difficulty
+        state.rng = random.Random(seed)
+        state.speed = state.base_speed = speed or DIFFICULTY_SPEED[difficulty]
+        grid = walled_grid(width, height)
+        for x, y in obstacles:
+            grid[y * width + x] = OBSTACLE
+        for i, snake in enumerate(snakes):
+            body = deque(tuple(cell) for cell in snake[0])
+            for x, y in body:
+                grid[y * width + x] = BODY + i
+            score = snake[2] if len(snake) > 2 else 0
+            state.snakes.append(SnakeState(body, tuple(snake[1]), score))
+        state.grid = grid
+        state.obstacles = tuple(obstacles)
+        state.ice = frozenset(ice)
+        state.food = tuple(food)
+        state.special_food = tuple(special_food) if special_food else None
+        if special_ticks is None:
+            special_ticks = int(SPECIAL_FOOD_LIFETIME * state.speed)
+        state.special_expires = special_ticks
+        return state
+
+    # -- helpers -----------------------------------------------------------
+    def random_free_cell(self, avoid_ice=False):
+        """Rejection-sample an empty interior cell, like `create_food`."""
+        rng, grid, width = self.rng, self.grid, self.width
+        for _ in range(1000):
+            cell = (rng.randint(1, width - 2), rng.randint(1, self.height - 2))
+            if (grid[cell[1] * width + cell[0]] == EMPTY and
+                    cell != self.food and cell != self.special_food and
+                    not (avoid_ice and cell in self.ice)):
+                return cell
+        # Nearly full board: pick from the remaining cells directly
+        free = [(i % width, i // width) for i, code in enumerate(grid) if code == EMPTY]
+        free = [c for c in free if c != self.food and c != self.special_food]
+        return rng.choice(free) if free else None
+
+    def cell_at(self, cell):
+        return self.grid[cell[1] * self.width + cell[0]]
+
+    def copy(self, rng=None):
+        """Cheap clone for search: the grid is copied, layout data is shared."""
+        other = SimState.__new__(SimState)
+        other.width = self.width
+        other.height = self.height
+        other.mode = self.mode
+        other.difficulty = self.difficulty
+        if rng is None:
+            rng = random.Random()
+            rng.setstate(self.rng.getstate())
+        other.rng = rng
+        other.grid = bytearray(self.grid)
+        other.snakes = [s.copy() for s in self.snakes]
+        other.obstacles = self.obstacles
+        other.ice = self.ice
+        other.food = self.food
+        other.special_food = self.special_food
+        other.special_expires = self.special_expires
+        other.speed = self.speed
+        other.base_speed = self.base_speed
+        other.tick = self.tick
+        other.done = self.done
+        other.slip_chance = self.slip_chance
+        return other
+
+    # -- rules -------------------------------------------------------------
+    def step(self, actions=()):
+        """Advance one tick.
+
+        `actions` holds one direction (or None to keep going) per snake.
+        Returns a list with one outcome per snake; any crash ends the game.
+        """
+        if self.done:
+            raise RuntimeError("step() called on a finished game")
+        rng, grid, width = self.rng, self.grid, self.width
+        snakes = self.snakes
+        winter = RULESETS[self.mode].ice
+        self.tick += 1
+
+        for i, snake in enumerate(snakes):
+            action = actions[i] if i < len(actions) else None
+            if winter and not snake.slipping:
+                if snake.body[0] in self.ice and rng.random() < self.slip_chance:
+                    snake.slipping = True
+                    continue  # keep sliding in the same direction
+            else:
+                snake.slipping = False
+            if action is not None and (action[0] != -snake.direction[0] or
+                                       action[1] != -snake.direction[1]):
+                snake.direction = action
+
+        # Special food appears randomly and expires after its lifetime
+        if self.special_food is None and rng.random() < SPECIAL_FOOD_CHANCE:
+            self.special_food = self.random_free_cell(avoid_ice=True)
+            self.special_expires = self.tick + int(SPECIAL_FOOD_LIFETIME * self.speed)
+        elif self.special_food is not None and self.tick > self.special_expires:
+            self.special_food = None
+
+        heads = []
+        outcomes = []
+        for i, snake in enumerate(snakes):
+            x, y = snake.body[0]
+            dx, dy = snake.direction
+            head = ((x + dx) % width, (y + dy) % self.height)
+            code = grid[head[1] * width + head[0]]
+            if code == WALL:
+                outcome = CRASH_WALL
+            elif code == OBSTACLE:
+                outcome = CRASH_OBSTACLE
+            elif code == BODY + i:
+                outcome = CRASH_SELF
+            elif code >= BODY or head in heads:
+                outcome = CRASH_SNAKE
+            else:
+                outcome = MOVED
+            heads.append(head)
+            outcomes.append(outcome)
+        if any(o is not MOVED for o in outcomes):
+            self.done = True
+            return outcomes
+
+        for i, head in enumerate(heads):
+            snakes[i].body.appendleft(head)
+            grid[head[1] * width + head[0]] = BODY + i
+        for i, head in enumerate(heads):
+            snake = snakes[i]
+            if head == self.food:
+                snake.score += FOOD_SCORE
+                self.food = self.random_free_cell(avoid_ice=True)
+                if snake.score % SPEEDUP_EVERY == 0 and self.base_speed < MAX_SPEED:
+                    self.base_speed += 1
+                    self.speed = self.base_speed
+                outcomes[i] = ATE_FOOD
+            elif head == self.special_food:
+                snake.score += SPECIAL_FOOD_SCORE
+                self.special_food = None
+                if self.speed > MIN_SPEED:
+                    self.speed -= 1
+                outcomes[i] = ATE_SPECIAL
+            else:
+                tx, ty = snake.body.pop()
+                grid[ty * width + tx] = EMPTY
+        return outcomes
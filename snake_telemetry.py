@@ -0,0 +1,309 @@
+"""Per-session operational telemetry in rotating binary logs.
+
+The game records into a `Telemetry` from its hot paths: `count` bumps a
+counter and `observe` drops a duration into a fixed histogram bucket.  Both
+are one or two increments into the current row of a preallocated ring of
+int64 arrays, so recording allocates nothing and takes no lock.  A
+background thread closes the current row every `interval` seconds.  It
+writes the row closed one interval earlier, because the game thread may
+still be finishing an increment into a row it has just left.  Rows go to
+``telemetry.log`` in a sparse binary encoding; the file is rotated by
+size to ``telemetry.1.log``, ``telemetry.2.log``, ...
+
+File layout (little-endian):
+
+    header  b'SNTL', version (B), schema length (H), schema (JSON: metric names, bucket edges)
+    record  session (Q), start in microseconds since the epoch (q), length in ms (I),
+            non-zero slots (H), then that many (slot (H), value (I)) pairs
+
+    python snake_telemetry.py summary telemetry/   # totals and percentiles
+    python snake_telemetry.py bench                # cost of recording
+"""
+import argparse
+import atexit
+import glob
+import json
+import os
+import random
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+COUNTERS = ('frames', 'ticks', 'ai_moves', 'ai_overruns', 'saves', 'loads',
+            'save_errors', 'load_errors', 'high_score_errors', 'submission_errors')
+(FRAMES, TICKS, AI_MOVES, AI_OVERRUNS, SAVES, LOADS,
+ SAVE_ERRORS, LOAD_ERRORS, HIGH_SCORE_ERRORS, SUBMISSION_ERRORS) = range(len(COUNTERS))
+
+HISTOGRAMS = ('frame_ms', 'work_ms', 'tick_late_ms', 'ai_ms', 'save_ms', 'load_ms')
+FRAME_MS, WORK_MS, TICK_LATE_MS, AI_MS, SAVE_MS, LOAD_MS = range(len(HISTOGRAMS))
+# Bucket upper edges in milliseconds; the last bucket is everything above
+EDGES = (0.1, 0.25, 0.5, 1, 2, 4, 8, 12, 16, 18, 20, 25, 33, 50, 100, 250, 1000)
+BUCKETS = len(EDGES) + 1
+HISTOGRAM_SLOTS = BUCKETS + 1  # buckets, then the sum in microseconds
+SLOTS = len(COUNTERS) + len(HISTOGRAMS) * HISTOGRAM_SLOTS
+
+RING_ROWS = 3  # current, retired, being reused
+INTERVAL = 10.0  # seconds per row
+MAX_BYTES = 1 << 20  # per log file
+KEEP = 5  # rotated files kept besides the current one
+LOG_NAME = 'telemetry'
+
+MAGIC = b'SNTL'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sBH')
+RECORD = struct.Struct('<QqIH')
+PAIR = struct.Struct('<HI')
+MAX_VALUE = 0xFFFFFFFF
+
+
+def schema():
+    return {'counters': COUNTERS, 'histograms': HISTOGRAMS, 'edges': EDGES}
+
+
+class Telemetry:
+    def __init__(self, directory=None, interval=INTERVAL, max_bytes=MAX_BYTES, keep=KEEP):
+        self.directory = directory
+        self.interval = interval
+        self.session = random.getrandbits(63)
+        self.rows = [array('q', bytes(8 * SLOTS)) for _ in range(RING_ROWS)]
+        self._zeros = array('q', bytes(8 * SLOTS))
+        self.starts = [time.time()] * RING_ROWS
+        self.index = 0
+        self.row = self.rows[0]
+        self.retired = None  # ring index of the row closed at the last rotation
+        self.edges = EDGES
+        self.writer = LogWriter(directory, max_bytes, keep) if directory else None
+        self.write_errors = 0
+        self._lock = threading.Lock()  # between the flush thread and close()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.writer:
+            self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    # -- hot path ----------------------------------------------------------
+    def count(self, counter, n=1):
+        self.row[counter] += n
+
+    def observe(self, histogram, seconds):
+        base = len(COUNTERS) + histogram * HISTOGRAM_SLOTS
+        row = self.row
+        row[base + bisect_left(self.edges, seconds * 1000)] += 1
+        row[base + BUCKETS] += int(seconds * 1e6)
+
+    # -- flushing ----------------------------------------------------------
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.rotate()
+
+    def rotate(self):
+        """Close the current row and write the one closed before it."""
+        with self._lock:
+            now = time.time()
+            index = (self.index + 1) % RING_ROWS
+            # Written at the previous rotation, so free to reuse
+            self.rows[index][:] = self._zeros
+            self.starts[index] = now
+            closed, self.index = self.index, index
+            self.row = self.rows[index]
+            if self.retired is not None:
+                self._write(self.retired, self.starts[closed])
+            self.retired = closed
+
+    def _write(self, index, end):
+        if self.writer is None:
+            return
+        start = self.starts[index]
+        try:
+            self.writer.write(self.session, start, end - start, self.rows[index])
+        except OSError as e:
+            self.write_errors += 1
+            if self.write_errors == 1:
+                print(f"Telemetry not written: {e}", file=sys.stderr)
+
+    def close(self):
+        """Write everything recorded so far; the game thread must be done."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        with self._lock:
+            now = time.time()
+            if self.retired is not None:
+                self._write(self.retired, self.starts[self.index])
+                self.retired = None
+            self._write(self.index, now)
+            self.rows[self.index][:] = self._zeros
+            self.starts[self.index] = now
+        self.writer.close()
+
+
+class LogWriter:
+    def __init__(self, directory, max_bytes=MAX_BYTES, keep=KEEP):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.path = os.path.join(directory, LOG_NAME + '.log')
+        self.file = None
+
+    def write(self, session, start, seconds, row):
+        pairs = [(slot, min(value, MAX_VALUE)) for slot, value in enumerate(row) if value > 0]
+        data = RECORD.pack(session, int(start * 1e6), int(seconds * 1000), len(pairs))
+        data += b''.join(PAIR.pack(slot, value) for slot, value in pairs)
+        if self.file is None:
+            self._open()
+        if self.file.tell() + len(data) > self.max_bytes:
+            self._rotate()
+        self.file.write(data)
+        self.file.flush()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        layout = json.dumps(schema()).encode()
+        header = FILE_HEADER.pack(MAGIC, VERSION, len(layout)) + layout
+        try:
+            with open(self.path, 'rb') as f:
+                existing = f.read(len(header))
+        except FileNotFoundError:
+            existing = b''
+        if existing and existing != header:
+            self._shift()  # written with other metrics: records must not be mixed
+        self.file = open(self.path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(header)
+
+    def _rotate(self):
+        self.file.close()
+        self._shift()
+        self._open()
+
+    def _shift(self):
+        """Move the current file to ``.1.log``, ``.1`` to ``.2`` and so on."""
+        base = os.path.join(self.directory, LOG_NAME)
+        for i in range(self.keep, 0, -1):
+            older = f"{base}.{i - 1}.log" if i > 1 else self.path
+            if os.path.exists(older):
+                os.replace(older, f"{base}.{i}.log")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# -- reading ----------------------------------------------------------------
+def log_files(directory):
+    """Log files oldest first."""
+    rotated = glob.glob(os.path.join(directory, LOG_NAME + '.*.log'))
+    rotated.sort(key=lambda path: -int(path.rsplit('.', 2)[1]))
+    current = os.path.join(directory, LOG_NAME + '.log')
+    return rotated + ([current] if os.path.exists(current) else [])
+
+
+def read_log(path):
+    """Yield ``(schema, session, start, seconds, {slot: value})`` per record."""
+    with open(path, 'rb') as f:
+        magic, version, length = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a telemetry log")
+        layout = json.loads(f.read(length))
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return  # end, or a record cut short by a crash
+            session, start, ms, count = RECORD.unpack(head)
+            body = f.read(count * PAIR.size)
+            if len(body) < count * PAIR.size:
+                return
+            yield layout, session, start / 1e6, ms / 1000, dict(PAIR.iter_unpack(body))
+
+
+def percentile(buckets, edges, q):
+    total = sum(buckets)
+    if not total:
+        return None
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= q * total:
+            return edges[i] if i < len(edges) else float('inf')
+
+
+def summarize(directory):
+    sessions = set()
+    seconds = 0.0
+    counters = {}
+    histograms = {}
+    for path in log_files(directory):
+        for layout, session, start, length, slots in read_log(path):
+            sessions.add(session)
+            seconds += length
+            names, edges = layout['counters'], layout['edges']
+            for i, name in enumerate(names):
+                counters[name] = counters.get(name, 0) + slots.get(i, 0)
+            size = len(edges) + 2
+            for h, name in enumerate(layout['histograms']):
+                base = len(names) + h * size
+                totals = histograms.setdefault(name, [[0] * (len(edges) + 1), 0, edges])
+                for b in range(len(edges) + 1):
+                    totals[0][b] += slots.get(base + b, 0)
+                totals[1] += slots.get(base + len(edges) + 1, 0)
+
+    lines = [f"{len(sessions)} sessions, {seconds / 3600:.2f} h recorded"]
+    for name, value in counters.items():
+        lines.append(f"  {name:<18}{value:>12}")
+    lines.append(f"  {'histogram':<14}{'count':>10}{'mean':>9}{'p50':>8}{'p95':>8}{'p99':>8}  (ms)")
+    for name, (buckets, total_us, edges) in histograms.items():
+        count = sum(buckets)
+        if not count:
+            continue
+        p50, p95, p99 = (percentile(buckets, edges, q) for q in (0.5, 0.95, 0.99))
+        lines.append(f"  {name:<14}{count:>10}{total_us / count / 1000:>9.2f}"
+                     f"{p50:>8g}{p95:>8g}{p99:>8g}")
+    frames = histograms.get('frame_ms')
+    if frames and sum(frames[0]):
+        p50 = percentile(frames[0], frames[2], 0.5)
+        p95 = percentile(frames[0], frames[2], 0.95)
+        lines.append(f"  fps: median >= {1000 / p50:.0f}, 95% of frames >= {1000 / p95:.0f}")
+    return "\n".join(lines)
+
+
+def benchmark(calls=200000):
+    """Microseconds per count() and per observe()."""
+    telemetry = Telemetry()
+    start = time.perf_counter()
+    for _ in range(calls):
+        telemetry.count(FRAMES)
+    count = (time.perf_counter() - start) / calls * 1e6
+    start = time.perf_counter()
+    for i in range(calls):
+        telemetry.observe(FRAME_MS, 0.0167)
+    observe = (time.perf_counter() - start) / calls * 1e6
+    return count, observe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Session telemetry logs")
+    sub = parser.add_subparsers(dest='command', required=True)
+    show = sub.add_parser('summary', help="summarize the logs in a directory")
+    show.add_argument('directory')
+    sub.add_parser('bench', help="measure the cost of recording")
+    args = parser.parse_args(argv)
+
+    if args.command == 'summary':
+        print(summarize(args.directory))
+    else:
+        count, observe = benchmark()
+        # A frame records about two observations, a count and one tick
+        per_frame = 3 * observe + 2 * count
+        print(f"count {count:.2f} us, observe {observe:.2f} us, "
+              f"~{per_frame:.1f} us per frame ({per_frame / 16667 * 100:.3f}% of a 60 FPS frame)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Replay verification for leaderboard submissions.
+
+A submission is one JSON object per line, written by the game at the end of
+every single-player run that can be re-played:
+
+    {"name": ..., "score": 340, "ticks": 812, "seed": 123, "difficulty": "MEDIUM",
+     "mode": 0, "obstacles": [[x, y], ...], "ice": [[x, y], ...],
+     "turns": [[tick, direction index], ...]}
+
+`turns` lists the ticks on which the snake's direction changed (index into
+snake_constants.DIRECTIONS).  The verifier rebuilds the game from the seed
+and layout and re-plays it with a tight single-snake loop that follows
+`SimState.step` draw for draw, so the random stream - food, special food,
+Winter slips - is the same one the game used.  A submission is accepted when
+the snake crashes on the claimed tick with the claimed score.
+
+    python snake_verify.py submissions.jsonl --workers 8 --timeout 2
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from snake_constants import (
+    DIRECTIONS,
+    MAX_SPEED, MIN_SPEED, FOOD_SCORE, SPECIAL_FOOD_SCORE, SPEEDUP_EVERY,
+    SPECIAL_FOOD_CHANCE, SPECIAL_FOOD_LIFETIME,
+)
+from snake_rules import RULESETS
+from snake_sim import SimState, EMPTY, BODY
+
+# One snake, same rules as SimState
+VERIFIABLE_MODES = tuple(mode for mode, rules in RULESETS.items() if rules.snakes == 1)
+TIMEOUT = 2.0  # seconds of replay per submission
+
+
+class ReplayTimeout(Exception):
+    pass
+
+
+def replay(submission, max_ticks=None, deadline=None):
+    """Re-play a submission; returns ``(score, ticks, crashed)``.
+
+    Stops after `max_ticks` (default: one past the claimed length) and
+    raises ReplayTimeout once `deadline` (a perf_counter value) has passed.
+    """
+    mode = submission['mode']
+    if mode not in VERIFIABLE_MODES:
+        raise ValueError(f"mode {mode} cannot be verified")
+    if max_ticks is None:
+        max_ticks = int(submission['ticks']) + 1
+    state = SimState.new_game(submission['difficulty'], mode, submission['seed'],
+                              obstacles=[tuple(c) for c in submission['obstacles']],
+                              ice=[tuple(c) for c in submission['ice']])
+
+    # Flat-index copy of SimState.step for one snake, with everything in locals
+    width = state.width
+    grid = state.grid
+    rng_random = state.rng.random
+    free_cell = state.random_free_cell
+    offsets = [dy * width + dx for dx, dy in DIRECTIONS]
+    reverse = [DIRECTIONS.index((-dx, -dy)) for dx, dy in DIRECTIONS]
+    snake = state.snakes[0]
+    body = deque(y * width + x for x, y in snake.body)
+    head = body[0]
+    direction = DIRECTIONS.index(snake.direction)
+    action = direction
+    icy = bytearray(width * state.height)
+    for x, y in state.ice:
+        icy[y * width + x] = 1
+    winter = RULESETS[mode].ice
+    slipping = False
+    slip_chance = state.slip_chance
+    food = state.food[1] * width + state.food[0]
+    special = -1
+    expires = 0
+    score = 0
+    speed = base_speed = state.speed
+    turns = iter(submission['turns'])
+    turn_tick, turn_dir = next(turns, (max_ticks + 1, 0))
+
+    tick = 0
+    while tick < max_ticks:
+        tick += 1
+        if tick & 0xFFF == 0 and deadline is not None and time.perf_counter() > deadline:
+            raise ReplayTimeout(tick)
+        while turn_tick <= tick:
+            action = turn_dir
+            turn_tick, turn_dir = next(turns, (max_ticks + 1, 0))
+
+        if winter and not slipping:
+            slipping = icy[head] and rng_random() < slip_chance
+            turning = not slipping
+        else:
+            slipping = False
+            turning = True
+        if turning and action != reverse[direction]:
+            direction = action
+
+        if special < 0 and rng_random() < SPECIAL_FOOD_CHANCE:
+            state.food = (food % width, food // width)
+            state.special_food = None
+            cell = free_cell(avoid_ice=True)
+            special = -1 if cell is None else cell[1] * width + cell[0]
+            expires = tick + int(SPECIAL_FOOD_LIFETIME * speed)
+        elif special >= 0 and tick > expires:
+            special = -1
+
+        head += offsets[direction]
+        if grid[head] != EMPTY:
+            return score, tick, True
+        body.appendleft(head)
+        grid[head] = BODY
+        if head == food:
+            score += FOOD_SCORE
+            state.food = (food % width, food // width)
+            state.special_food = None if special < 0 else (special % width, special // width)
+            cell = free_cell(avoid_ice=True)
+            food = -1 if cell is None else cell[1] * width + cell[0]
+            if score % SPEEDUP_EVERY == 0 and base_speed < MAX_SPEED:
+                base_speed += 1
+                speed = base_speed
+        elif head == special:
+            score += SPECIAL_FOOD_SCORE
+            special = -1
+            if speed > MIN_SPEED:
+                speed -= 1
+        else:
+            grid[body.pop()] = EMPTY
+    return score, tick, False
+
+
+def verify(submission, timeout=TIMEOUT):
+    """Check one submission; returns a result dict (never raises)."""
+    start = time.perf_counter()
+    result = {'id': submission.get('id'), 'name': submission.get('name'),
+              'claimed': submission.get('score'), 'ok': False}
+    try:
+        score, ticks, crashed = replay(submission, deadline=start + timeout)
+        result.update(score=score, ticks=ticks)
+        if not crashed:
+            result['reason'] = "no crash at the claimed length"
+        elif ticks != submission['ticks']:
+            result['reason'] = f"crashed on tick {ticks}, claimed {submission['ticks']}"
+        elif score != submission['score']:
+            result['reason'] = f"score {score}, claimed {submission['score']}"
+        else:
+            result['ok'] = True
+    except ReplayTimeout as e:
+        result['reason'] = f"timed out after {e.args[0]} ticks"
+    except (KeyError, TypeError, ValueError, IndexError) as e:
+        result['reason'] = f"malformed submission: {e!r}"
+    result['ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return result
+
+
+def verify_many(submissions, workers=None, timeout=TIMEOUT, in_flight=None):
+    """Verify an iterable of submissions in a process pool, yielding results as they finish.
+
+    At most `in_flight` submissions are queued at a time, so a backlog of any
+    size is streamed rather than loaded up front.
+    """
+    workers = workers or os.cpu_count() or 1
+    in_flight = in_flight or 4 * workers
+    with ProcessPoolExecutor(workers) as pool:
+        pending = set()
+        for submission in submissions:
+            pending.add(pool.submit(verify, submission, timeout))
+            if len(pending) >= in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def read_submissions(path):
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if line:
+                submission = json.loads(line)
+                submission.setdefault('id', number)
+                yield submission
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify leaderboard submissions by replay")
+    parser.add_argument('path', help="JSON-lines file of submissions")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=TIMEOUT, help="seconds per replay")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    accepted = rejected = 0
+    for result in verify_many(read_submissions(args.path), args.workers, args.timeout):
+        print(json.dumps(result), flush=True)
+        if result['ok']:
+            accepted += 1
+        else:
+            rejected += 1
+    print(f"{accepted} accepted, {rejected} rejected in {time.perf_counter() - start:.2f} s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
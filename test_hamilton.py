@@ -0,0 +1,48 @@
+"""Headless games with the Hamiltonian-cycle controller on the shipped level packs.
+
+    python -m pytest test_hamilton.py
+"""
+import os
+import random
+
+import pytest
+
+from snake_ai import BoardView
+from snake_hamilton import HamiltonController, cycle_for_layout
+from snake_levels import LevelLibrary
+from snake_sim import SimState, ATE_FOOD, ATE_SPECIAL
+
+LEVELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'levels')
+GAMES_PER_PACK = 2
+
+
+def play_until_full(difficulty, seed):
+    level = LevelLibrary(LEVELS).level(difficulty, random.Random(seed))
+    state = SimState.new_game(difficulty, seed=seed, obstacles=level.obstacles, ice=())
+    cycle = cycle_for_layout(level.obstacles)
+    controller = HamiltonController()
+    idle = 0
+    while not state.done and state.food is not None:
+        outcome, = state.step([controller.choose(BoardView.from_sim(state, 0))])
+        idle = 0 if outcome in (ATE_FOOD, ATE_SPECIAL) else idle + 1
+        # The food is always reached within a few laps of the cycle
+        assert idle < 4 * len(cycle), f"stalled at length {len(state.snakes[0].body)}"
+    return len(state.snakes[0].body), cycle
+
+
+@pytest.mark.parametrize('difficulty', ['EASY', 'MEDIUM', 'HARD'])
+@pytest.mark.parametrize('seed', range(GAMES_PER_PACK))
+def test_fills_the_board(difficulty, seed):
+    length, cycle = play_until_full(difficulty, seed)
+    # The game only ends once the body covers every cell of the cycle
+    assert length >= len(cycle)
+
+
+def test_cycle_avoids_obstacles():
+    pack = LevelLibrary(LEVELS).pack('HARD')
+    for i in range(20):
+        obstacles = frozenset(pack[i].obstacles)
+        cycle = cycle_for_layout(obstacles)
+        assert not obstacles.intersection(cycle.cells)
+        for cell, (entry, path, exit) in cycle.detours.items():
+            assert cell in path and not obstacles.intersection(path)
@@ -0,0 +1,67 @@
+"""Seeded games through SnakeGame's tick path must pass snake_verify.
+
+    python -m pytest test_verify.py
+"""
+import os
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pytest
+
+import snake_game
+from snake_constants import NORMAL, WINTER, DEAD_OF_NIGHT
+from snake_verify import verify_many
+
+MAX_TICKS = 5000
+REVERSE_EVERY = 5  # ticks between reversals slipped in after the controller's move
+
+
+@pytest.fixture(scope='module')
+def game(tmp_path_factory):
+    # One SnakeGame per process; the high score and submissions go to a scratch directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('game'))
+    game = snake_game.SnakeGame(player1_controller='greedy', ai_budget=1.0, renderer='surface',
+                                ghost_dir='ghosts')
+    yield game
+    os.chdir(cwd)
+
+
+def play(game, mode, difficulty, seed):
+    """Play one game to its crash; returns the submission it wrote."""
+    random.seed(seed)
+    game.game_mode = mode
+    game.difficulty = difficulty
+    game.state = snake_game.PLAYING
+    game.reset_game()
+    ai_move = game.ai_move
+
+    def ai_move_with_reversals():
+        ai_move()
+        if game.ticks % REVERSE_EVERY == 0:
+            dx, dy = game.direction
+            game.next_direction = (-dx, -dy)
+
+    game.ai_move = ai_move_with_reversals
+    try:
+        while not game.game_over and game.ticks < MAX_TICKS:
+            game.last_move = time.time() - 1.0 / game.speed  # exactly one tick due
+            game.update()
+    finally:
+        del game.ai_move
+    assert game.game_over, "no crash within MAX_TICKS"
+    with open(snake_game.SUBMISSIONS_FILE) as f:
+        last = f.readlines()[-1]
+    return snake_game.json.loads(last)
+
+
+@pytest.mark.parametrize('difficulty', ['EASY', 'MEDIUM', 'HARD'])
+@pytest.mark.parametrize('mode', [NORMAL, WINTER, DEAD_OF_NIGHT])
+def test_game_runs_verify(game, mode, difficulty):
+    submission = play(game, mode, difficulty, seed=mode * 10 + len(difficulty))
+    assert submission['seed'] == game.seed and submission['ticks'] == game.ticks
+    result, = verify_many([submission], workers=1)
+    assert result['ok'], result.get('reason')